@@ -0,0 +1,319 @@
+import argparse
+import json
+import logging
+import operator
+import re
+import subprocess
+import time
+from collections import deque
+from datetime import datetime
+
+from GapDetector import GapDetector
+from TelemetryParser import PacketAssembler, read_lines
+
+# Comparisons a packet rule can use
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+# Rules used when no rules file is given
+DEFAULT_RULES = [
+    {'name': 'crc_failures', 'packet': {'field': 'crc', 'op': '==', 'value': 0}, 'count': 3, 'within': 10},
+    {'name': 'low_rssi', 'packet': {'field': 'rssi', 'op': '<', 'value': -90}},
+    {'name': 'temperature_range', 'packet': {'field': 'temp', 'outside': [-20, 60]}},
+    {'name': 'device_error', 'line': {'contains': '<err>'}},
+    {'name': 'packet_gap', 'event': {'type': 'gap'}},
+]
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Rule:
+    def __init__(self, name, line=None, packet=None, event=None, count=1, within=0.0, cooldown=30.0):
+        """
+        One alert condition, compiled to a predicate when created
+
+        Exactly one source is given:
+            line: {"contains": "<err>"} or {"regex": "..."}, tested on the raw line
+            packet: {"field": "rssi", "op": "<", "value": -90} or
+                {"field": "temp", "outside": [low, high]}
+            event: {"type": "gap"}, matched against gap detector events
+
+        A rule fires when it matched 'count' times within 'within' seconds
+        (e.g. 3 CRC failures in 10 s). Only the last 'count' match times
+        are kept, so checking a window costs O(1) however busy the stream
+        is. After firing, further alerts are held back for 'cooldown'
+        seconds and counted instead.
+
+        Args:
+            name (str): Rule name, reported in alerts
+            count (int): Matches needed to fire
+            within (float): Window for those matches in seconds
+            cooldown (float): Seconds during which the rule does not fire again
+        """
+        if sum(source is not None for source in (line, packet, event)) != 1:
+            raise ValueError(f"Rule {name}: give exactly one of line, packet or event")
+        if count < 1:
+            raise ValueError(f"Rule {name}: count must be at least 1")
+        if count > 1 and within <= 0:
+            raise ValueError(f"Rule {name}: count > 1 needs a positive 'within'")
+        self.name = name
+        self.count = count
+        self.within = within
+        self.cooldown = cooldown
+        self.times = deque(maxlen=count)
+        self.quiet_until = float('-inf')
+        self.suppressed = 0
+        self.suppressed_total = 0
+        self.fired = 0
+        self.field = None
+        self.pattern = None
+        self.event_type = None
+        if line is not None:
+            self.source = 'line'
+            self.pattern = re.escape(line['contains']) if 'contains' in line else line['regex']
+            try:
+                self.predicate = re.compile(self.pattern).search
+            except re.error as e:
+                raise ValueError(f"Rule {name}: invalid regex: {e}")
+        elif packet is not None:
+            self.source = 'packet'
+            self.field = packet['field']
+            self.predicate = self.compile_packet(packet)
+        else:
+            self.source = 'event'
+            self.event_type = event['type']
+            self.predicate = lambda item, event_type=self.event_type: item.get('type') == event_type
+
+    def compile_packet(self, spec):
+        """
+        Predicate on a field value; values of another type (e.g. text in a
+        numeric field) never match rather than raising in the pipeline
+        """
+        if 'outside' in spec:
+            low, high = spec['outside']
+            return lambda value: is_number(value) and (value < low or value > high)
+        compare = OPERATORS.get(spec.get('op'))
+        if compare is None:
+            raise ValueError(f"Rule {self.name}: op must be one of {', '.join(OPERATORS)}")
+        threshold = spec['value']
+        if is_number(threshold):
+            return lambda value: is_number(value) and compare(value, threshold)
+        kind = type(threshold)
+        return lambda value: isinstance(value, kind) and compare(value, threshold)
+
+    def hit(self, when):
+        """
+        Record a match at epoch time 'when'
+
+        Returns:
+            bool: True if the rule fires
+        """
+        times = self.times
+        times.append(when)
+        if len(times) < self.count or when - times[0] > self.within:
+            return False
+        times.clear()
+        if when < self.quiet_until:
+            self.suppressed += 1
+            self.suppressed_total += 1
+            return False
+        self.quiet_until = when + self.cooldown
+        self.fired += 1
+        return True
+
+
+def load_rules(path):
+    """
+    Read rules from a JSON file:
+    {"rules": [{"name": "low_rssi", "packet": {"field": "rssi", "op": "<", "value": -90}}, ...]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return [Rule(**entry) for entry in config.get('rules', [])]
+
+
+def default_rules():
+    return [Rule(**entry) for entry in DEFAULT_RULES]
+
+
+class RuleEngine:
+    def __init__(self, rules, on_alert=None):
+        """
+        Evaluate alert rules against the capture stream as it arrives
+
+        Rules are grouped by what they look at. All line patterns are
+        combined into one regular expression, so a line that matches no
+        rule (nearly all of them) costs a single scan; patterns that cannot
+        be combined (e.g. with inline flags such as '(?i)') are searched one
+        by one instead. Packet rules are
+        indexed by field, so a packet only runs the predicates of fields it
+        has. Times come from the lines and packets themselves, which makes
+        replaying a log give the same alerts as the live pass.
+
+        Args:
+            rules (list): Rule objects
+            on_alert (callable): Called with each alert dict
+        """
+        self.rules = list(rules)
+        self.on_alert = on_alert
+        self.line_rules = [rule for rule in self.rules if rule.source == 'line']
+        self.event_rules = [rule for rule in self.rules if rule.source == 'event']
+        self.packet_rules = {}
+        for rule in self.rules:
+            if rule.source == 'packet':
+                self.packet_rules.setdefault(rule.field, []).append(rule)
+        self.line_filter = None
+        if self.line_rules:
+            try:
+                self.line_filter = re.compile('|'.join(f'(?:{rule.pattern})' for rule in self.line_rules)).search
+            except re.error:
+                self.line_filter = None
+        self.alerts = 0
+
+    def fire(self, rule, when, **details):
+        alert = {
+            'type': 'alert',
+            'rule': rule.name,
+            'timestamp': datetime.fromtimestamp(when),
+            'count': rule.count,
+            'within': rule.within,
+            'suppressed': rule.suppressed,
+        }
+        alert.update(details)
+        rule.suppressed = 0
+        self.alerts += 1
+        if self.on_alert:
+            self.on_alert(alert)
+        return alert
+
+    def check_line(self, line, created=None):
+        """Check one raw line; returns the alerts it raised"""
+        if not self.line_rules or (self.line_filter is not None and self.line_filter(line) is None):
+            return []
+        when = created if created is not None else time.time()
+        return [self.fire(rule, when, line=line) for rule in self.line_rules
+                if rule.predicate(line) and rule.hit(when)]
+
+    def check_packet(self, packet):
+        """Check one assembled packet; returns the alerts it raised"""
+        alerts = []
+        when = None
+        for field, rules in self.packet_rules.items():
+            value = packet.get(field)
+            if value is None or isinstance(value, list):
+                continue
+            for rule in rules:
+                if rule.predicate(value):
+                    if when is None:
+                        timestamp = packet.get('timestamp')
+                        when = timestamp.timestamp() if timestamp else time.time()
+                    if rule.hit(when):
+                        alerts.append(self.fire(rule, when, field=field, value=value,
+                                                port=packet.get('port')))
+        return alerts
+
+    def check_event(self, event):
+        """Check a gap detector event; returns the alerts it raised"""
+        alerts = []
+        for rule in self.event_rules:
+            if rule.predicate(event):
+                timestamp = event.get('timestamp')
+                when = timestamp.timestamp() if timestamp else time.time()
+                if rule.hit(when):
+                    alerts.append(self.fire(rule, when, event=event['type'], stream=event.get('stream')))
+        return alerts
+
+    def stats(self):
+        return {rule.name: {'fired': rule.fired, 'suppressed': rule.suppressed_total} for rule in self.rules}
+
+
+class CommandHook:
+    def __init__(self, command):
+        """
+        Run a local command for every alert, with the alert as JSON on stdin
+
+        The command is started without waiting for it, so a slow
+        notification script never holds up the capture; finished commands
+        are reaped on the next alert.
+
+        Args:
+            command (str): Shell command, e.g. 'notify-send "Pass alert"'
+        """
+        self.command = command
+        self.running = []
+        self.main_logger = logging.getLogger('main')
+
+    def __call__(self, alert):
+        self.running = [process for process in self.running if process.poll() is None]
+        try:
+            process = subprocess.Popen(self.command, shell=True, stdin=subprocess.PIPE)
+            process.stdin.write(json.dumps(alert, default=str).encode('utf-8') + b'\n')
+            process.stdin.close()
+            self.running.append(process)
+        except OSError as e:
+            self.main_logger.error(f"Alert command failed: {e}")
+
+
+def describe_alert(alert):
+    """One-line description of an alert for the console"""
+    if 'line' in alert:
+        detail = alert['line']
+    elif 'field' in alert:
+        detail = f"{alert['field']} = {alert['value']}"
+    else:
+        detail = f"{alert['event']} on {alert['stream']}"
+    window = f" ({alert['count']} in {alert['within']:g} s)" if alert['count'] > 1 else ''
+    held = f", {alert['suppressed']} held back" if alert['suppressed'] else ''
+    return f"ALERT {alert['rule']}{window}: {detail}{held}"
+
+
+def replay(path, engine):
+    """Run a session log through the rules as if it was being captured"""
+    assembler = PacketAssembler()
+    # Gap events for the event rules, as the logger's own detector raises them
+    gap_detector = GapDetector(on_event=engine.check_event)
+    for timestamp, message in read_lines(path):
+        if timestamp is None:
+            continue
+        engine.check_line(message, timestamp.timestamp())
+        packet = assembler.feed(timestamp, message)
+        if packet:
+            gap_detector.add(packet)
+            engine.check_packet(packet)
+    packet = assembler.flush()
+    if packet:
+        gap_detector.add(packet)
+        engine.check_packet(packet)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check session logs against alert rules")
+    parser.add_argument('log_files', nargs='+', help='Session log files to replay')
+    parser.add_argument('--rules', type=str, help='JSON rules file (default: built-in rules)')
+    parser.add_argument('--command', type=str, help='Run this command for every alert, alert JSON on stdin')
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules) if args.rules else default_rules()
+    hook = CommandHook(args.command) if args.command else None
+
+    def report(alert):
+        print(f"{alert['timestamp']:%Y-%m-%d %H:%M:%S} {describe_alert(alert)}")
+        if hook:
+            hook(alert)
+
+    engine = RuleEngine(rules, on_alert=report)
+    for path in args.log_files:
+        started = time.perf_counter()
+        replay(path, engine)
+        print(f"{path}: checked in {time.perf_counter() - started:.2f} s")
+    print(f"{engine.alerts} alert(s): {engine.stats()}")
+
+if __name__ == "__main__":
+    main()
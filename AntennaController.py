@@ -1,10 +1,10 @@
 import serial
 import time
 import threading
-import logging
 import os
-from datetime import datetime
 import serial.tools.list_ports
+from Sinks import TextSink, session_folder, setup_main_logger
+from Shutdown import PortReader, session_footer, stop_reader
 
 class AntennaController:
     def __init__(self, port, baudrate=115200, timeout=1):
@@ -20,44 +20,21 @@ class AntennaController:
         self.baudrate = baudrate
         self.timeout = timeout
         self.serial_conn = None
+        self.reader = None
+        self.read_thread = None
+        self.received = 0
         self.running = False
         self.setup_logging()
         
     def setup_logging(self):
         """Setup logging configuration"""
-        # Create logs directory if it doesn't exist
-        log_dir = os.path.join(os.path.dirname(__file__), 'logs_antenna')
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # Create log filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Create logs directory and session timestamp
+        log_dir, timestamp = session_folder('logs_antenna')
         self.log_file = os.path.join(log_dir, f'antenna_data_{timestamp}.txt')
+        self.main_logger = setup_main_logger()
         
-        # Create loggers
-        self.data_logger = logging.getLogger('antenna_data')
-        self.main_logger = logging.getLogger('main')
-        
-        # Clear any existing handlers
-        self.data_logger.handlers.clear()
-        self.main_logger.handlers.clear()
-        
-        # Set logging levels
-        self.data_logger.setLevel(logging.INFO)
-        self.main_logger.setLevel(logging.INFO)
-        
-        # Create file handler for data logging (with timestamps)
-        file_handler = logging.FileHandler(self.log_file)
-        file_formatter = logging.Formatter('%(asctime)s,%(message)s')
-        file_handler.setFormatter(file_formatter)
-        self.data_logger.addHandler(file_handler)
-        
-        # Console handler for main logger
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.main_logger.addHandler(console_handler)
-        
-        # Prevent propagation to avoid duplicate messages
-        self.data_logger.propagate = False
+        # Data sink (timestamp,value format)
+        self.data_sink = TextSink(self.log_file)
         
         self.main_logger.info(f"Antenna Controller initialized:")
         self.main_logger.info(f"Data log: {self.log_file}")
@@ -70,6 +47,7 @@ class AntennaController:
                 baudrate=self.baudrate,
                 timeout=self.timeout
             )
+            self.reader = PortReader(self.serial_conn)
             self.main_logger.info(f"Connected to {self.port} at {self.baudrate} baud")
             return True
         except serial.SerialException as e:
@@ -101,19 +79,27 @@ class AntennaController:
         while self.running:
             try:
                 if self.serial_conn and self.serial_conn.is_open:
-                    line = self.serial_conn.readline().decode('utf-8').strip()
+                    line = self.reader.read_line()
                     if line:
+                        self.received += 1
                         # Log with timestamp to file
-                        self.data_logger.info(line)
+                        self.data_sink.write(line)
                         # Print to terminal without timestamp
                         print(f"Received: {line}")
                         
             except serial.SerialException as e:
+                if not self.running:
+                    break
                 self.main_logger.error(f"Serial read error: {e}")
                 break
             except Exception as e:
                 self.main_logger.error(f"Unexpected error: {e}")
                 break
+        
+        # Woken up for shutdown: keep what the port still holds
+        for line in self.reader.drain():
+            self.received += 1
+            self.data_sink.write(line)
                 
     def start_controller(self):
         """Start the antenna controller"""
@@ -121,10 +107,11 @@ class AntennaController:
             return False
         
         self.running = True
+        self.session_started = time.time()
         
         # Start reading thread
-        read_thread = threading.Thread(target=self.read_serial_data, daemon=True)
-        read_thread.start()
+        self.read_thread = threading.Thread(target=self.read_serial_data, daemon=True)
+        self.read_thread.start()
         
         try:
             self.main_logger.info("Antenna Controller started.")
@@ -148,7 +135,12 @@ class AntennaController:
             self.main_logger.info("Stopping antenna controller...")
             print("\nStopping antenna controller...")
             self.running = False
+            # Wake the reader instead of waiting out readline(), then close
+            stop_reader(self.reader, self.read_thread, self.timeout + 1)
             self.disconnect_port()
+            self.data_sink.write(session_footer(self.session_started, self.received))
+            self.data_sink.sync()
+            self.data_sink.close()
         
         return True
 
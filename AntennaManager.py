@@ -0,0 +1,362 @@
+import argparse
+import os
+import re
+import selectors
+import sys
+import time
+from collections import deque
+
+import serial
+
+from AntennaController import list_serial_ports
+from Shutdown import MAX_LINE, split_lines
+from Sinks import TextSink, session_folder, setup_main_logger
+
+# Seconds between attempts to reopen a link that went away
+RECONNECT_INTERVAL = 5.0
+# Quiet time after which a reply without a line end counts as complete
+REPLY_IDLE = 0.5
+
+
+class AntennaLink:
+    def __init__(self, name, port, baudrate, log_file):
+        """
+        One antenna on one serial port, driven by AntennaManager
+
+        The port is opened non-blocking so the manager's event loop can
+        serve every link. Commands wait in their own queue until the port
+        is writable; received bytes are split into lines, logged to this
+        link's antenna_data file and matched to the last command to measure
+        the response time. Lines may end in '\n', '\r\n' or a bare '\r';
+        a reply without any line end is taken as complete after REPLY_IDLE
+        seconds of quiet.
+
+        Args:
+            name (str): Short name used in logs and at the prompt
+            port (str): Serial port
+            baudrate (int): Baud rate for the port
+            log_file (str): antenna_data file for this link
+        """
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.log_file = log_file
+        self.conn = None
+        self.commands = deque()
+        self.outgoing = b''
+        self.buffer = b''
+        self.last_read = 0.0
+        self.awaiting_since = None
+        self.latencies = deque(maxlen=100)
+        self.sent = 0
+        self.received = 0
+        self.last_line = None
+        self.retry_at = 0.0
+        self.data_sink = TextSink(log_file)
+
+    def open(self):
+        self.conn = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=0)
+        self.buffer = b''
+        return self.conn
+
+    def close(self):
+        if self.conn and self.conn.is_open:
+            self.conn.close()
+        self.conn = None
+
+    @property
+    def connected(self):
+        return self.conn is not None and self.conn.is_open
+
+    def queue(self, command):
+        self.commands.append(command.encode('utf-8'))
+
+    def wants_write(self):
+        return bool(self.outgoing or self.commands)
+
+    def write_now(self):
+        """Write as much queued output as the port accepts without blocking"""
+        if not self.outgoing and self.commands:
+            self.outgoing = self.commands.popleft()
+        if not self.outgoing:
+            return 0
+        try:
+            written = os.write(self.conn.fileno(), self.outgoing)
+        except BlockingIOError:
+            # Output buffer full: the rest goes out on the next EVENT_WRITE
+            return 0
+        self.outgoing = self.outgoing[written:]
+        if not self.outgoing:
+            self.sent += 1
+            self.awaiting_since = time.perf_counter()
+        return written
+
+    def read_lines(self):
+        """Read what is waiting and return the completed lines"""
+        data = self.conn.read(self.conn.in_waiting or 1)
+        self.last_read = time.monotonic()
+        if data and self.awaiting_since is not None:
+            # Response time to the first byte, so replies completed by
+            # REPLY_IDLE are not measured as slower
+            self.latencies.append(time.perf_counter() - self.awaiting_since)
+            self.awaiting_since = None
+        lines, self.buffer = split_lines(self.buffer + data)
+        if len(self.buffer) >= MAX_LINE:
+            lines.append(self.buffer)
+            self.buffer = b''
+        return self.complete(lines)
+
+    def flush_idle(self, now):
+        """Complete a reply that has no line end once the port went quiet"""
+        if not self.buffer or now - self.last_read < REPLY_IDLE:
+            return []
+        lines, self.buffer = [self.buffer], b''
+        return self.complete(lines)
+
+    def complete(self, lines):
+        completed = []
+        for raw in lines:
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            self.received += 1
+            self.last_line = line
+            self.data_sink.write(line)
+            completed.append(line)
+        return completed
+
+    def stats(self):
+        latency = sorted(self.latencies)
+        return {
+            'port': self.port,
+            'connected': self.connected,
+            'sent': self.sent,
+            'received': self.received,
+            'queued': len(self.commands),
+            'median_response_ms': round(latency[len(latency) // 2] * 1000, 1) if latency else None,
+            'last': self.last_line,
+        }
+
+
+class AntennaManager:
+    def __init__(self, ports, baudrate=9600):
+        """
+        Drive several antenna links from one process and one event loop
+
+        Every link and the terminal are registered with one selector, so a
+        slow or silent antenna never holds up the others and no thread is
+        needed per port. broadcast() writes the same command to every link
+        back to back and reports the skew between the first and the last
+        write. Relies on select() over serial ports and stdin (POSIX).
+
+        Args:
+            ports (list): Ports, or (port, baudrate) tuples
+            baudrate (int): Baud rate for ports given without one
+        """
+        self.running = False
+        self.selector = selectors.DefaultSelector()
+        self.setup_logging()
+        self.links = []
+        for number, entry in enumerate(ports, 1):
+            port, rate = entry if isinstance(entry, tuple) else (entry, baudrate)
+            name = f"{number}_{re.sub(r'[^A-Za-z0-9]+', '', os.path.basename(port))}"
+            log_file = os.path.join(self.log_dir, f'antenna_data_{self.timestamp}_{name}.txt')
+            self.links.append(AntennaLink(name, port, rate, log_file))
+
+    def setup_logging(self):
+        self.log_dir, self.timestamp = session_folder('logs_antenna')
+        self.main_logger = setup_main_logger()
+
+    def connect(self, link):
+        try:
+            link.open()
+        except serial.SerialException as e:
+            self.main_logger.error(f"Failed to connect to {link.port}: {e}")
+            link.retry_at = time.monotonic() + RECONNECT_INTERVAL
+            return False
+        self.selector.register(link.conn, self.interest(link), link)
+        self.main_logger.info(f"Link {link.name}: {link.port} at {link.baudrate} baud, log {link.log_file}")
+        return True
+
+    def disconnect(self, link, reason=None):
+        if link.conn is not None:
+            try:
+                self.selector.unregister(link.conn)
+            except (KeyError, ValueError):
+                pass
+        link.close()
+        link.retry_at = time.monotonic() + RECONNECT_INTERVAL
+        if reason:
+            self.main_logger.error(f"Link {link.name} lost: {reason}")
+
+    def interest(self, link):
+        return selectors.EVENT_READ | (selectors.EVENT_WRITE if link.wants_write() else 0)
+
+    def update_interest(self, link):
+        if link.connected:
+            self.selector.modify(link.conn, self.interest(link), link)
+
+    def send(self, link, command):
+        """Queue a command for one link"""
+        link.queue(command)
+        self.update_interest(link)
+        self.main_logger.info(f"Queued '{command}' for link {link.name}")
+
+    def broadcast(self, command):
+        """
+        Send one command to every connected link as close together as possible
+
+        The writes are issued back to back instead of waiting for the
+        selector, so the skew is bounded by a few system calls.
+
+        Returns:
+            dict: Link name -> offset of its write from the first one (s),
+            plus 'skew' (s)
+        """
+        data = command.encode('utf-8')
+        offsets = {}
+        first = None
+        for link in self.links:
+            if not link.connected:
+                # A late copy would no longer be synchronized: skip it
+                continue
+            if link.wants_write():
+                # Still writing an earlier command: keep the order
+                link.queue(command)
+                self.update_interest(link)
+                continue
+            link.outgoing = data
+            try:
+                link.write_now()
+            except OSError as e:
+                self.disconnect(link, e)
+                continue
+            done = time.perf_counter()
+            if first is None:
+                first = done
+            offsets[link.name] = done - first
+            self.update_interest(link)
+        skew = max(offsets.values()) if offsets else 0.0
+        offsets['skew'] = skew
+        self.main_logger.info(f"Broadcast '{command}' to {len(offsets) - 1}/{len(self.links)} links, "
+                              f"skew {skew * 1e6:.0f} us")
+        return offsets
+
+    def status(self):
+        return {link.name: link.stats() for link in self.links}
+
+    def handle_input(self, text):
+        """
+        Terminal commands:
+            (empty)       broadcast 'a'
+            all <cmd>     broadcast <cmd>
+            <n> <cmd>     send <cmd> to link n
+            status        show every link
+            q             stop
+        """
+        text = text.strip()
+        if text in ('q', 'quit', 'exit'):
+            self.running = False
+        elif text == '':
+            offsets = self.broadcast('a')
+            print(f"Command 'a' sent to {len(offsets) - 1} link(s), skew {offsets['skew'] * 1e6:.0f} us")
+        elif text == 'status':
+            for name, stats in self.status().items():
+                print(f"  {name}: {stats}")
+        else:
+            target, _, command = text.partition(' ')
+            if target == 'all' and command:
+                offsets = self.broadcast(command)
+                print(f"Command '{command}' sent to {len(offsets) - 1} link(s), skew {offsets['skew'] * 1e6:.0f} us")
+            elif target.isdigit() and 1 <= int(target) <= len(self.links) and command:
+                self.send(self.links[int(target) - 1], command)
+            else:
+                print("Commands: Enter | all <cmd> | <n> <cmd> | status | q")
+
+    def poll(self, timeout=0.5):
+        """Run one pass of the event loop"""
+        for key, events in self.selector.select(timeout):
+            link = key.data
+            if link is None:
+                line = sys.stdin.readline()
+                if line:
+                    self.handle_input(line)
+                else:
+                    # Terminal closed: keep logging until interrupted
+                    self.selector.unregister(sys.stdin)
+                continue
+            try:
+                if events & selectors.EVENT_READ:
+                    for line in link.read_lines():
+                        print(f"[{link.name}] {line}")
+                if events & selectors.EVENT_WRITE and link.connected:
+                    link.write_now()
+                    self.update_interest(link)
+            except (serial.SerialException, OSError) as e:
+                self.disconnect(link, e)
+
+        now = time.monotonic()
+        for link in self.links:
+            for line in link.flush_idle(now):
+                print(f"[{link.name}] {line}")
+            if not link.connected and now >= link.retry_at:
+                self.connect(link)
+
+    def run(self, interactive=True):
+        for link in self.links:
+            self.connect(link)
+        if interactive:
+            self.selector.register(sys.stdin, selectors.EVENT_READ, None)
+            print("Enter: send 'a' to all | all <cmd> | <n> <cmd> | status | q")
+        self.running = True
+        try:
+            while self.running:
+                self.poll()
+        except KeyboardInterrupt:
+            print("\nStopping antenna manager...")
+        self.stop()
+
+    def stop(self):
+        self.running = False
+        self.main_logger.info("Stopping antenna manager...")
+        for link in self.links:
+            self.disconnect(link)
+            link.flush_idle(float('inf'))
+            link.data_sink.close()
+            self.main_logger.info(f"Link {link.name}: {link.stats()}")
+        self.selector.close()
+
+
+def parse_port(text, default):
+    """'PORT' or 'PORT@BAUD' -> (port, baudrate)"""
+    port, _, rate = text.rpartition('@')
+    if port and rate.isdigit():
+        return port, int(rate)
+    return text, default
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control several antennas from one terminal")
+    parser.add_argument('ports', nargs='*', help='Ports as PORT or PORT@BAUD (default: choose from a list)')
+    parser.add_argument('--baudrate', '-b', type=int, default=9600, help='Baud rate for ports given without one')
+    args = parser.parse_args()
+
+    ports = [parse_port(port, args.baudrate) for port in args.ports]
+    if not ports:
+        available = list_serial_ports()
+        if not available:
+            return
+        choice = input(f"\nSelect port numbers, comma separated (1-{len(available)}): ")
+        try:
+            ports = [(available[int(item) - 1], args.baudrate) for item in choice.split(',') if item.strip()]
+        except (ValueError, IndexError):
+            print("Invalid choice")
+            return
+    if not ports:
+        return
+
+    manager = AntennaManager(ports, args.baudrate)
+    manager.run()
+
+if __name__ == "__main__":
+    main()
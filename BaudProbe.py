@@ -0,0 +1,167 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+import serial.tools.list_ports
+
+# Most likely first: the boards log at 115200, the antenna runs at 9600
+CANDIDATE_RATES = (115200, 9600, 57600, 38400, 19200, 230400, 460800, 921600)
+# Text that only appears when the rate is right
+BANNERS = (b'uart:~$', b'Received Message', b'storedData', b'dataindex')
+# Printable ASCII plus tab, newlines and ESC (the shell colours its prompt)
+READABLE = set(range(0x20, 0x7f)) | {0x09, 0x0a, 0x0d, 0x1b}
+UNREADABLE = bytes(byte for byte in range(256) if byte not in READABLE)
+# Longest average line still considered normal output
+MAX_LINE = 512
+# Fewest bytes a rate must produce to be accepted; a few stray bytes can
+# look printable at any rate
+MIN_BYTES = 16
+
+
+def score_sample(data):
+    """
+    How much a sample looks like text from the right baud rate
+
+    At a wrong rate the UART still produces bytes, but they are mostly
+    non-printable (framing errors give 0x00 and 0xFF), newlines are rare and
+    no known banner appears.
+
+    Returns:
+        tuple: (score between 0 and 1, True if a known banner was seen)
+    """
+    if not data:
+        return 0.0, False
+    readable = len(data.translate(None, UNREADABLE)) / len(data)
+    newlines = data.count(b'\n')
+    if newlines:
+        cadence = min(1.0, MAX_LINE / (len(data) / newlines))
+    else:
+        # A short sample without a newline is inconclusive, a long one is not
+        cadence = 0.5 if len(data) < MAX_LINE else 0.0
+    banner = any(text in data for text in BANNERS)
+    return 0.6 * readable + 0.2 * cadence + (0.2 if banner else 0.0), banner
+
+
+def sample_port(port, baudrate, duration, poke=False, max_bytes=4096):
+    """Read what a port sends at one baud rate for up to 'duration' seconds"""
+    data = b''
+    with serial.Serial(port=port, baudrate=baudrate, timeout=0.05) as conn:
+        conn.reset_input_buffer()
+        if poke:
+            # An empty command makes the Zephyr shell print its prompt
+            conn.write(b'\r\n')
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline and len(data) < max_bytes:
+            data += conn.read(max(1, min(conn.in_waiting, max_bytes - len(data))))
+    return data
+
+
+def probe_port(port, rates=CANDIDATE_RATES, budget=6.0, poke=False, min_score=0.7, good_enough=0.95):
+    """
+    Find the baud rate at which a port produces readable output
+
+    The budget is split evenly between the candidate rates, so the probe
+    never takes longer than 'budget' seconds; it stops early when a rate
+    scores 'good_enough' and showed a known banner. A rate is only
+    accepted with at least MIN_BYTES of output containing a newline or a
+    banner. The default 6 s over 8 rates listens 0.75 s per rate, less than
+    the boards' packet interval: without 'poke' a board that is between
+    packets looks silent, so the loggers probe with poke=True.
+
+    Args:
+        port (str): Serial port
+        rates (tuple): Candidate rates, most likely first
+        budget (float): Total seconds to spend on this port
+        poke (bool): Send an empty line at each rate to make a quiet shell talk
+        min_score (float): Lowest score accepted as readable
+        good_enough (float): Score that ends the probe early
+
+    Returns:
+        dict: 'port', 'baudrate' (None if nothing was readable), 'score',
+        'elapsed' and per-rate 'results'
+    """
+    main_logger = logging.getLogger('main')
+    started = time.monotonic()
+    dwell = budget / len(rates)
+    results = []
+    best = None
+    for rate in rates:
+        try:
+            data = sample_port(port, rate, dwell, poke)
+        except (serial.SerialException, OSError) as e:
+            results.append({'baudrate': rate, 'error': str(e)})
+            main_logger.error(f"Baud probe of {port} at {rate} failed: {e}")
+            break
+        score, banner = score_sample(data)
+        result = {'baudrate': rate, 'score': round(score, 3), 'bytes': len(data), 'banner': banner}
+        results.append(result)
+        if len(data) < MIN_BYTES or not (banner or b'\n' in data):
+            continue
+        if best is None or score > best['score']:
+            best = result
+        if score >= good_enough and banner:
+            break
+    found = best is not None and best['score'] >= min_score
+    summary = {
+        'port': port,
+        'baudrate': best['baudrate'] if found else None,
+        'score': best['score'] if best else 0.0,
+        'elapsed': round(time.monotonic() - started, 2),
+        'results': results,
+    }
+    main_logger.info(f"Baud probe of {port}: {describe_probe(summary)}")
+    return summary
+
+
+def probe_ports(ports, rates=CANDIDATE_RATES, budget=6.0, poke=False):
+    """
+    Probe several ports at once, one thread per port
+
+    Each adapter is independent, so setting up N adapters takes one budget
+    rather than N.
+
+    Returns:
+        dict: Port -> probe_port() result
+    """
+    if not ports:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        results = pool.map(lambda port: probe_port(port, rates, budget, poke), ports)
+        return dict(zip(ports, results))
+
+
+def describe_probe(result):
+    """One-line summary of a probe result"""
+    if result['baudrate'] is None:
+        tried = ', '.join(str(r['baudrate']) for r in result['results'])
+        return f"no readable output (tried {tried} in {result['elapsed']}s)"
+    return f"{result['baudrate']} baud (score {result['score']}, {result['elapsed']}s)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect the baud rate of serial ports from their output")
+    parser.add_argument('ports', nargs='*', help='Ports to probe (default: every port found)')
+    parser.add_argument('--rates', type=str, help='Comma separated candidate rates')
+    parser.add_argument('--budget', type=float, default=6.0, help='Seconds to spend per port')
+    parser.add_argument('--poke', action='store_true', help='Send an empty line at each rate to wake up the shell')
+    args = parser.parse_args()
+
+    ports = args.ports or [port.device for port in serial.tools.list_ports.comports()]
+    if not ports:
+        print("No serial ports found")
+        return
+    rates = tuple(int(rate) for rate in args.rates.split(',')) if args.rates else CANDIDATE_RATES
+
+    for port, result in probe_ports(ports, rates, args.budget, args.poke).items():
+        print(f"{port}: {describe_probe(result)}")
+        for item in result['results']:
+            if 'error' in item:
+                print(f"  {item['baudrate']:>7}  error: {item['error']}")
+            else:
+                print(f"  {item['baudrate']:>7}  score {item['score']:.3f}  {item['bytes']} bytes"
+                      f"{'  banner' if item['banner'] else ''}")
+
+if __name__ == "__main__":
+    main()
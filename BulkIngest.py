@@ -0,0 +1,192 @@
+import argparse
+import glob
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from TelemetryParser import (ADCS_PATTERN, FIELD_PATTERN, HEADER_PATTERN, PacketAssembler,
+                             packet_to_json, split_log_line, strip_line)
+from SQLiteSink import INSERT, open_database, packet_row
+from Pyramid import PyramidBuilder, pyramid_path
+
+# Session files written by the loggers
+INPUT_PATTERNS = ('serial_data_*.txt', 'port*_data_*.txt')
+
+
+def find_inputs(paths):
+    """Expand folders into the session files they contain"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in INPUT_PATTERNS:
+                files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            files.append(path)
+    return files
+
+
+def split_chunks(path, chunk_size):
+    """Byte ranges of roughly chunk_size that end on a newline"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    chunks = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+            end = size if end == -1 else end + 1
+            chunks.append((path, start, end))
+            start = end
+    return chunks
+
+
+def is_field_line(text):
+    return bool(FIELD_PATTERN.match(text) or ADCS_PATTERN.match(text))
+
+
+def parse_chunk(task):
+    """
+    Parse one newline-aligned chunk in a worker process
+
+    A packet can straddle chunks, so besides the packets that are complete
+    inside the chunk this returns the leading lines that may continue the
+    previous chunk's packet, and the packet still open at the end.
+
+    Returns:
+        dict: 'packets', 'lead', 'has_header', 'open', 'lines'
+    """
+    path, start, end = task
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = mm[start:end].decode('utf-8', errors='replace').splitlines()
+
+    parsed = [split_log_line(line) for line in lines]
+
+    # Leading field lines, up to and including the line that ends them
+    lead = []
+    index = 0
+    while index < len(parsed):
+        text = strip_line(parsed[index][1])
+        if HEADER_PATTERN.search(text):
+            break
+        lead.append(parsed[index])
+        index += 1
+        if not is_field_line(text):
+            break
+
+    assembler = PacketAssembler()
+    packets = []
+    has_header = False
+    for timestamp, message in parsed[index:]:
+        if not has_header and 'Received Message' in message:
+            has_header = True
+        packet = assembler.feed(timestamp, message)
+        if packet:
+            packets.append(packet)
+
+    return {
+        'packets': packets,
+        'lead': lead,
+        'has_header': has_header,
+        'open': assembler.current,
+        'lines': len(lines),
+    }
+
+
+def merge_chunks(results):
+    """Stitch chunk results of one file together in order"""
+    packets = []
+    carry = None
+    lines = 0
+    for result in results:
+        lines += result['lines']
+        if carry is not None:
+            # Finish the packet left open by the previous chunk
+            assembler = PacketAssembler()
+            assembler.current = carry
+            for timestamp, message in result['lead']:
+                packet = assembler.feed(timestamp, message)
+                if packet:
+                    packets.append(packet)
+            carry = assembler.current
+        if result['has_header']:
+            if carry is not None:
+                packets.append(carry)
+            packets.extend(result['packets'])
+            carry = result['open']
+    if carry is not None:
+        packets.append(carry)
+    return packets, lines
+
+
+def ingest(paths, workers=None, chunk_size=8 * 1024 * 1024):
+    """
+    Parse session files in parallel
+
+    Yields:
+        tuple: (path, packets, line count) for each file, in input order
+    """
+    tasks = []
+    for path in paths:
+        tasks.extend(split_chunks(path, chunk_size))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(parse_chunk, tasks)
+        current, pending = None, []
+        for (path, _, _), result in zip(tasks, results):
+            if path != current and pending:
+                yield (current, *merge_chunks(pending))
+                pending = []
+            current = path
+            pending.append(result)
+        if pending:
+            yield (current, *merge_chunks(pending))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse historical session logs into packets using all cores")
+    parser.add_argument('inputs', nargs='+', help='Session files or folders (logs_*, dual_logs)')
+    parser.add_argument('--out-dir', type=str, help='Write <session>.packets.jsonl files here')
+    parser.add_argument('--sqlite', type=str, help='Also load packets into this SQLite database')
+    parser.add_argument('--pyramid', action='store_true', help='Write a <session>.pyr.npz min/max pyramid next to each session (see Pyramid.py)')
+    parser.add_argument('--workers', '-j', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk-mb', type=float, default=8, help='Chunk size in MB')
+    args = parser.parse_args()
+
+    paths = find_inputs(args.inputs)
+    if not paths:
+        print("No session files found")
+        return
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+    conn = open_database(args.sqlite) if args.sqlite else None
+
+    started = time.perf_counter()
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    total_packets = 0
+    for path, packets, lines in ingest(paths, args.workers, int(args.chunk_mb * 1024 * 1024)):
+        session = os.path.splitext(os.path.basename(path))[0]
+        total_packets += len(packets)
+        if args.out_dir:
+            with open(os.path.join(args.out_dir, f'{session}.packets.jsonl'), 'w', encoding='utf-8') as f:
+                for packet in packets:
+                    f.write(packet_to_json(packet) + '\n')
+        if conn:
+            with conn:
+                conn.executemany(INSERT, [packet_row(packet, session) for packet in packets])
+        if args.pyramid:
+            builder = PyramidBuilder()
+            for packet in packets:
+                builder.add_packet(packet)
+            builder.pyramid().save(pyramid_path(path))
+        print(f"{path}: {lines} lines, {len(packets)} packets")
+
+    if conn:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"\n{len(paths)} file(s), {total_packets} packets, {total_bytes / 1e6:.1f} MB "
+          f"in {elapsed:.2f} s ({total_bytes / 1e6 / elapsed:.1f} MB/s)")
+
+if __name__ == "__main__":
+    main()
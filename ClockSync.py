@@ -0,0 +1,223 @@
+import argparse
+import heapq
+import re
+from datetime import datetime
+
+from TelemetryParser import PacketAssembler, format_timestamp, read_lines, strip_line
+from PacketDeduplicator import payload_key
+
+# Zephyr log prefix with device uptime, e.g. [00:00:00.017,000]
+UPTIME_PATTERN = re.compile(r'^\[(\d+):(\d+):(\d+)\.(\d+),(\d+)\]\s*(.*)$')
+
+# Device lines printed by every ground station and satellite at start-up
+BANNERS = ('Ixys cubesat started', 'Sepsat Ground Station', 'ADCS Ground Station',
+           'Ground station main loop')
+
+
+def parse_uptime(match):
+    """Convert an uptime match to seconds"""
+    hours, minutes, seconds, millis, micros = (int(g) for g in match.groups()[:5])
+    return hours * 3600 + minutes * 60 + seconds + millis / 1e3 + micros / 1e6
+
+
+def fit_line(xs, ys):
+    """Least squares fit y = slope * x + intercept"""
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return 0.0, mean_y
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sxx
+    return slope, mean_y - slope * mean_x
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def extract_events(path):
+    """
+    Collect clock reference events from a port log
+
+    Returns:
+        tuple: (events, uptime_samples). events maps an event key to its
+        host times in order of appearance; uptime_samples is a list of
+        (device uptime, host time) pairs in seconds.
+    """
+    events = {}
+    uptime_samples = []
+    assembler = PacketAssembler()
+
+    def add_event(key, host_time):
+        events.setdefault(key, []).append(host_time)
+
+    for timestamp, message in read_lines(path):
+        if timestamp is None:
+            continue
+        host_time = timestamp.timestamp()
+        text = strip_line(message)
+
+        uptime = UPTIME_PATTERN.match(text)
+        if uptime:
+            uptime_samples.append((parse_uptime(uptime), host_time))
+
+        for banner in BANNERS:
+            if text.startswith(banner):
+                add_event(('banner', banner), host_time)
+
+        # Packets are keyed by payload and stamped at their header line
+        packet = assembler.feed(timestamp, message)
+        if packet:
+            add_event(('packet', payload_key(packet)), packet['timestamp'].timestamp())
+    packet = assembler.flush()
+    if packet:
+        add_event(('packet', payload_key(packet)), packet['timestamp'].timestamp())
+    return events, uptime_samples
+
+
+def estimate_device_clock(uptime_samples, min_span=60.0):
+    """
+    Relate device uptime to host time for one port
+
+    Host stamps only ever lag the device, so the boot time is taken as the
+    earliest host - uptime difference. Drift is only fitted when the samples
+    span at least min_span seconds of uptime, since the boot messages are
+    buffered by the device and arrive in one burst.
+
+    Returns:
+        dict or None: 'boot' (host epoch at uptime 0), 'drift_ppm', 'samples'
+    """
+    if not uptime_samples:
+        return None
+    boot = min(host - uptime for uptime, host in uptime_samples)
+    uptimes = [uptime for uptime, _ in uptime_samples]
+    drift_ppm = 0.0
+    if max(uptimes) - min(uptimes) >= min_span:
+        slope, _ = fit_line(uptimes, [host for _, host in uptime_samples])
+        drift_ppm = (slope - 1.0) * 1e6
+    return {'boot': boot, 'drift_ppm': drift_ppm, 'samples': len(uptime_samples)}
+
+
+class ClockCorrection:
+    def __init__(self, offset=0.0, drift=0.0, reference=0.0, matches=0):
+        """
+        Linear clock model mapping one port's host time onto another's
+
+        Args:
+            offset (float): Seconds to subtract at the reference time
+            drift (float): Additional seconds to subtract per second after reference
+            reference (float): Epoch seconds the offset refers to
+            matches (int): Number of shared events used for the estimate
+        """
+        self.offset = offset
+        self.drift = drift
+        self.reference = reference
+        self.matches = matches
+
+    def correct_seconds(self, seconds):
+        return seconds - (self.offset + self.drift * (seconds - self.reference))
+
+    def correct(self, timestamp):
+        """Map a datetime onto the reference port's clock"""
+        corrected = self.correct_seconds(timestamp.timestamp())
+        return datetime.fromtimestamp(corrected)
+
+    def __repr__(self):
+        return (f"ClockCorrection(offset={self.offset * 1e3:.1f} ms, "
+                f"drift={self.drift * 1e6:.1f} ppm, matches={self.matches})")
+
+
+def estimate_offset(events1, events2, min_drift_span=60.0):
+    """
+    Estimate how far port 2's host stamps are from port 1's
+
+    Events with the same key are paired in order of appearance. The offset
+    is the median difference, which ignores scheduling outliers between the
+    two reader threads; drift is fitted when the matches span at least
+    min_drift_span seconds.
+
+    Returns:
+        ClockCorrection: Correction to apply to port 2 times
+    """
+    pairs = []
+    for key, times1 in events1.items():
+        times2 = events2.get(key)
+        if times2:
+            pairs.extend(zip(times1, times2))
+    if not pairs:
+        return ClockCorrection()
+
+    pairs.sort()
+    differences = [t2 - t1 for t1, t2 in pairs]
+    reference = pairs[0][0]
+    offset = median(differences)
+    drift = 0.0
+    if pairs[-1][0] - reference >= min_drift_span:
+        drift, _ = fit_line([t1 - reference for t1, _ in pairs], differences)
+        # Residual median keeps the intercept robust to outliers
+        offset = median(d - drift * (t1 - reference) for (t1, _), d in zip(pairs, differences))
+    return ClockCorrection(offset, drift, reference, len(pairs))
+
+
+def corrected_lines(path, label, correction=None):
+    """Yield (corrected epoch, label, message) for every timestamped line"""
+    for timestamp, message in read_lines(path):
+        if timestamp is None:
+            continue
+        seconds = timestamp.timestamp()
+        if correction:
+            seconds = correction.correct_seconds(seconds)
+        yield seconds, label, message
+
+
+def merge_logs(path1, path2, output, correction=None):
+    """Merge two port logs in corrected time order"""
+    merged = heapq.merge(
+        corrected_lines(path1, 'port1'),
+        corrected_lines(path2, 'port2', correction),
+        key=lambda item: item[0]
+    )
+    count = 0
+    with open(output, 'w', encoding='utf-8') as f:
+        for seconds, label, message in merged:
+            f.write(f"{format_timestamp(datetime.fromtimestamp(seconds))},{label},{message}\n")
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate clock offset between two port logs")
+    parser.add_argument('port1_log', type=str, help='Reference port log (e.g. port1_data_*.txt)')
+    parser.add_argument('port2_log', type=str, help='Port log to correct (e.g. port2_data_*.txt)')
+    parser.add_argument('--merge', '-m', type=str, help='Write both logs merged in corrected time order')
+    args = parser.parse_args()
+
+    events1, uptime1 = extract_events(args.port1_log)
+    events2, uptime2 = extract_events(args.port2_log)
+
+    for name, samples in (('Port 1', uptime1), ('Port 2', uptime2)):
+        clock = estimate_device_clock(samples)
+        if clock:
+            boot = format_timestamp(datetime.fromtimestamp(clock['boot']))
+            print(f"{name}: device boot at {boot} host time, drift {clock['drift_ppm']:.1f} ppm "
+                  f"({clock['samples']} samples)")
+        else:
+            print(f"{name}: no device uptime stamps")
+
+    correction = estimate_offset(events1, events2)
+    if correction.matches == 0:
+        print("No shared events found; logs cannot be aligned")
+        return
+    print(f"Port 2 vs Port 1: {correction}")
+
+    if args.merge:
+        count = merge_logs(args.port1_log, args.port2_log, args.merge, correction)
+        print(f"Merged {count} lines into {args.merge}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,585 @@
+import argparse
+import gzip
+import logging
+import math
+import os
+import struct
+import time
+from datetime import datetime
+
+import numpy as np
+
+from TelemetryParser import PacketAssembler, read_packets
+
+# File: MAGIC, then blocks of (length, payload). Each payload holds up to
+# block_size packets stored column by column.
+MAGIC = b'PXC1'
+BLOCK_HEADER = struct.Struct('<I')
+FLOAT = struct.Struct('<d')
+UINT64 = struct.Struct('<Q')
+
+# Column encodings
+TIME = b't'      # milliseconds, delta-of-delta, zigzag varint
+INTEGER = b'i'   # delta, zigzag varint
+DECIMAL = b'd'   # floats with few decimals: scaled to integers, then as INTEGER
+XOR = b'x'       # other floats: XOR with the previous value, zero bytes trimmed
+STRING = b's'    # dictionary of distinct strings + varint indices
+ARRAY = b'a'     # list values: INTEGER lengths + one flattened numeric column
+MIXED = b'm'     # prefix of a DECIMAL/XOR column that also holds ints: their rows
+OTHER = b'o'     # numbers mixed with other values: rows and column of the others, then the numbers
+
+MAX_SCALE = 6
+# Columns at least this long are decoded with numpy
+VECTOR_MIN = 32
+
+
+def write_varint(out, value):
+    """Append an unsigned LEB128 varint to a bytearray"""
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def encode_deltas(out, values, order=1):
+    """Write integers as zigzag varints of their first (or second) differences"""
+    previous = previous_delta = 0
+    for value in values:
+        delta = value - previous
+        previous = value
+        if order == 2:
+            delta, previous_delta = delta - previous_delta, delta
+        write_varint(out, zigzag(delta))
+
+
+def decode_deltas(data, position, count, order=1):
+    """Read 'count' values written by encode_deltas; returns (values, position)"""
+    if count >= VECTOR_MIN:
+        decoded = decode_deltas_vector(data, position, count, order)
+        if decoded is not None:
+            return decoded
+    values = []
+    previous = previous_delta = 0
+    for _ in range(count):
+        raw, position = read_varint(data, position)
+        delta = unzigzag(raw)
+        if order == 2:
+            delta += previous_delta
+            previous_delta = delta
+        previous += delta
+        values.append(previous)
+    return values, position
+
+
+def decode_deltas_vector(data, position, count, order=1):
+    """
+    decode_deltas without a Python loop per value
+
+    Varint ends are the bytes below 0x80; each value is the sum of its
+    7-bit groups shifted into place, then the deltas are summed back up.
+    Returns None for values wider than 63 bits, which take the slow path.
+    """
+    window = np.frombuffer(data, np.uint8, min(len(data) - position, count * 10), position)
+    ends = np.flatnonzero(window < 0x80)[:count]
+    if len(ends) < count:
+        raise ValueError("Truncated column")
+    starts = np.empty(count, np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    if lengths.max() > 9:
+        return None
+    size = int(ends[-1]) + 1
+    within = np.arange(size) - np.repeat(starts, lengths)
+    groups = (window[:size] & 0x7f).astype(np.uint64) << (within * 7).astype(np.uint64)
+    raw = np.add.reduceat(groups, starts)
+    deltas = (raw >> np.uint64(1)).astype(np.int64) ^ -(raw & np.uint64(1)).astype(np.int64)
+    values = np.cumsum(deltas)
+    if order == 2:
+        values = np.cumsum(values)
+    return values.tolist(), position + size
+
+
+def decimal_scale(values):
+    """Smallest number of decimals that represents every value exactly, or None"""
+    if not all(math.isfinite(value) for value in values):
+        # 'nan' and 'inf' readings go to the XOR encoding
+        return None
+    for scale in range(MAX_SCALE + 1):
+        factor = 10 ** scale
+        if all(round(value * factor) / factor == value for value in values):
+            return scale
+    return None
+
+
+def encode_xor(out, values):
+    """
+    Gorilla-style float compression, byte aligned
+
+    Each value is XORed with the previous one. Slowly changing values share
+    sign, exponent and leading mantissa bits, so the XOR has many leading
+    and trailing zero bytes; a control byte records how many and only the
+    bytes in between are stored. Repeats cost one byte.
+    """
+    previous = 0
+    for value in values:
+        bits = UINT64.unpack(FLOAT.pack(value))[0]
+        xor = bits ^ previous
+        previous = bits
+        if xor == 0:
+            out.append(0)
+            continue
+        raw = UINT64.pack(xor)
+        trailing = len(raw) - len(raw.lstrip(b'\0'))
+        leading = len(raw) - len(raw.rstrip(b'\0'))
+        out.append(1 + leading * 8 + trailing)
+        out += raw[trailing:8 - leading]
+
+
+def decode_xor(data, position, count):
+    values = []
+    previous = 0
+    for _ in range(count):
+        control = data[position]
+        position += 1
+        if control:
+            leading, trailing = divmod(control - 1, 8)
+            size = 8 - leading - trailing
+            chunk = bytes(trailing) + bytes(data[position:position + size]) + bytes(leading)
+            position += size
+            previous ^= UINT64.unpack(chunk)[0]
+        values.append(FLOAT.unpack(UINT64.pack(previous))[0])
+    return values, position
+
+
+def encode_numeric(out, values):
+    """Pick the tightest encoding for a list of numbers and write it"""
+    int_rows = [row for row, value in enumerate(values) if isinstance(value, int)]
+    if len(int_rows) == len(values):
+        out += INTEGER
+        encode_deltas(out, values)
+        return
+    if int_rows:
+        # Keep 21 apart from 21.0 when a column holds both
+        out += MIXED
+        write_varint(out, len(int_rows))
+        encode_deltas(out, int_rows)
+    scale = decimal_scale(values)
+    if scale is not None:
+        factor = 10 ** scale
+        out += DECIMAL
+        out.append(scale)
+        encode_deltas(out, [round(value * factor) for value in values])
+        # '-0.00' is a valid reading; keep the sign the integers lose
+        negative_zeros = [row for row, value in enumerate(values)
+                          if value == 0 and math.copysign(1, value) < 0]
+        write_varint(out, len(negative_zeros))
+        encode_deltas(out, negative_zeros)
+        return
+    out += XOR
+    encode_xor(out, [float(value) for value in values])
+
+
+def decode_numeric(data, position, count):
+    kind = data[position:position + 1]
+    position += 1
+    if kind == MIXED:
+        size, position = read_varint(data, position)
+        int_rows, position = decode_deltas(data, position, size)
+        values, position = decode_numeric(data, position, count)
+        for row in int_rows:
+            values[row] = int(values[row])
+        return values, position
+    if kind == INTEGER:
+        return decode_deltas(data, position, count)
+    if kind == DECIMAL:
+        factor = 10 ** data[position]
+        values, position = decode_deltas(data, position + 1, count)
+        values = [value / factor for value in values]
+        zeros, position = read_varint(data, position)
+        rows, position = decode_deltas(data, position, zeros)
+        for row in rows:
+            values[row] = -0.0
+        return values, position
+    return decode_xor(data, position, count)
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def encode_column(out, values):
+    """Write one column (values of present rows only)"""
+    if all(is_number(value) for value in values):
+        encode_numeric(out, values)
+    elif all(isinstance(value, list) and all(is_number(item) for item in value) for value in values):
+        out += ARRAY
+        encode_deltas(out, [len(value) for value in values])
+        flat = [item for value in values for item in value]
+        write_varint(out, len(flat))
+        if flat:
+            encode_numeric(out, flat)
+    elif any(is_number(value) for value in values):
+        # A stray 'N/A' must not turn the readings around it into text
+        others = [row for row, value in enumerate(values) if not is_number(value)]
+        out += OTHER
+        write_varint(out, len(others))
+        encode_deltas(out, others)
+        encode_column(out, [values[row] for row in others])
+        encode_numeric(out, [value for value in values if is_number(value)])
+    else:
+        out += STRING
+        strings = {}
+        indices = [strings.setdefault(str(value), len(strings)) for value in values]
+        write_varint(out, len(strings))
+        for text in strings:
+            encoded = text.encode('utf-8')
+            write_varint(out, len(encoded))
+            out += encoded
+        for index in indices:
+            write_varint(out, index)
+
+
+def decode_column(data, position, count):
+    kind = data[position:position + 1]
+    if kind in (INTEGER, DECIMAL, XOR, MIXED):
+        return decode_numeric(data, position, count)
+    position += 1
+    if kind == OTHER:
+        size, position = read_varint(data, position)
+        others, position = decode_deltas(data, position, size)
+        other_values, position = decode_column(data, position, size)
+        numbers, position = decode_numeric(data, position, count - size)
+        values = []
+        next_number = iter(numbers)
+        other_rows = dict(zip(others, other_values))
+        for row in range(count):
+            values.append(other_rows[row] if row in other_rows else next(next_number))
+        return values, position
+    if kind == ARRAY:
+        lengths, position = decode_deltas(data, position, count)
+        total, position = read_varint(data, position)
+        flat = []
+        if total:
+            flat, position = decode_numeric(data, position, total)
+        values = []
+        start = 0
+        for length in lengths:
+            values.append(flat[start:start + length])
+            start += length
+        return values, position
+    size, position = read_varint(data, position)
+    strings = []
+    for _ in range(size):
+        length, position = read_varint(data, position)
+        strings.append(bytes(data[position:position + length]).decode('utf-8'))
+        position += length
+    values = []
+    for _ in range(count):
+        index, position = read_varint(data, position)
+        values.append(strings[index])
+    return values, position
+
+
+def timestamp_ms(timestamp):
+    """Milliseconds since the epoch of a naive local datetime (0 for None)"""
+    if timestamp is None:
+        return 0
+    return int(timestamp.replace(microsecond=0).timestamp()) * 1000 + timestamp.microsecond // 1000
+
+
+def encode_block(packets):
+    """
+    Encode packets column by column
+
+    Returns:
+        bytes: Block payload
+    """
+    out = bytearray()
+    count = len(packets)
+    write_varint(out, count)
+    names = []
+    for packet in packets:
+        for name in packet:
+            if name != 'timestamp' and name not in names and packet[name] is not None:
+                names.append(name)
+
+    # Host time in ms (truncated like the log files): nearly constant
+    # spacing, so the delta-of-delta is tiny
+    out += TIME
+    encode_deltas(out, [timestamp_ms(packet.get('timestamp')) for packet in packets], order=2)
+
+    write_varint(out, len(names))
+    for name in names:
+        encoded = name.encode('utf-8')
+        write_varint(out, len(encoded))
+        out += encoded
+        present = [packet.get(name) is not None for packet in packets]
+        if all(present):
+            out.append(1)
+        else:
+            # Presence bitmap for fields missing from some packets
+            out.append(0)
+            bitmap = bytearray((count + 7) // 8)
+            for row, flag in enumerate(present):
+                if flag:
+                    bitmap[row // 8] |= 1 << (row % 8)
+            out += bitmap
+        encode_column(out, [packet[name] for packet in packets if packet.get(name) is not None])
+    return bytes(out)
+
+
+def decode_block(data):
+    """
+    Decode a block into columns
+
+    Returns:
+        tuple: (row count, {'time': [ms, ...], name: [value or None, ...]})
+    """
+    data = memoryview(data)
+    count, position = read_varint(data, 0)
+    position += 1
+    times, position = decode_deltas(data, position, count, order=2)
+    columns = {'time': times}
+    fields, position = read_varint(data, position)
+    for _ in range(fields):
+        length, position = read_varint(data, position)
+        name = bytes(data[position:position + length]).decode('utf-8')
+        position += length
+        full = data[position]
+        position += 1
+        if full:
+            values, position = decode_column(data, position, count)
+        else:
+            bitmap = data[position:position + (count + 7) // 8]
+            position += (count + 7) // 8
+            rows = [row for row in range(count) if bitmap[row // 8] >> (row % 8) & 1]
+            present, position = decode_column(data, position, len(rows))
+            values = [None] * count
+            for row, value in zip(rows, present):
+                values[row] = value
+        columns[name] = values
+    return count, columns
+
+
+def columns_to_packets(count, columns):
+    """Rebuild packet dicts from decoded columns"""
+    names = [name for name in columns if name != 'time']
+    packets = []
+    for row in range(count):
+        seconds, ms = divmod(columns['time'][row], 1000)
+        timestamp = datetime.fromtimestamp(seconds).replace(microsecond=ms * 1000) if seconds else None
+        packet = {'timestamp': timestamp}
+        for name in names:
+            value = columns[name][row]
+            if value is not None:
+                packet[name] = value
+        packets.append(packet)
+    return packets
+
+
+class ColumnWriter:
+    def __init__(self, path, block_size=1024):
+        """
+        Stream packets into a column-encoded file during capture
+
+        Packets are buffered until block_size are collected, then encoded
+        and appended as one block, so at most one block is lost if the
+        process dies. close() writes the final partial block.
+
+        Args:
+            path (str): Output file, usually '<session>.pxc'
+            block_size (int): Packets per block
+        """
+        self.path = path
+        self.block_size = block_size
+        self.pending = []
+        self.blocks = 0
+        self.packets = 0
+        self.dropped = 0
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write_packet(self, packet):
+        # 'receptions' of combined packets are per-port copies, not columns
+        self.pending.append({key: value for key, value in packet.items() if key != 'receptions'})
+        if len(self.pending) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            payload = encode_block(self.pending)
+        except (ValueError, OverflowError, TypeError) as e:
+            # Drop the block rather than failing on every later packet
+            self.dropped += len(self.pending)
+            self.pending = []
+            logging.getLogger('main').error(f"Column encoding failed, block dropped: {e}")
+            return
+        self.file.write(BLOCK_HEADER.pack(len(payload)) + payload)
+        self.file.flush()
+        self.packets += len(self.pending)
+        self.blocks += 1
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def read_blocks(path):
+    """Yield (row count, columns) for each block of a column file"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a column file")
+        while True:
+            header = f.read(BLOCK_HEADER.size)
+            if len(header) < BLOCK_HEADER.size:
+                return
+            payload = f.read(BLOCK_HEADER.unpack(header)[0])
+            yield decode_block(payload)
+
+
+def benchmark(path, block_size=1024, repeat=5):
+    """Compare size and decode time of the column codec with gzip"""
+    raw = open(path, 'rb').read()
+    packets = list(read_packets(path))
+    if not packets:
+        return None
+
+    # Text of the packet lines only, for a like-for-like comparison
+    assembler = PacketAssembler()
+    packet_lines = []
+    for line in raw.decode('utf-8', errors='replace').splitlines():
+        assembler.feed(None, line[24:])
+        if assembler.current is not None:
+            packet_lines.append(line)
+    packet_text = ('\n'.join(packet_lines) + '\n').encode('utf-8')
+
+    blocks = [encode_block(packets[i:i + block_size]) for i in range(0, len(packets), block_size)]
+    codec_size = sum(len(block) + BLOCK_HEADER.size for block in blocks) + len(MAGIC)
+    gzip_raw = gzip.compress(raw, 6)
+    gzip_packets = gzip.compress(packet_text, 6)
+
+    def timed(function):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def decode_gzip():
+        assembler = PacketAssembler()
+        for line in gzip.decompress(gzip_packets).decode('utf-8').splitlines():
+            assembler.feed(None, line[24:])
+
+    codec_time = timed(lambda: [decode_block(block) for block in blocks])
+    gunzip_time = timed(lambda: gzip.decompress(gzip_packets))
+    gzip_parse_time = timed(decode_gzip)
+
+    # Round trip check
+    decoded = []
+    for block in blocks:
+        decoded.extend(columns_to_packets(*decode_block(block)))
+    exact = decoded == [{k: v for k, v in p.items() if v is not None} for p in packets]
+    return {
+        'packets': len(packets),
+        'raw': len(raw),
+        'gzip_raw': len(gzip_raw),
+        'packet_text': len(packet_text),
+        'gzip_packets': len(gzip_packets),
+        'codec': codec_size,
+        'gzip_codec': len(gzip.compress(b''.join(blocks), 6)),
+        'codec_decode': codec_time,
+        'gunzip': gunzip_time,
+        'gunzip_parse': gzip_parse_time,
+        'round_trip': exact,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Column codec for parsed packets: encode, decode and benchmark")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    encode = subparsers.add_parser('encode', help='Encode the packets of session logs')
+    encode.add_argument('log_files', nargs='+')
+    encode.add_argument('--block-size', type=int, default=1024)
+    dump = subparsers.add_parser('dump', help='Print the packets of a .pxc file as CSV')
+    dump.add_argument('column_file')
+    bench = subparsers.add_parser('bench', help='Compare with gzip on session logs')
+    bench.add_argument('log_files', nargs='+')
+    bench.add_argument('--block-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    if args.command == 'encode':
+        for path in args.log_files:
+            out = os.path.splitext(path)[0] + '.pxc'
+            writer = ColumnWriter(out, args.block_size)
+            for packet in read_packets(path):
+                writer.write_packet(packet)
+            writer.close()
+            print(f"{out}: {writer.packets} packets in {writer.blocks} block(s), {os.path.getsize(out)} bytes")
+    elif args.command == 'dump':
+        header = None
+        for count, columns in read_blocks(args.column_file):
+            if header is None:
+                header = ['timestamp'] + [name for name in columns if name != 'time']
+                print(','.join(header))
+            for packet in columns_to_packets(count, columns):
+                row = []
+                for name in header:
+                    value = packet.get(name)
+                    if value is None:
+                        row.append('')
+                    elif name == 'timestamp':
+                        row.append(value.isoformat(sep=' ', timespec='milliseconds'))
+                    elif isinstance(value, list):
+                        row.append(' '.join(str(item) for item in value))
+                    else:
+                        row.append(str(value).replace(',', ' '))
+                print(','.join(row))
+    else:
+        for path in args.log_files:
+            result = benchmark(path, args.block_size)
+            if result is None:
+                print(f"{path}: no packets")
+                continue
+            print(f"{path}: {result['packets']} packets")
+            print(f"  raw log             {result['raw']:>10,d} bytes")
+            print(f"  gzip raw log        {result['gzip_raw']:>10,d} bytes")
+            print(f"  packet lines        {result['packet_text']:>10,d} bytes")
+            print(f"  gzip packet lines   {result['gzip_packets']:>10,d} bytes")
+            print(f"  column codec        {result['codec']:>10,d} bytes "
+                  f"({result['packet_text'] / result['codec']:.1f}x vs text, "
+                  f"{result['gzip_packets'] / result['codec']:.1f}x vs gzip)")
+            print(f"  gzip(column codec)  {result['gzip_codec']:>10,d} bytes")
+            print(f"  decode: codec {result['codec_decode'] * 1000:.2f} ms, "
+                  f"gunzip {result['gunzip'] * 1000:.2f} ms, "
+                  f"gunzip+parse {result['gunzip_parse'] * 1000:.2f} ms")
+            print(f"  exact round trip: {result['round_trip']}")
+
+if __name__ == "__main__":
+    main()
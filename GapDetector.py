@@ -0,0 +1,145 @@
+import json
+import threading
+
+from TelemetryParser import format_timestamp
+
+
+class SequenceState:
+    __slots__ = ('last', 'step', 'highest', 'received', 'missing', 'duplicates',
+                 'gaps', 'wraps', 'first_time', 'last_time')
+
+    def __init__(self):
+        self.last = None
+        self.step = None
+        self.highest = 0
+        self.received = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.wraps = 0
+        self.first_time = None
+        self.last_time = None
+
+    def stats(self):
+        expected = self.received - self.duplicates + self.missing
+        return {
+            'received': self.received,
+            'missing': self.missing,
+            'duplicates': self.duplicates,
+            'gaps': self.gaps,
+            'wraps': self.wraps,
+            'loss_ratio': round(self.missing / expected, 4) if expected else 0.0,
+            'step': self.step,
+            'first': format_timestamp(self.first_time) if self.first_time else None,
+            'last': format_timestamp(self.last_time) if self.last_time else None,
+        }
+
+
+class GapDetector:
+    def __init__(self, on_event=None, key_field='port', idle_states=(0,), step=None,
+                 duplicate_window=2):
+        """
+        Track 'dataindex' continuity per stream and report gaps and duplicates
+
+        The index advances by a fixed step (one per storedData value) and
+        wraps to 0 after its highest value. The step is taken from the
+        storedData length when not given, and the wrap point is learned
+        from the highest index seen. Every packet costs O(1).
+
+        Args:
+            on_event (callable): Called with each gap/duplicate/wrap event dict
+            key_field (str): Packet field that identifies a stream
+            idle_states (tuple): 'state' values whose packets carry no sequence
+            step (int): Index increment per packet, None to infer it
+            duplicate_window (int): Backward jumps of at most this many steps
+                count as duplicates rather than a wrap
+        """
+        self.on_event = on_event
+        self.key_field = key_field
+        self.idle_states = idle_states
+        self.step = step
+        self.duplicate_window = duplicate_window
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def add(self, packet):
+        """Check one packet; returns the event it raised, if any"""
+        index = packet.get('dataindex')
+        if not isinstance(index, int) or packet.get('state') in self.idle_states:
+            return None
+
+        key = packet.get(self.key_field)
+        with self.lock:
+            state = self.streams.get(key)
+            if state is None:
+                state = self.streams[key] = SequenceState()
+            event = self._update(state, index, packet)
+        if event and self.on_event:
+            event['stream'] = key
+            self.on_event(event)
+        return event
+
+    def _update(self, state, index, packet):
+        timestamp = packet.get('timestamp')
+        state.received += 1
+        state.last_time = timestamp
+        if state.step is None:
+            state.step = self.step or len(packet.get('storedData') or ()) or 1
+
+        last = state.last
+        if last is None:
+            state.first_time = timestamp
+            state.last = index
+            state.highest = index
+            return None
+
+        step = state.step
+        state.highest = max(state.highest, index)
+        expected = last + step
+        event = None
+
+        if index == expected:
+            pass
+        elif index > expected:
+            missing = (index - expected) // step
+            state.missing += missing
+            state.gaps += 1
+            event = {'type': 'gap', 'expected': expected, 'received': index, 'missing': missing}
+        elif last - self.duplicate_window * step <= index <= last:
+            # Repeated or late packet; keep the newest position
+            state.duplicates += 1
+            return {'type': 'duplicate', 'received': index, 'last': last,
+                    'timestamp': timestamp}
+        else:
+            # Wrapped around after the highest index
+            modulus = state.highest + step
+            missing = ((modulus - expected) + index) // step
+            state.wraps += 1
+            if missing:
+                state.missing += missing
+                state.gaps += 1
+                event = {'type': 'gap', 'expected': expected % modulus, 'received': index,
+                         'missing': missing, 'wrapped': True}
+
+        state.last = index
+        if event:
+            event['timestamp'] = timestamp
+        return event
+
+    def stats(self):
+        """Per-stream loss statistics"""
+        with self.lock:
+            return {str(key): state.stats() for key, state in self.streams.items()}
+
+    def write_stats(self, path):
+        """Write per-stream loss statistics as JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats(), f, indent=2)
+
+
+def describe_event(event):
+    """One-line description of a detector event for the console"""
+    if event['type'] == 'gap':
+        return (f"[{event['stream']}] gap: expected dataindex {event['expected']}, "
+                f"got {event['received']} ({event['missing']} packet(s) missing)")
+    return f"[{event['stream']}] duplicate dataindex {event['received']}"
@@ -0,0 +1,298 @@
+import argparse
+import fnmatch
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+import serial.tools.list_ports
+
+from Sinks import setup_main_logger
+
+LOGGER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Logger.py')
+# Port attributes a rule can match on
+MATCH_KEYS = ('device', 'name', 'description', 'hwid', 'vid', 'pid', 'serial_number',
+              'location', 'manufacturer', 'product', 'interface')
+
+
+def port_attributes(port):
+    """Matchable attributes of a list_ports entry, vid/pid as 4-digit hex"""
+    attributes = {}
+    for key in MATCH_KEYS:
+        value = getattr(port, key, None)
+        if value is None:
+            continue
+        if key in ('vid', 'pid'):
+            value = f"{value:04x}"
+        attributes[key] = str(value)
+    return attributes
+
+
+def port_identity(attributes):
+    """Path plus USB identity, so another device on a reused path counts as new"""
+    return (attributes['device'], attributes.get('vid'), attributes.get('pid'), attributes.get('serial_number'))
+
+
+class Rule:
+    def __init__(self, match, prefix='hotplug_{name}', baudrate=115200, args=None):
+        """
+        Which devices to capture and how
+
+        Args:
+            match (dict): Port attribute -> glob pattern, all must match
+                (e.g. {"vid": "1915", "description": "*nRF*"}); vid and pid
+                are compared as 4-digit lowercase hex
+            prefix (str): Log folder prefix; {name}, {serial}, {vid} and
+                {pid} are filled in from the device so every device gets
+                its own folder
+            baudrate (int): Baud rate, or 0 to detect it (--autobaud)
+            args (list): Extra Logger.py options, e.g. ["--sqlite"]
+        """
+        self.match = {key: str(pattern).lower() for key, pattern in match.items()}
+        self.prefix = prefix
+        self.baudrate = baudrate
+        self.args = list(args or ())
+        unknown = set(self.match) - set(MATCH_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown match keys: {', '.join(sorted(unknown))}")
+
+    def matches(self, attributes):
+        return all(fnmatch.fnmatch(attributes.get(key, '').lower(), pattern)
+                   for key, pattern in self.match.items())
+
+    def folder_prefix(self, attributes):
+        values = {
+            'name': attributes.get('name') or os.path.basename(attributes['device']),
+            'serial': attributes.get('serial_number', 'noserial'),
+            'vid': attributes.get('vid', ''),
+            'pid': attributes.get('pid', ''),
+        }
+        return re.sub(r'[^A-Za-z0-9_.-]+', '_', self.prefix.format(**values))
+
+    def command(self, attributes):
+        """Logger.py command line for a matching device"""
+        command = [sys.executable, LOGGER_SCRIPT, '--daemon', '--port', attributes['device'],
+                   '--prefix', self.folder_prefix(attributes)]
+        if self.baudrate:
+            command += ['--baudrate', str(self.baudrate)]
+        else:
+            command.append('--autobaud')
+        return command + self.args
+
+
+def load_rules(path):
+    """
+    Read rules from a JSON file:
+    {"rules": [{"match": {...}, "prefix": "...", "baudrate": 115200, "args": [...]}]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return [Rule(**entry) for entry in config.get('rules', [])]
+
+
+class Capture:
+    def __init__(self, attributes, rule):
+        """
+        One Logger.py daemon capturing one device
+
+        Each device runs in its own process, so starting, stopping or
+        crashing one capture never touches the others.
+
+        Args:
+            attributes (dict): Port attributes of the device
+            rule (Rule): The rule that matched it
+        """
+        self.attributes = attributes
+        self.rule = rule
+        self.device = attributes['device']
+        self.process = None
+        self.started = None
+        self.stop_requested = None
+        self.restarts = 0
+
+    def start(self):
+        # A session of its own: a Ctrl+C in the daemon's terminal must not
+        # reach the loggers directly, the daemon stops them itself
+        self.process = subprocess.Popen(self.rule.command(self.attributes), stdout=subprocess.DEVNULL,
+                                        start_new_session=True)
+        self.started = time.monotonic()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def request_stop(self):
+        """Ask the logger to stop like Ctrl+C (it shuts down cleanly on SIGTERM)"""
+        if self.alive:
+            self.process.send_signal(signal.SIGTERM)
+        self.stop_requested = time.monotonic()
+
+    def reap(self, timeout=15):
+        """
+        Check on a capture asked to stop, without waiting for it
+
+        Returns:
+            bool: True once the process has exited; it is killed if it is
+            still running 'timeout' seconds after the request
+        """
+        if self.process is None or self.process.poll() is not None:
+            return True
+        if time.monotonic() - self.stop_requested >= timeout:
+            self.process.kill()
+        return False
+
+
+class HotplugDaemon:
+    def __init__(self, rules, interval=2.0, scan=None, restart_delay=10.0):
+        """
+        Start and stop captures as serial devices come and go
+
+        The port list is polled and diffed with the previous one. A device
+        must be seen on two polls in a row before capture starts, which
+        gives udev time to set permissions. A capture whose process exits
+        while the device is still present is restarted after restart_delay.
+        Captures of removed devices are sent SIGTERM and reaped on later
+        polls, so a slow shutdown never holds up other devices.
+
+        Args:
+            rules (list): Rule objects, first match wins
+            interval (float): Seconds between port scans
+            scan (callable): Returns the current ports (default: list_ports.comports)
+            restart_delay (float): Seconds before restarting a capture that exited
+        """
+        self.rules = rules
+        self.interval = interval
+        self.scan = scan or serial.tools.list_ports.comports
+        self.restart_delay = restart_delay
+        self.present = {}
+        self.pending = set()
+        self.captures = {}
+        self.stopping = []
+        self.running = False
+        self.main_logger = setup_main_logger()
+
+    def rule_for(self, attributes):
+        for rule in self.rules:
+            if rule.matches(attributes):
+                return rule
+        return None
+
+    def poll(self):
+        """Scan once and react to arrivals, removals and exited captures"""
+        current = {}
+        for port in self.scan():
+            attributes = port_attributes(port)
+            current[port_identity(attributes)] = attributes
+
+        for identity in self.present.keys() - current.keys():
+            self.removed(identity, self.present[identity])
+        arrived = current.keys() - self.present.keys()
+        for identity in arrived:
+            self.main_logger.info(f"Device arrived: {current[identity]['device']} "
+                                  f"({current[identity].get('description', 'n/a')})")
+        # Start devices that were already pending on the previous scan
+        for identity in self.pending & current.keys():
+            self.arrived(identity, current[identity])
+        self.pending = set(arrived)
+        self.present = current
+
+        self.reap()
+
+        now = time.monotonic()
+        for identity, capture in list(self.captures.items()):
+            if not capture.alive and now - capture.started >= self.restart_delay:
+                self.main_logger.warning(f"Capture of {capture.device} exited "
+                                         f"(code {capture.process.returncode}), restarting")
+                capture.restarts += 1
+                capture.start()
+
+    def arrived(self, identity, attributes):
+        rule = self.rule_for(attributes)
+        if rule is None:
+            self.main_logger.info(f"No rule matches {attributes['device']}, ignoring")
+            return
+        capture = Capture(attributes, rule)
+        capture.start()
+        self.captures[identity] = capture
+        self.main_logger.info(f"Capturing {capture.device} into logs_{rule.folder_prefix(attributes)} "
+                              f"(pid {capture.process.pid})")
+
+    def removed(self, identity, attributes):
+        self.main_logger.info(f"Device removed: {attributes['device']}")
+        capture = self.captures.pop(identity, None)
+        if capture:
+            capture.request_stop()
+            self.stopping.append(capture)
+
+    def reap(self):
+        """Collect captures that finished stopping"""
+        for capture in list(self.stopping):
+            if capture.reap():
+                self.stopping.remove(capture)
+                code = capture.process.returncode if capture.process else None
+                self.main_logger.info(f"Stopped capture of {capture.device} (code {code})")
+
+    def status(self):
+        return {
+            capture.device: {'pid': capture.process.pid, 'alive': capture.alive, 'restarts': capture.restarts,
+                             'uptime': round(time.monotonic() - capture.started)}
+            for capture in self.captures.values()
+        }
+
+    def run(self):
+        self.running = True
+        self.main_logger.info(f"Watching serial ports every {self.interval}s with {len(self.rules)} rule(s)")
+        try:
+            while self.running:
+                self.poll()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stop(self, timeout=15):
+        self.running = False
+        self.main_logger.info("Stopping all captures...")
+        # Signal every capture first so they shut down in parallel, including
+        # those of removed devices that are still stopping
+        for identity in list(self.captures):
+            capture = self.captures.pop(identity)
+            capture.request_stop()
+            self.stopping.append(capture)
+        deadline = time.monotonic() + timeout
+        try:
+            while self.stopping:
+                self.reap()
+                if self.stopping and time.monotonic() >= deadline:
+                    for capture in self.stopping:
+                        capture.process.kill()
+                time.sleep(0.1 if self.stopping else 0)
+        finally:
+            # Interrupted again: never leave a logger running unsupervised
+            for capture in self.stopping:
+                if capture.alive:
+                    capture.process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture serial devices automatically as they are plugged in")
+    parser.add_argument('--rules', type=str, help='JSON rules file (default: capture every port at 115200)')
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between port scans')
+    parser.add_argument('--list', action='store_true', help='Print the attributes of the current ports and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for port in serial.tools.list_ports.comports():
+            print(json.dumps(port_attributes(port)))
+        return
+
+    rules = load_rules(args.rules) if args.rules else [Rule({'device': '*'})]
+    # Service managers stop daemons with SIGTERM: shut down like Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    HotplugDaemon(rules, args.interval).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import re
+
+from Sinks import TextSink
+from TelemetryParser import ADCS_PATTERN, FIELD_PATTERN, HEADER_PATTERN, strip_line
+
+# Zephyr log line, e.g. [00:00:00.017,000] <inf> fs_nvs: data wra: 0, 12
+ZEPHYR_LOG_PATTERN = re.compile(
+    r'^\[\d+:\d+:\d+\.\d+,\d+\]\s*<(?P<severity>\w+)>\s*(?P<module>[\w.]+):'
+)
+
+# Zephyr severities from least to most severe
+SEVERITIES = ('dbg', 'inf', 'wrn', 'err')
+
+# Line classes
+TELEMETRY = 'telemetry'
+DEVICE_LOG = 'device_log'
+CONSOLE = 'console'
+SHELL = 'shell'
+
+
+class LineClassifier:
+    def __init__(self):
+        """
+        Classify device lines by kind, severity and module
+
+        Telemetry lines are the 'Received Message' header and the field
+        lines that follow it, so the classifier keeps track of whether a
+        packet is open.
+        """
+        self.in_packet = False
+
+    def classify(self, line):
+        """
+        Classify one raw device line
+
+        Returns:
+            tuple: (kind, severity, module, text) where text has prompts and
+            ANSI codes removed. severity and module are None except for
+            Zephyr log lines.
+        """
+        text = strip_line(line)
+        if not text:
+            return SHELL, None, None, text
+
+        log = ZEPHYR_LOG_PATTERN.match(text)
+        if log:
+            self.in_packet = False
+            return DEVICE_LOG, log.group('severity'), log.group('module'), text
+
+        if HEADER_PATTERN.search(text):
+            self.in_packet = True
+            return TELEMETRY, None, None, text
+
+        if self.in_packet and (FIELD_PATTERN.match(text) or ADCS_PATTERN.match(text)):
+            return TELEMETRY, None, None, text
+
+        self.in_packet = False
+        return CONSOLE, None, None, text
+
+
+class Route:
+    def __init__(self, name, kinds, min_severity=None, modules=None, exclude_modules=None):
+        """
+        One output stream and the lines it accepts
+
+        Args:
+            name (str): Stream name, used in the file name
+            kinds (tuple): Line classes accepted by the stream
+            min_severity (str): Lowest Zephyr severity accepted ('dbg'..'err').
+                When set, lines without a severity are dropped.
+            modules (tuple): Only accept device logs from these modules
+            exclude_modules (tuple): Drop device logs from these modules
+        """
+        self.name = name
+        self.kinds = set(kinds)
+        self.min_level = SEVERITIES.index(min_severity) if min_severity else None
+        self.modules = set(modules) if modules else None
+        self.exclude_modules = set(exclude_modules or ())
+        self.sink = None
+        self.routed = 0
+
+    def accepts(self, kind, severity, module):
+        if kind not in self.kinds:
+            return False
+        if self.min_level is not None:
+            if severity not in SEVERITIES or SEVERITIES.index(severity) < self.min_level:
+                return False
+        if module is not None:
+            if self.modules is not None and module not in self.modules:
+                return False
+            if module in self.exclude_modules:
+                return False
+        return True
+
+
+def default_routes():
+    """Telemetry, device log and error streams"""
+    return [
+        Route('telemetry', (TELEMETRY,)),
+        Route('device', (DEVICE_LOG, CONSOLE)),
+        Route('errors', (DEVICE_LOG,), min_severity='wrn'),
+    ]
+
+
+class LineRouter:
+    def __init__(self, log_dir, timestamp, routes=None, drop_kinds=(SHELL,), sink_factory=None):
+        """
+        Route classified device lines into separate log files
+
+        Each route writes '<name>_<timestamp>.txt' in the session folder,
+        using the same 'timestamp,message' format as the raw capture. Files
+        are only created once a line is routed to them.
+
+        Args:
+            log_dir (str): Session folder
+            timestamp (str): Session timestamp used in file names
+            routes (list): Route objects (default: default_routes())
+            drop_kinds (tuple): Line classes never routed anywhere
+            sink_factory (callable): Optional factory taking the route name
+                and returning a sink, e.g. for segmented files
+        """
+        self.classifier = LineClassifier()
+        self.routes = routes if routes is not None else default_routes()
+        self.drop_kinds = set(drop_kinds)
+        self.dropped = 0
+        self.files = {}
+
+        for route in self.routes:
+            if sink_factory:
+                route.sink = sink_factory(route.name)
+            else:
+                route.sink = TextSink(os.path.join(log_dir, f'{route.name}_{timestamp}.txt'), delay=True)
+            self.files[route.name] = route.sink.path
+
+    def route(self, line, classification=None, created=None):
+        """
+        Classify a line and write it to every stream that accepts it
+
+        Args:
+            line (str): Raw device line
+            classification (tuple): Result of LineClassifier.classify when
+                the line was already classified upstream
+            created (float): Time the line was read, if not now
+        """
+        kind, severity, module, text = classification or self.classifier.classify(line)
+        if kind in self.drop_kinds:
+            self.dropped += 1
+            return kind
+        for route in self.routes:
+            if route.accepts(kind, severity, module):
+                route.sink.write(text, created)
+                route.routed += 1
+        return kind
+
+    def close(self):
+        """Close every stream"""
+        for route in self.routes:
+            route.sink.close()
+
+    def summary(self):
+        """Lines routed per stream"""
+        counts = {route.name: route.routed for route in self.routes}
+        counts['dropped'] = self.dropped
+        return counts
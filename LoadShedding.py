@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from LineRouter import DEVICE_LOG, SHELL, TELEMETRY, LineClassifier
+
+# Priority classes, most important first
+CRITICAL = 0
+NORMAL = 1
+LOW = 2
+PRIORITY_NAMES = ('critical', 'normal', 'low')
+
+
+def line_priority(kind, severity):
+    """Telemetry and warnings/errors are critical, prompts and <inf> chatter are low"""
+    if kind == TELEMETRY:
+        return CRITICAL
+    if kind == DEVICE_LOG:
+        return CRITICAL if severity in ('wrn', 'err') else LOW
+    if kind == SHELL:
+        return LOW
+    return NORMAL
+
+
+class PriorityWriter:
+    def __init__(self, process, capacity=10000, low_watermark=0.5, normal_watermark=0.9,
+                 batch_size=256, on_marker=None):
+        """
+        Bounded queue between the serial reader and the slow writing side
+
+        The reader only classifies and enqueues, so a stalled disk never
+        blocks it. When the queue fills up, low priority lines are shed
+        first (from low_watermark), then normal ones (from normal_watermark).
+        Critical lines are always queued. Shed lines are counted per class
+        and a marker line is written once the writer catches up.
+
+        Args:
+            process (callable): Called on the writer thread as
+                process(line, created, classification)
+            capacity (int): Queue size the watermarks refer to
+            low_watermark (float): Fill level at which low priority lines are shed
+            normal_watermark (float): Fill level at which normal lines are shed
+            batch_size (int): Lines taken from the queue per writer wake-up
+            on_marker (callable): Records the shed-lines marker (default: main log)
+        """
+        self.process = process
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.limits = (None, int(capacity * normal_watermark), int(capacity * low_watermark))
+        self.classifier = LineClassifier()
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.dropped = {CRITICAL: 0, NORMAL: 0, LOW: 0}
+        self.dropped_by_kind = {}
+        self.pending_drops = 0
+        self.first_drop = None
+        self.high_water = 0
+        self.written = 0
+        self.main_logger = logging.getLogger('main')
+        self.on_marker = on_marker or self.main_logger.warning
+
+    def submit(self, line):
+        """Classify and enqueue a line (reader thread)"""
+        created = time.time()
+        classification = self.classifier.classify(line)
+        kind, severity = classification[0], classification[1]
+        priority = line_priority(kind, severity)
+        with self.condition:
+            limit = self.limits[priority]
+            if limit is not None and len(self.queue) >= limit:
+                self.dropped[priority] += 1
+                label = f'{kind}:{severity}' if severity else kind
+                self.dropped_by_kind[label] = self.dropped_by_kind.get(label, 0) + 1
+                if not self.pending_drops:
+                    self.first_drop = created
+                self.pending_drops += 1
+                return False
+            self.queue.append((line, created, classification))
+            self.high_water = max(self.high_water, len(self.queue))
+            self.condition.notify()
+        return True
+
+    def run(self):
+        """Writer thread: drain the queue in batches"""
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait(0.5)
+                if not self.queue and not self.running:
+                    return
+                # Small batches keep the queue length an honest measure of backlog
+                batch = [self.queue.popleft() for _ in range(min(len(self.queue), self.batch_size))]
+                marker = self.take_drop_marker() if len(self.queue) < self.limits[LOW] else None
+            for line, created, classification in batch:
+                try:
+                    self.process(line, created, classification)
+                except Exception as e:
+                    self.main_logger.error(f"Writer error: {e}")
+                self.written += 1
+            if marker:
+                self.on_marker(marker)
+
+    def take_drop_marker(self):
+        """Describe lines shed since the last marker (condition held)"""
+        if not self.pending_drops:
+            return None
+        since = time.strftime("%H:%M:%S", time.localtime(self.first_drop))
+        marker = f"Writer fell behind: shed {self.pending_drops} line(s) since {since}"
+        self.pending_drops = 0
+        return marker
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Write everything still queued and stop the writer thread"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+        with self.condition:
+            marker = self.take_drop_marker()
+        if marker:
+            self.on_marker(marker)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'queued': len(self.queue),
+                'high_water': self.high_water,
+                'written': self.written,
+                'dropped': {PRIORITY_NAMES[p]: n for p, n in self.dropped.items()},
+                'dropped_by_kind': dict(self.dropped_by_kind),
+            }
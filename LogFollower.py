@@ -0,0 +1,436 @@
+import argparse
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import re
+import select
+import struct
+import time
+
+from TelemetryParser import PacketAssembler, format_timestamp, split_log_line
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+READ_SIZE = 1024 * 1024
+
+
+def segment_pattern(prefix):
+    """Files written by the loggers: '<prefix>_YYYYmmdd_HHMMSS[_n].txt'"""
+    return re.compile(rf'^{re.escape(prefix)}_\d{{8}}_\d{{6}}(_\d+)?\.txt$')
+
+
+class Inotify:
+    def __init__(self):
+        """
+        Minimal inotify binding through ctypes
+
+        Raises OSError when inotify is not available (not Linux, or out of
+        watches); LogFollower then falls back to polling.
+        """
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify not available")
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        return wd
+
+    def wait(self, timeout):
+        """
+        Wait for events
+
+        Returns:
+            list: (mask, file name) of every event, empty on timeout
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        position = 0
+        while position + EVENT_HEADER.size <= len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, position)
+            position += EVENT_HEADER.size
+            name = data[position:position + length].rstrip(b'\0').decode('utf-8', errors='replace')
+            position += length
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogFollower:
+    def __init__(self, path, on_line, prefix=None, state_path=None, checkpoint=None,
+                 on_open=None, poll_interval=1.0):
+        """
+        Process a growing log file once, as it is written
+
+        Only new bytes are read: complete lines are passed to on_line and
+        the position after the last one is remembered. When state_path is
+        given, that position is saved so a later run resumes where this one
+        stopped instead of re-reading the file.
+
+        When following a folder, the logger's segments are taken in name
+        (= time) order: a segment is read to its end before moving to the
+        next one, so daemon rollovers lose nothing. A file that shrinks was
+        truncated and is read again from the start; a file replaced under
+        the same name (new inode) is drained and then reopened.
+
+        Args:
+            path (str): Log file, or a folder of segments
+            on_line (callable): Called as on_line(timestamp, message, offset)
+                for every complete line; offset is where the line starts
+            prefix (str): Segment prefix when following a folder
+                (default 'serial_data'; 'port1_data' etc. for the dual logger)
+            state_path (str): JSON file holding the resume position
+            checkpoint (callable): Optional; given the current path and
+                offset it returns (path, offset to save, extra state dict),
+                so a consumer can resume at the start of a record it has not
+                finished yet, even in an earlier segment
+            on_open (callable): Optional; called with the path whenever a
+                file is opened (start, rollover, truncation, replacement)
+            poll_interval (float): Seconds between checks without inotify,
+                and the longest wait with it
+        """
+        self.folder = path if os.path.isdir(path) else None
+        self.pattern = segment_pattern(prefix or 'serial_data') if self.folder else None
+        self.path = None if self.folder else path
+        self.on_line = on_line
+        self.state_path = state_path
+        self.checkpoint = checkpoint
+        self.on_open = on_open
+        self.poll_interval = poll_interval
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.partial = b''
+        self.running = False
+        self.main_logger = logging.getLogger('main')
+        try:
+            self.inotify = Inotify()
+            self.inotify.add_watch(self.folder or os.path.dirname(os.path.abspath(path)))
+        except OSError as e:
+            self.main_logger.info(f"Polling every {poll_interval} s ({e})")
+            self.inotify = None
+
+    def segments(self):
+        """Segment files in the followed folder, oldest first"""
+        return sorted(name for name in os.listdir(self.folder) if self.pattern.match(name))
+
+    def next_segment(self):
+        """The segment after the current one, if the logger has started it"""
+        current = os.path.basename(self.path) if self.path else ''
+        for name in self.segments():
+            if name > current:
+                return os.path.join(self.folder, name)
+        return None
+
+    def load_state(self):
+        """Resume position and any extra state saved by a previous run"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        path = state.get('path')
+        if not path or not os.path.exists(path):
+            return {}
+        if self.folder is None and os.path.abspath(path) != os.path.abspath(self.path):
+            return {}
+        stat = os.stat(path)
+        if stat.st_ino != state.get('inode') or stat.st_size < state.get('offset', 0):
+            self.main_logger.warning(f"{path} was replaced or truncated since the last run, reading it again")
+            state['offset'] = 0
+            state.pop('extra', None)
+        self.path = path
+        self.offset = state.get('offset', 0)
+        return state.get('extra') or {}
+
+    def save_state(self):
+        if not self.state_path or not self.path:
+            return
+        path, offset, extra = self.path, self.offset, None
+        if self.checkpoint:
+            path, offset, extra = self.checkpoint(self.path, self.offset)
+        inode = self.inode
+        if path != self.path:
+            try:
+                inode = os.stat(path).st_ino
+            except OSError:
+                # The earlier segment is gone: resume here instead
+                path, offset = self.path, self.offset
+        state = {'path': os.path.abspath(path), 'inode': inode, 'offset': offset,
+                 'saved': time.time(), 'extra': extra}
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def open(self, path, offset=0):
+        if self.file:
+            self.file.close()
+        self.path = path
+        self.file = open(path, 'rb')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+        self.file.seek(offset)
+        self.offset = offset
+        self.partial = b''
+        if self.on_open:
+            self.on_open(path)
+
+    def read_new(self):
+        """Process the bytes appended since the last call; returns lines read"""
+        lines = 0
+        while True:
+            data = self.file.read(READ_SIZE)
+            if not data:
+                return lines
+            data = self.partial + data
+            end = data.rfind(b'\n') + 1
+            # An incomplete last line waits for the rest of it
+            self.partial = data[end:]
+            offset = self.offset
+            for raw in data[:end - 1].split(b'\n') if end else ():
+                timestamp, message = split_log_line(raw.decode('utf-8', errors='replace'))
+                self.on_line(timestamp, message, offset)
+                offset += len(raw) + 1
+                lines += 1
+            self.offset = offset
+
+    def check_file(self):
+        """Handle truncation, replacement and segment rollover after reading"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and stat.st_ino == self.inode:
+            if stat.st_size < self.offset + len(self.partial):
+                self.main_logger.warning(f"{self.path} was truncated, reading it from the start")
+                self.open(self.path)
+                return True
+        elif stat is not None:
+            # Same name, new file: the old one has been drained already
+            self.main_logger.info(f"{self.path} was replaced, following the new file")
+            self.open(self.path)
+            return True
+        if self.folder:
+            following = self.next_segment()
+            if following:
+                # Re-read once more: lines may have landed after the last read
+                self.read_new()
+                self.main_logger.info(f"Following next segment {following}")
+                self.open(following)
+                return True
+        return False
+
+    def poll(self):
+        """Read everything available now, across rotations; returns lines read"""
+        if self.file is None:
+            if self.path is None:
+                segments = self.segments()
+                if not segments:
+                    return 0
+                self.path = os.path.join(self.folder, segments[0])
+            if not os.path.exists(self.path):
+                return 0
+            self.open(self.path, self.offset)
+        lines = self.read_new()
+        while self.check_file():
+            lines += self.read_new()
+        return lines
+
+    def run(self, save_interval=5.0, on_poll=None):
+        """
+        Follow until stop() is called or Ctrl+C
+
+        Args:
+            save_interval (float): Seconds between saves of the resume state
+            on_poll (callable): Called after every poll with the lines read
+        """
+        self.running = True
+        last_save = time.monotonic()
+        try:
+            while self.running:
+                lines = self.poll()
+                if on_poll:
+                    on_poll(lines)
+                if time.monotonic() - last_save >= save_interval:
+                    self.save_state()
+                    last_save = time.monotonic()
+                if self.inotify:
+                    self.inotify.wait(self.poll_interval)
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            self.save_state()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        if self.file:
+            self.file.close()
+        if self.inotify:
+            self.inotify.close()
+
+
+class FieldStats:
+    __slots__ = ('count', 'total', 'minimum', 'maximum')
+
+    def __init__(self, count=0, total=0.0, minimum=None, maximum=None):
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def to_dict(self):
+        return {'count': self.count, 'total': self.total, 'min': self.minimum, 'max': self.maximum}
+
+
+class TelemetryAggregates:
+    def __init__(self, state=None):
+        """
+        Running per-field statistics of a followed capture
+
+        Each packet updates count, sum, min and max of its numeric fields in
+        O(fields). The state is JSON-serialisable, so it is saved with the
+        follower position and resumed with it. A packet still being
+        assembled is re-read on resume, since the saved position is the
+        start of its header, in the segment where the packet began.
+
+        Args:
+            state (dict): State saved by a previous run
+        """
+        state = state or {}
+        self.lines = state.get('lines', 0)
+        self.packets = state.get('packets', 0)
+        self.first = state.get('first')
+        self.last = state.get('last')
+        self.fields = {name: FieldStats(s['count'], s['total'], s['min'], s['max'])
+                       for name, s in state.get('fields', {}).items()}
+        self.assembler = PacketAssembler()
+        self.path = None
+        self.packet_start = None
+        self.lines_at_packet_start = 0
+
+    def on_open(self, path):
+        if path == self.path and self.assembler.current is not None:
+            # Truncated or replaced: the lines of the open packet are gone
+            self.packet_start = (path, 0)
+            self.lines_at_packet_start = self.lines
+        self.path = path
+
+    def on_line(self, timestamp, message, offset):
+        was_open = self.assembler.current is not None
+        packet = self.assembler.feed(timestamp, message)
+        if self.assembler.current is not None and (not was_open or packet is not None):
+            # A header started a new packet at this line
+            self.packet_start = (self.path, offset)
+            self.lines_at_packet_start = self.lines
+        self.lines += 1
+        if packet:
+            self.add_packet(packet)
+
+    def add_packet(self, packet):
+        self.packets += 1
+        stamp = packet.get('timestamp')
+        if stamp:
+            stamp = format_timestamp(stamp)
+            self.first = self.first or stamp
+            self.last = stamp
+        for name, value in packet.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stats = self.fields.get(name)
+                if stats is None:
+                    stats = self.fields[name] = FieldStats()
+                stats.add(value)
+
+    def checkpoint(self, path, offset):
+        """Resume point: the start of an unfinished packet, if one is open"""
+        if self.assembler.current is not None:
+            start_path, start_offset = self.packet_start
+            return start_path, start_offset, self.state(self.lines_at_packet_start)
+        return path, offset, self.state(self.lines)
+
+    def state(self, lines=None):
+        return {
+            'lines': self.lines if lines is None else lines,
+            'packets': self.packets,
+            'first': self.first,
+            'last': self.last,
+            'fields': {name: stats.to_dict() for name, stats in self.fields.items()},
+        }
+
+    def summary(self):
+        rows = [f"{self.lines} lines, {self.packets} packets ({self.first} .. {self.last})"]
+        for name in sorted(self.fields):
+            stats = self.fields[name]
+            rows.append(f"  {name:12s} n={stats.count:<7d} mean={stats.total / stats.count:10.3f} "
+                        f"min={stats.minimum:<10g} max={stats.maximum:g}")
+        return '\n'.join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow a capture as it grows and keep running statistics")
+    parser.add_argument('path', type=str, help='Log file or log folder (e.g. logs_erik, dual_logs)')
+    parser.add_argument('--prefix', type=str, default='serial_data', help='Segment prefix in a folder (port1_data, port2_data, ...)')
+    parser.add_argument('--state', type=str, help='Resume file (default: <path>.follow.json)')
+    parser.add_argument('--interval', type=float, default=10, help='Seconds between printed summaries')
+    parser.add_argument('--once', action='store_true', help='Process what is there now and exit')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    state_path = args.state or os.path.abspath(args.path).rstrip(os.sep) + '.follow.json'
+    follower = LogFollower(args.path, None, prefix=args.prefix, state_path=state_path)
+    aggregates = TelemetryAggregates(follower.load_state())
+    follower.on_line = aggregates.on_line
+    follower.checkpoint = aggregates.checkpoint
+    follower.on_open = aggregates.on_open
+
+    last_print = [0.0]
+
+    def print_summary(lines):
+        if time.monotonic() - last_print[0] >= args.interval:
+            print(aggregates.summary())
+            last_print[0] = time.monotonic()
+
+    try:
+        if args.once:
+            follower.poll()
+            follower.save_state()
+        else:
+            follower.run(on_poll=print_summary)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+    print(aggregates.summary())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import mmap
+import os
+import sys
+import threading
+from bisect import bisect_right
+from array import array
+
+import numpy as np
+
+from TelemetryParser import TIMESTAMP_LENGTH, strip_line
+
+# Every INDEX_STEP-th line start is remembered, so the index stays tiny
+INDEX_STEP = 1024
+SCAN_CHUNK = 8 * 1024 * 1024
+
+
+def has_timestamp(line):
+    """True if a raw line starts with a 'YYYY-mm-dd HH:MM:SS,mmm,' stamp"""
+    return (len(line) > TIMESTAMP_LENGTH and line[4:5] == b'-' and line[13:14] == b':'
+            and line[19:20] == b',' and line[TIMESTAMP_LENGTH:TIMESTAMP_LENGTH + 1] == b',')
+
+
+class SparseLineIndex:
+    def __init__(self, path, step=INDEX_STEP):
+        """
+        Line offsets of a capture file, built in the background
+
+        Only the offset of every step-th line is kept (8 bytes per 1024
+        lines by default); the lines in between are found by scanning at
+        most one step forward. The scan uses its own mapping and releases
+        the pages it has read, so indexing a multi-gigabyte file does not
+        grow the resident memory.
+
+        Args:
+            path (str): Capture file
+            step (int): Lines between remembered offsets
+        """
+        self.path = path
+        self.step = step
+        self.size = os.path.getsize(path)
+        self.checkpoints = array('Q', [0])
+        self.lines = None
+        self.scanned = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.build, daemon=True)
+        self.thread.start()
+
+    def build(self):
+        try:
+            if self.size:
+                self.scan()
+            else:
+                self.lines = 0
+        finally:
+            self.done.set()
+
+    def scan(self):
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Lines seen so far and how many more until the next checkpoint
+            count = 0
+            until_next = self.step
+            for start in range(0, self.size, SCAN_CHUNK):
+                end = min(start + SCAN_CHUNK, self.size)
+                newlines = np.flatnonzero(np.frombuffer(mm, np.uint8, end - start, start) == 10)
+                # Line k*step starts right after newline number k*step - 1
+                picks = newlines[until_next - 1::self.step] + start + 1
+                picks = picks[picks < self.size]
+                with self.lock:
+                    self.checkpoints.extend(int(offset) for offset in picks)
+                    self.scanned = end
+                count += len(newlines)
+                until_next = (until_next - len(newlines) - 1) % self.step + 1
+                if hasattr(mm, 'madvise') and start % mmap.PAGESIZE == 0:
+                    # Drop the pages just scanned from this process
+                    mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+            last_open = mm[self.size - 1:self.size] != b'\n'
+        self.lines = count + (1 if last_open else 0)
+
+    def checkpoint(self, line):
+        """(line number, offset) of the closest known line at or before 'line'"""
+        with self.lock:
+            k = min(line // self.step, len(self.checkpoints) - 1)
+            return k * self.step, self.checkpoints[k]
+
+    def checkpoint_before(self, offset):
+        """(line number, offset) of the closest known line at or before a byte offset"""
+        with self.lock:
+            k = bisect_right(self.checkpoints, offset) - 1
+            return k * self.step, self.checkpoints[k]
+
+
+class LogViewer:
+    def __init__(self, path, strip=False):
+        """
+        Random access to a capture file of any size
+
+        The file is memory-mapped, so only the pages that are displayed
+        are read. Jumps to a line use the sparse index; jumps to a time
+        binary-search the file directly, since the logger timestamps sort
+        the same way as their text.
+
+        Args:
+            path (str): Capture file
+            strip (bool): Remove ANSI escapes and shell prompts when displaying
+        """
+        self.path = path
+        self.strip = strip
+        self.file = open(path, 'rb')
+        self.size = os.path.getsize(path)
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.index = SparseLineIndex(path)
+
+    def close(self):
+        if self.size:
+            self.mm.close()
+        self.file.close()
+
+    def next_line(self, offset):
+        """Offset of the line after the one starting at 'offset' (size at the end)"""
+        end = self.mm.find(b'\n', offset)
+        return self.size if end == -1 else end + 1
+
+    def previous_line(self, offset):
+        """Offset of the line before the one starting at 'offset'"""
+        if offset <= 0:
+            return 0
+        return self.mm.rfind(b'\n', 0, offset - 1) + 1
+
+    def line_at(self, offset):
+        """Raw bytes of the line starting at 'offset', without the newline"""
+        end = self.mm.find(b'\n', offset)
+        return self.mm[offset:self.size if end == -1 else end].rstrip(b'\r')
+
+    def offset_of_line(self, line):
+        """Byte offset of a 0-based line number (clamped to the last line)"""
+        number, offset = self.index.checkpoint(line)
+        while number < line:
+            following = self.next_line(offset)
+            if following >= self.size:
+                break
+            offset = following
+            number += 1
+        return offset
+
+    def line_number(self, offset):
+        """0-based line number of the line starting at 'offset'"""
+        number, start = self.index.checkpoint_before(offset)
+        return number + self.mm[start:offset].count(b'\n')
+
+    def offset_of_time(self, text):
+        """
+        Offset of the first line stamped at or after 'text'
+
+        Args:
+            text (str): Timestamp or a prefix of one, e.g. '2025-11-18 10:55'
+        """
+        target = text.encode('ascii')
+        lo, hi = 0, self.size
+        while hi - lo > 4096:
+            mid = self.next_line((lo + hi) // 2)
+            # Skip untimestamped lines (e.g. continuation of a long line)
+            probe = mid
+            while probe < hi and not has_timestamp(self.line_at(probe)):
+                probe = self.next_line(probe)
+            if probe >= hi:
+                hi = (lo + hi) // 2
+                continue
+            if self.mm[probe:probe + len(target)] < target:
+                lo = probe
+            else:
+                hi = mid
+        offset = self.previous_line(lo) if lo else 0
+        while offset < self.size:
+            line = self.line_at(offset)
+            if has_timestamp(line) and line[:len(target)] >= target:
+                return offset
+            offset = self.next_line(offset)
+        return self.previous_line(self.size)
+
+    def render(self, raw):
+        """Decode a raw line for display"""
+        text = raw.decode('utf-8', errors='replace')
+        if not self.strip:
+            return text.replace('\x1b', '^[')
+        if has_timestamp(raw):
+            return text[:TIMESTAMP_LENGTH + 1] + strip_line(text[TIMESTAMP_LENGTH + 1:])
+        return strip_line(text)
+
+    def lines_from(self, offset, count):
+        """Up to 'count' (offset, text) pairs starting at 'offset'"""
+        result = []
+        while offset < self.size and len(result) < count:
+            result.append((offset, self.render(self.line_at(offset))))
+            offset = self.next_line(offset)
+        return result
+
+    def status(self):
+        if self.index.done.is_set():
+            return f"{self.index.lines} lines"
+        return f"indexing {self.index.scanned / max(self.size, 1):.0%}"
+
+
+def run_pager(viewer, start):
+    """Interactive curses pager"""
+    import curses
+
+    def prompt(screen, label):
+        height, width = screen.getmaxyx()
+        curses.echo()
+        screen.addstr(height - 1, 0, label.ljust(width - 1)[:width - 1], curses.A_REVERSE)
+        value = screen.getstr(height - 1, len(label), 40).decode('utf-8', errors='replace')
+        curses.noecho()
+        return value.strip()
+
+    def loop(screen):
+        curses.curs_set(0)
+        screen.timeout(500)
+        top = start
+        while True:
+            height, width = screen.getmaxyx()
+            rows = viewer.lines_from(top, height - 1)
+            screen.erase()
+            for row, (_, text) in enumerate(rows):
+                screen.addnstr(row, 0, text.expandtabs(), width - 1)
+            status = (f" {os.path.basename(viewer.path)}  line {viewer.line_number(top) + 1}  "
+                      f"{viewer.status()}  {'stripped' if viewer.strip else 'raw'}  "
+                      f"[:]line [t]ime [s]trip [g/G] [q]uit")
+            screen.addnstr(height - 1, 0, status.ljust(width - 1), width - 1, curses.A_REVERSE)
+            key = screen.getch()
+            if key in (ord('q'), 27):
+                return
+            if key in (curses.KEY_DOWN, ord('j')):
+                top = viewer.next_line(top) if viewer.next_line(top) < viewer.size else top
+            elif key in (curses.KEY_UP, ord('k')):
+                top = viewer.previous_line(top)
+            elif key in (curses.KEY_NPAGE, ord(' ')):
+                if len(rows) == height - 1:
+                    top = viewer.next_line(rows[-1][0])
+            elif key in (curses.KEY_PPAGE, ord('b')):
+                for _ in range(height - 1):
+                    top = viewer.previous_line(top)
+            elif key == ord('g'):
+                top = 0
+            elif key == ord('G'):
+                top = viewer.previous_line(viewer.size)
+                for _ in range(height - 2):
+                    top = viewer.previous_line(top)
+            elif key == ord('s'):
+                viewer.strip = not viewer.strip
+            elif key == ord(':'):
+                value = prompt(screen, 'Line: ')
+                if value.isdigit():
+                    top = viewer.offset_of_line(max(int(value) - 1, 0))
+            elif key == ord('t'):
+                value = prompt(screen, 'Time (YYYY-mm-dd HH:MM:SS): ')
+                if value:
+                    top = viewer.offset_of_time(value)
+
+    curses.wrapper(loop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="View capture files of any size without loading them")
+    parser.add_argument('log_file', type=str, help='Capture file')
+    parser.add_argument('--line', '-n', type=int, help='Start at this line (1-based)')
+    parser.add_argument('--time', '-t', type=str, help='Start at the first line at or after this time')
+    parser.add_argument('--count', '-c', type=int, default=40, help='Lines to print when not interactive')
+    parser.add_argument('--strip', '-s', action='store_true', help='Remove ANSI escapes and shell prompts')
+    parser.add_argument('--print', action='store_true', help='Print lines instead of opening the pager')
+    args = parser.parse_args()
+
+    viewer = LogViewer(args.log_file, strip=args.strip)
+    if viewer.size == 0:
+        print("File is empty")
+        return
+    start = 0
+    if args.time:
+        start = viewer.offset_of_time(args.time)
+    elif args.line:
+        start = viewer.offset_of_line(args.line - 1)
+
+    try:
+        if args.print or not sys.stdout.isatty():
+            number = viewer.line_number(start)
+            for i, (_, text) in enumerate(viewer.lines_from(start, args.count)):
+                print(f"{number + i + 1:>8}  {text}")
+        else:
+            run_pager(viewer, start)
+    finally:
+        viewer.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
+import argparse
 import serial
 import time
 import threading
-import logging
 import os
 from datetime import datetime
 import serial.tools.list_ports
+from TelemetryParser import PacketAssembler, packet_to_json
+from PacketDeduplicator import PacketDeduplicator
+from GapDetector import GapDetector, describe_event
+from SQLiteSink import SQLiteSink
+from Profiling import SignalProfiler
+from Sinks import TextSink, session_folder, setup_main_logger
+from BaudProbe import describe_probe, probe_ports
+from Shutdown import PortReader, session_footer, stop_reader
 
 class DualSerialLogger:
-    def __init__(self, port1, port2, baudrate1=9600, baudrate2=9600, timeout=1):
+    def __init__(self, port1, port2, baudrate1=9600, baudrate2=9600, timeout=1, dedup_window=2.0,
+                 database=False):
         """
         Initialize the dual serial logger
         
@@ -17,6 +26,8 @@ class DualSerialLogger:
             baudrate1 (int): Baud rate for first port
             baudrate2 (int): Baud rate for second port
             timeout (float): Serial read timeout in seconds
+            dedup_window (float): Seconds to wait for the same packet on the other port
+            database (bool): Store packets from both ports in dual_logs/telemetry.db
         """
         self.port1 = port1
         self.port2 = port2
@@ -25,60 +36,72 @@ class DualSerialLogger:
         self.timeout = timeout
         self.serial1 = None
         self.serial2 = None
+        self.reader1 = None
+        self.reader2 = None
+        self.thread1 = None
+        self.thread2 = None
+        self.sample_count1 = 0
+        self.sample_count2 = 0
         self.running = False
         self.setup_logging()
         
+        # Packets received by both stations are combined into one stream
+        self.assembler1 = PacketAssembler('port1')
+        self.assembler2 = PacketAssembler('port2')
+        self.deduplicator = PacketDeduplicator(self.log_combined_packet, window=dedup_window)
+        
+        # Track dataindex continuity per port while capturing
+        self.gap_detector = GapDetector(on_event=self.report_sequence_event)
+        
+        # Packets queryable with SQL while the pass is running
+        self.sqlite_sink = None
+        if database:
+            self.sqlite_sink = SQLiteSink(
+                os.path.join(os.path.dirname(self.log_file1), 'telemetry.db'),
+                session=f'dual_{self.session_timestamp}'
+            )
+        
     def setup_logging(self):
         """Setup logging configuration for both ports"""
-        # Create logs directory if it doesn't exist
-        log_dir = os.path.join(os.path.dirname(__file__), 'dual_logs')
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # Create log filenames with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Create logs directory and session timestamp
+        log_dir, timestamp = session_folder('dual_logs')
+        self.session_timestamp = timestamp
         self.log_file1 = os.path.join(log_dir, f'port1_data_{timestamp}.txt')
         self.log_file2 = os.path.join(log_dir, f'port2_data_{timestamp}.txt')
+        self.combined_file = os.path.join(log_dir, f'combined_data_{timestamp}.txt')
+        self.loss_file = os.path.join(log_dir, f'loss_{timestamp}.json')
+        self.main_logger = setup_main_logger()
         
-        # Create separate loggers for each port
-        self.logger1 = logging.getLogger('port1')
-        self.logger2 = logging.getLogger('port2')
-        self.main_logger = logging.getLogger('main')
-        
-        # Clear any existing handlers
-        self.logger1.handlers.clear()
-        self.logger2.handlers.clear()
-        self.main_logger.handlers.clear()
-        
-        # Set logging levels
-        self.logger1.setLevel(logging.INFO)
-        self.logger2.setLevel(logging.INFO)
-        self.main_logger.setLevel(logging.INFO)
-        
-        # Create file handlers for each port
-        file_handler1 = logging.FileHandler(self.log_file1)
-        file_handler2 = logging.FileHandler(self.log_file2)
-        
-        # Create formatters (timestamp,value format)
-        formatter = logging.Formatter('%(asctime)s,%(message)s')
-        file_handler1.setFormatter(formatter)
-        file_handler2.setFormatter(formatter)
-        
-        # Add file handlers to loggers
-        self.logger1.addHandler(file_handler1)
-        self.logger2.addHandler(file_handler2)
-        
-        # Console handler for main logger
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.main_logger.addHandler(console_handler)
-        
-        # Prevent propagation to avoid duplicate messages
-        self.logger1.propagate = False
-        self.logger2.propagate = False
+        # Data sinks for each port and the combined packet stream (timestamp,value format)
+        self.sink1 = TextSink(self.log_file1)
+        self.sink2 = TextSink(self.log_file2)
+        self.combined_sink = TextSink(self.combined_file, delay=True)
         
         self.main_logger.info(f"Logging initialized:")
         self.main_logger.info(f"Port 1 log: {self.log_file1}")
         self.main_logger.info(f"Port 2 log: {self.log_file2}")
+        self.main_logger.info(f"Combined packets: {self.combined_file}")
+    
+    def log_combined_packet(self, packet):
+        """Write one deduplicated packet with its per-port receptions"""
+        self.combined_sink.write(packet_to_json(packet))
+    
+    def handle_line(self, assembler, line):
+        """Feed a line to a port's packet assembler"""
+        packet = assembler.feed(datetime.now(), line)
+        if packet:
+            self.handle_packet(packet)
+    
+    def handle_packet(self, packet):
+        """Pass an assembled packet to the packet consumers"""
+        self.gap_detector.add(packet)
+        if self.sqlite_sink:
+            self.sqlite_sink.write_packet(packet)
+        self.deduplicator.add(packet)
+    
+    def report_sequence_event(self, event):
+        """Report a dataindex gap or duplicate as it happens"""
+        self.main_logger.warning(describe_event(event))
         
     def connect_ports(self):
         """Establish connections to both serial ports"""
@@ -88,6 +111,7 @@ class DualSerialLogger:
                 baudrate=self.baudrate1,
                 timeout=self.timeout
             )
+            self.reader1 = PortReader(self.serial1)
             self.main_logger.info(f"Connected to Port 1: {self.port1} at {self.baudrate1} baud")
         except serial.SerialException as e:
             self.main_logger.error(f"Failed to connect to Port 1 ({self.port1}): {e}")
@@ -99,6 +123,7 @@ class DualSerialLogger:
                 baudrate=self.baudrate2,
                 timeout=self.timeout
             )
+            self.reader2 = PortReader(self.serial2)
             self.main_logger.info(f"Connected to Port 2: {self.port2} at {self.baudrate2} baud")
         except serial.SerialException as e:
             self.main_logger.error(f"Failed to connect to Port 2 ({self.port2}): {e}")
@@ -120,49 +145,65 @@ class DualSerialLogger:
     
     def read_port1(self):
         """Read data from port 1 in a separate thread"""
-        sample_count = 0
         while self.running:
             try:
                 if self.serial1 and self.serial1.is_open:
-                    line = self.serial1.readline().decode('utf-8').strip()
+                    line = self.reader1.read_line()
                     if line:
-                        sample_count += 1
+                        self.sample_count1 += 1
                         # Log the raw data to file
-                        self.logger1.info(line)
+                        self.sink1.write(line)
+                        self.handle_line(self.assembler1, line)
                         
                         # Show progress every 100 samples
-                        if sample_count % 100 == 0:
-                            print(f"Port 1: {sample_count} samples logged")
+                        if self.sample_count1 % 100 == 0:
+                            print(f"Port 1: {self.sample_count1} samples logged")
                             
             except serial.SerialException as e:
+                if not self.running:
+                    break
                 self.main_logger.error(f"Port 1 read error: {e}")
                 break
             except Exception as e:
                 self.main_logger.error(f"Port 1 unexpected error: {e}")
                 break
+        
+        # Woken up for shutdown: keep what port 1 still holds
+        for line in self.reader1.drain():
+            self.sample_count1 += 1
+            self.sink1.write(line)
+            self.handle_line(self.assembler1, line)
                 
     def read_port2(self):
         """Read data from port 2 in a separate thread"""
-        sample_count = 0
         while self.running:
             try:
                 if self.serial2 and self.serial2.is_open:
-                    line = self.serial2.readline().decode('utf-8').strip()
+                    line = self.reader2.read_line()
                     if line:
-                        sample_count += 1
+                        self.sample_count2 += 1
                         # Log the raw data to file
-                        self.logger2.info(line)
+                        self.sink2.write(line)
+                        self.handle_line(self.assembler2, line)
                         
                         # Show progress every 100 samples
-                        if sample_count % 100 == 0:
-                            print(f"Port 2: {sample_count} samples logged")
+                        if self.sample_count2 % 100 == 0:
+                            print(f"Port 2: {self.sample_count2} samples logged")
                             
             except serial.SerialException as e:
+                if not self.running:
+                    break
                 self.main_logger.error(f"Port 2 read error: {e}")
                 break
             except Exception as e:
                 self.main_logger.error(f"Port 2 unexpected error: {e}")
                 break
+        
+        # Woken up for shutdown: keep what port 2 still holds
+        for line in self.reader2.drain():
+            self.sample_count2 += 1
+            self.sink2.write(line)
+            self.handle_line(self.assembler2, line)
     
     def start_logging(self):
         """Start dual logging from both ports"""
@@ -170,13 +211,18 @@ class DualSerialLogger:
             return False
         
         self.running = True
+        self.session_started = time.time()
         
         # Start reading threads for both ports
-        thread1 = threading.Thread(target=self.read_port1, daemon=True)
-        thread2 = threading.Thread(target=self.read_port2, daemon=True)
+        self.thread1 = threading.Thread(target=self.read_port1, daemon=True)
+        self.thread2 = threading.Thread(target=self.read_port2, daemon=True)
+        
+        self.thread1.start()
+        self.thread2.start()
         
-        thread1.start()
-        thread2.start()
+        # CPU / memory profiling on SIGUSR1 / SIGUSR2 while the capture runs
+        self.profiler = SignalProfiler(os.path.dirname(self.log_file1), f'dual_{self.session_timestamp}')
+        self.profiler.install()
         
         try:
             self.main_logger.info("Dual serial logging started. Press Ctrl+C to stop...")
@@ -186,14 +232,55 @@ class DualSerialLogger:
             
             while self.running:
                 time.sleep(0.5)
+                self.deduplicator.expire(datetime.now())
                 
         except KeyboardInterrupt:
             self.main_logger.info("Stopping dual serial logging...")
             print("\nStopping dual serial logging...")
-            self.running = False
-            self.disconnect_ports()
+            self.shutdown()
         
         return True
+    
+    def shutdown(self, reason='stopped'):
+        """
+        Stop both captures without losing buffered lines
+        
+        Both readers are woken out of readline() at once and drain their
+        port before the ports close; every file gets flushed and fsynced,
+        and the port logs end with a session footer.
+        
+        Args:
+            reason (str): Recorded in the session footers
+        """
+        started = time.perf_counter()
+        self.running = False
+        for reader, thread in ((self.reader1, self.thread1), (self.reader2, self.thread2)):
+            if not stop_reader(reader, thread, self.timeout + 1):
+                self.main_logger.warning("Reader thread did not stop in time")
+        self.disconnect_ports()
+        
+        # Write out packets still waiting for a second copy
+        for assembler in (self.assembler1, self.assembler2):
+            packet = assembler.flush()
+            if packet:
+                self.handle_packet(packet)
+        self.deduplicator.flush()
+        self.sink1.write(session_footer(self.session_started, self.sample_count1, reason))
+        self.sink2.write(session_footer(self.session_started, self.sample_count2, reason))
+        for sink in (self.sink1, self.sink2, self.combined_sink):
+            sink.sync()
+            sink.close()
+        if self.sqlite_sink:
+            self.sqlite_sink.close()
+            self.main_logger.info(f"Stored {self.sqlite_sink.inserted} packets in {self.sqlite_sink.path}")
+        if self.gap_detector.streams:
+            self.gap_detector.write_stats(self.loss_file)
+            self.main_logger.info(f"Loss statistics: {self.loss_file}")
+        self.main_logger.info(
+            f"Combined {self.deduplicator.received} receptions into {self.deduplicator.emitted} packets"
+        )
+        self.profiler.stop()
+        self.main_logger.info(f"Shutdown took {(time.perf_counter() - started) * 1000:.0f} ms")
 
 def list_serial_ports():
     """List available serial ports"""
@@ -240,6 +327,11 @@ def get_baud_rate(port_name, default=9600):
         return default
 
 def main():
+    parser = argparse.ArgumentParser(description="Dual Serial Port Logger")
+    parser.add_argument('--sqlite', action='store_true', help='Store parsed packets in dual_logs/telemetry.db')
+    parser.add_argument('--autobaud', action='store_true', help='Detect both baud rates at once from the port output (see BaudProbe.py)')
+    args = parser.parse_args()
+    
     print("Dual Serial Port Logger")
     print("=" * 40)
     
@@ -266,6 +358,15 @@ def main():
     #baudrate2 = get_baud_rate("Port 2", 115200)
     baudrate2 = 115200
     
+    if args.autobaud:
+        # Both adapters are probed at the same time
+        print("\nProbing baud rates...")
+        results = probe_ports([port1, port2], poke=True)
+        for port in (port1, port2):
+            print(f"{port}: {describe_probe(results[port])}")
+        baudrate1 = results[port1]['baudrate'] or baudrate1
+        baudrate2 = results[port2]['baudrate'] or baudrate2
+    
     print(f"\nConfiguration:")
     print(f"Port 1: {port1} at {baudrate1} baud")
     print(f"Port 2: {port2} at {baudrate2} baud")
@@ -276,7 +377,7 @@ def main():
         return
     
     # Create and start the dual logger
-    logger = DualSerialLogger(port1, port2, baudrate1, baudrate2)
+    logger = DualSerialLogger(port1, port2, baudrate1, baudrate2, database=args.sqlite)
     logger.start_logging()
 
 if __name__ == "__main__":
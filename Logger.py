@@ -2,13 +2,34 @@ import argparse
 import serial
 import time
 import threading
-import logging
 import os
+import signal
+import socket
 from datetime import datetime
 import serial.tools.list_ports
+from Retention import RetentionService
+from TelemetryParser import PacketAssembler
+from GapDetector import GapDetector, describe_event
+from LineRouter import LineRouter
+from LoadShedding import PriorityWriter
+from SegmentedCapture import Heartbeat
+from NetworkSink import NetworkSink
+from SQLiteSink import SQLiteSink
+from ColumnCodec import ColumnWriter
+from Pyramid import PyramidBuilder, pyramid_path
+from Alerts import CommandHook, RuleEngine, default_rules, describe_alert, load_rules
+from BaudProbe import describe_probe, probe_port
+from Shutdown import PortReader, session_footer, stop_reader
+from Profiling import SignalProfiler
+from PubSub import EVENTS, PACKETS, Publisher
+from Sinks import FanOut, SegmentedSink, TextSink, session_folder, setup_main_logger
 
 class SingleSerialLogger:
-    def __init__(self, port, baudrate=115200, timeout=1, folder_prefix='erik'):
+    def __init__(self, port, baudrate=115200, timeout=1, folder_prefix='erik', retention_days=None,
+                 split_streams=False, daemon=False, segment_seconds=3600, segment_bytes=None,
+                 status_interval=30, queue_size=10000, forward_to=None,
+                 database=False, publish_path=None, columns=False, pyramid=False,
+                 alert_rules=None, alert_command=None):
         """
         Initialize the single serial logger
         
@@ -16,59 +37,140 @@ class SingleSerialLogger:
             port (str): Serial port to connect to
             baudrate (int): Baud rate for the port
             timeout (float): Serial read timeout in seconds
+            retention_days (float): Compress sessions older than this many
+                days in the background (None to disable)
+            split_streams (bool): Also write telemetry, device log and error
+                lines to separate files
+            daemon (bool): Unattended mode: segmented files, no console echo,
+                reconnect on errors and a heartbeat status file
+            segment_seconds (int): Daemon segment length (3600 = on the hour)
+            segment_bytes (int): Daemon segment size limit (None for no limit)
+            status_interval (float): Seconds between heartbeat updates
+            queue_size (int): Lines buffered between reader and writer before
+                low-priority lines are shed (0 writes from the reader thread)
+            forward_to (tuple): (host, port) of a collector to stream lines to
+            database (bool): Store assembled packets in telemetry.db in the
+                log folder
+            publish_path (str): Unix socket on which lines, packets and gap
+                events are published to local consumers (see PubSub.py)
+            columns (bool): Also store assembled packets column-encoded in
+                a .pxc file next to the capture (see ColumnCodec.py)
+            pyramid (bool): Maintain a min/max pyramid of the packet fields
+                in a .pyr.npz file next to the capture (see Pyramid.py)
+            alert_rules (list): Alert rules checked against every line,
+                packet and gap event (see Alerts.py)
+            alert_command (str): Command run for every alert, with the
+                alert as JSON on stdin
         """
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
         self.folder_prefix = folder_prefix
+        self.retention_days = retention_days
+        self.retention = None
+        self.daemon = daemon
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.status_interval = status_interval
+        self.heartbeat = None
+        self.profiler = None
+        self.queue_size = queue_size
+        self.writer = None
+        self.forward_to = forward_to
+        self.network_sink = None
+        self.publish_path = publish_path
+        self.publisher = None
+        self.sqlite_sink = None
+        self.column_writer = None
+        self.pyramid_builder = None
+        self.alerts = None
+        self.alert_hook = CommandHook(alert_command) if alert_command else None
+        self.sample_count = 0
+        self.packet_count = 0
         self.serial_conn = None
+        self.reader = None
+        self.read_thread = None
+        self.stop_event = threading.Event()
         self.running = False
         self.setup_logging()
         
-    def setup_logging(self):
-        """Setup logging configuration"""
-        # Create logs directory if it doesn't exist
-        safe_prefix = str(self.folder_prefix).strip() or 'erik'
-        log_dir = os.path.join(os.path.dirname(__file__), f'logs_{safe_prefix}')
-        os.makedirs(log_dir, exist_ok=True)
-        
-        # Create log filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = os.path.join(log_dir, f'serial_data_{timestamp}.txt')
+        # Track dataindex continuity while capturing
+        self.assembler = PacketAssembler(port)
+        self.gap_detector = GapDetector(on_event=self.report_sequence_event)
         
-        # Create loggers
-        self.data_logger = logging.getLogger('serial_data')
-        self.main_logger = logging.getLogger('main')
-        
-        # Clear any existing handlers
-        self.data_logger.handlers.clear()
-        self.main_logger.handlers.clear()
-        
-        # Set logging levels
-        self.data_logger.setLevel(logging.INFO)
-        self.main_logger.setLevel(logging.INFO)
-        
-        # Create file handler for data logging
-        file_handler = logging.FileHandler(self.log_file)
+        # Packets queryable with SQL while the pass is running
+        if database:
+            self.sqlite_sink = SQLiteSink(
+                os.path.join(self.log_dir, 'telemetry.db'),
+                session=os.path.splitext(os.path.basename(self.log_file))[0]
+            )
+        if columns:
+            self.column_writer = ColumnWriter(os.path.splitext(self.log_file)[0] + '.pxc')
+        if pyramid:
+            self.pyramid_builder = PyramidBuilder(pyramid_path(self.log_file))
+        if alert_rules:
+            self.alerts = RuleEngine(alert_rules, on_alert=self.report_alert)
         
-        # Create formatter (timestamp,value format)
-        formatter = logging.Formatter('%(asctime)s,%(message)s')
-        file_handler.setFormatter(formatter)
+        # Optional per-class streams next to the raw capture
+        self.router = None
+        if split_streams:
+            sink_factory = self.make_segmented_sink if daemon else None
+            self.router = LineRouter(self.log_dir, self.session_timestamp, sink_factory=sink_factory)
         
-        # Add file handler to data logger
-        self.data_logger.addHandler(file_handler)
+    def setup_logging(self):
+        """Setup logging configuration"""
+        # Create logs directory and session timestamp
+        safe_prefix = str(self.folder_prefix).strip() or 'erik'
+        self.log_dir, timestamp = session_folder(f'logs_{safe_prefix}')
+        self.session_timestamp = timestamp
+        self.log_file = os.path.join(self.log_dir, f'serial_data_{timestamp}.txt')
+        self.loss_file = os.path.join(self.log_dir, f'serial_data_{timestamp}_loss.json')
+        self.main_logger = setup_main_logger()
         
-        # Console handler for main logger
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
-        self.main_logger.addHandler(console_handler)
+        # Data sink (timestamp,value format)
+        if self.daemon:
+            # Segmented files so multi-day captures never end up in one file
+            self.data_sink = self.make_segmented_sink('serial_data')
+            self.data_sink.on_rollover = self.segment_started
+            self.log_file = self.data_sink.path
+        else:
+            self.data_sink = TextSink(self.log_file)
         
-        # Prevent propagation to avoid duplicate messages
-        self.data_logger.propagate = False
+        # Every captured line goes to all sinks (forwarding is added on start)
+        self.sinks = FanOut([self.data_sink])
         
         self.main_logger.info(f"Logging initialized:")
         self.main_logger.info(f"Data log: {self.log_file}")
         
+    def make_segmented_sink(self, prefix):
+        """Create a segmented file sink in the session folder"""
+        return SegmentedSink(
+            self.log_dir, prefix,
+            interval=self.segment_seconds,
+            max_bytes=self.segment_bytes
+        )
+    
+    def segment_started(self, path):
+        """Called when the daemon opens a new data segment"""
+        self.log_file = path
+        if self.retention:
+            self.retention.active_files.add(os.path.abspath(path))
+        self.main_logger.info(f"New data segment: {path}")
+    
+    def status(self):
+        """Status reported by the daemon heartbeat"""
+        return {
+            'port': self.port,
+            'connected': bool(self.serial_conn and self.serial_conn.is_open),
+            'lines': self.sample_count,
+            'segment': self.log_file,
+            'segments': getattr(self.data_sink, 'segments', 1),
+            'loss': self.gap_detector.stats(),
+            'writer': self.writer.stats() if self.writer else None,
+            'forwarding': self.network_sink.stats() if self.network_sink else None,
+            'publishing': self.publisher.stats() if self.publisher else None,
+        }
+    
     def connect_port(self):
         """Establish connection to the serial port"""
         try:
@@ -77,6 +179,7 @@ class SingleSerialLogger:
                 baudrate=self.baudrate,
                 timeout=self.timeout
             )
+            self.reader = PortReader(self.serial_conn)
             self.main_logger.info(f"Connected to {self.port} at {self.baudrate} baud")
             return True
         except serial.SerialException as e:
@@ -89,31 +192,126 @@ class SingleSerialLogger:
             self.serial_conn.close()
             self.main_logger.info("Serial port disconnected")
     
+    def report_sequence_event(self, event):
+        """Report a dataindex gap or duplicate as it happens"""
+        self.main_logger.warning(describe_event(event))
+        if self.publisher:
+            self.publisher.publish(EVENTS, event)
+        if self.alerts:
+            self.alerts.check_event(event)
+    
+    def report_alert(self, alert):
+        """Deliver an alert raised by the rule engine"""
+        self.main_logger.warning(describe_alert(alert))
+        if self.publisher:
+            self.publisher.publish(EVENTS, alert)
+        if self.alert_hook:
+            self.alert_hook(alert)
+    
+    def handle_packet(self, packet):
+        """Pass an assembled packet to the packet consumers"""
+        self.packet_count += 1
+        self.gap_detector.add(packet)
+        if self.sqlite_sink:
+            self.sqlite_sink.write_packet(packet)
+        if self.column_writer:
+            self.column_writer.write_packet(packet)
+        if self.pyramid_builder:
+            self.pyramid_builder.add_packet(packet)
+        if self.alerts:
+            self.alerts.check_packet(packet)
+        if self.publisher:
+            self.publisher.publish(PACKETS, packet)
+    
+    def write_loss_statistics(self):
+        """Write per-session packet loss statistics"""
+        packet = self.assembler.flush()
+        if packet:
+            self.handle_packet(packet)
+        if self.gap_detector.streams:
+            self.gap_detector.write_stats(self.loss_file)
+            self.main_logger.info(f"Loss statistics: {self.loss_file}")
+    
+    def process_line(self, line, created=None, classification=None):
+        """
+        Log and analyse one line read from the port
+        
+        Args:
+            line (str): Line read from the port
+            created (float): Time the line was read (default: now)
+            classification (tuple): LineClassifier result, if already known
+        """
+        self.sample_count += 1
+        if created is None:
+            created = time.time()
+        # Log the raw data, stamped with the time it was read
+        self.sinks.write(line, created)
+        
+        if self.router:
+            self.router.route(line, classification, created)
+        
+        if self.alerts:
+            self.alerts.check_line(line, created)
+        
+        packet = self.assembler.feed(datetime.fromtimestamp(created), line)
+        if packet:
+            self.handle_packet(packet)
+        
+        if self.daemon:
+            return
+        
+        # Print raw data to terminal
+        print(line)
+        
+        # Show progress every 100 samples
+        if self.sample_count % 100 == 0:
+            print(f"Logged {self.sample_count} samples")
+    
+    def record_shed_lines(self, marker):
+        """Note shed lines in the console and in the data log"""
+        self.main_logger.warning(marker)
+        self.sinks.write(f"# {marker}")
+    
+    def reconnect(self, delay=5):
+        """Keep trying to reopen the port (daemon mode)"""
+        self.disconnect_port()
+        # Waiting on the stop event lets shutdown interrupt the delay
+        while not self.stop_event.wait(delay):
+            if self.connect_port():
+                return True
+        return False
+    
+    def submit_line(self, line):
+        """Hand a line to the writer thread, or process it here without one"""
+        if self.writer:
+            self.writer.submit(line)
+        else:
+            self.process_line(line)
+    
     def read_serial_data(self):
         """Read data from the serial port in a separate thread"""
-        sample_count = 0
         while self.running:
             try:
                 if self.serial_conn and self.serial_conn.is_open:
-                    line = self.serial_conn.readline().decode('utf-8').strip()
+                    line = self.reader.read_line()
                     if line:
-                        sample_count += 1
-                        # Log the raw data to file
-                        self.data_logger.info(line)
-                        
-                        # Print raw data to terminal
-                        print(line)
-                        
-                        # Show progress every 100 samples
-                        if sample_count % 100 == 0:
-                            print(f"Logged {sample_count} samples")
+                        self.submit_line(line)
                             
             except serial.SerialException as e:
+                if not self.running:
+                    break
                 self.main_logger.error(f"Serial read error: {e}")
+                if self.daemon and self.reconnect():
+                    continue
                 break
             except Exception as e:
                 self.main_logger.error(f"Unexpected error: {e}")
                 break
+        
+        # Woken up for shutdown: keep what the port still holds
+        if self.reader and self.serial_conn and self.serial_conn.is_open:
+            for line in self.reader.drain():
+                self.submit_line(line)
                 
     def start_logging(self):
         """Start logging from the serial port"""
@@ -121,10 +319,48 @@ class SingleSerialLogger:
             return False
         
         self.running = True
+        self.session_started = time.time()
+        
+        # Stream to the central collector, spooling to disk during outages
+        if self.forward_to:
+            source = f"{socket.gethostname()}_{os.path.splitext(os.path.basename(self.log_file))[0]}"
+            self.network_sink = NetworkSink(
+                self.forward_to[0], self.forward_to[1], source,
+                spool_dir=os.path.join(self.log_dir, 'spool')
+            )
+            self.sinks.add(self.network_sink)
+        
+        # Live stream for local consumers (plots, parsers) sharing this capture
+        if self.publish_path:
+            self.publisher = self.sinks.add(Publisher(self.publish_path))
+        
+        # Writer thread behind a bounded queue so slow disks never block the reader
+        if self.queue_size:
+            self.writer = PriorityWriter(self.process_line, capacity=self.queue_size,
+                                         on_marker=self.record_shed_lines)
+            self.writer.start()
         
         # Start reading thread
-        read_thread = threading.Thread(target=self.read_serial_data, daemon=True)
-        read_thread.start()
+        self.read_thread = threading.Thread(target=self.read_serial_data, daemon=True)
+        self.read_thread.start()
+        
+        # Tidy up old sessions in the background, never touching this one
+        if self.retention_days is not None:
+            self.retention = RetentionService(
+                compress_after_days=self.retention_days,
+                active_files={self.log_file}
+            )
+            self.retention.start_background()
+        
+        if self.daemon:
+            self.heartbeat = Heartbeat(
+                os.path.join(self.log_dir, 'status.json'), self.status, self.status_interval
+            )
+            self.heartbeat.start()
+        
+        # CPU / memory profiling on SIGUSR1 / SIGUSR2 while the capture runs
+        self.profiler = SignalProfiler(self.log_dir, os.path.splitext(os.path.basename(self.log_file))[0])
+        self.profiler.install()
         
         try:
             self.main_logger.info("Serial logging started. Press Ctrl+C to stop...")
@@ -137,10 +373,65 @@ class SingleSerialLogger:
         except KeyboardInterrupt:
             self.main_logger.info("Stopping serial logging...")
             print("\nStopping serial logging...")
-            self.running = False
-            self.disconnect_port()
+            self.shutdown()
         
         return True
+    
+    def shutdown(self, reason='stopped'):
+        """
+        Stop the capture without losing buffered lines
+        
+        The reader is woken out of readline() at once and drains the port,
+        the writer empties its queue, a footer closes the data file and the
+        files are flushed and fsynced before they are closed. Takes
+        milliseconds rather than the port timeout.
+        
+        SIGINT and SIGTERM are ignored until it is done, so a second stop
+        request cannot cut the drain, the footer or the fsync short.
+        
+        Args:
+            reason (str): Recorded in the session footer
+        """
+        started = time.perf_counter()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, signal.SIG_IGN)
+        self.running = False
+        self.stop_event.set()
+        if not stop_reader(self.reader, self.read_thread, self.timeout + 1):
+            self.main_logger.warning("Reader thread did not stop in time")
+        if self.retention:
+            self.retention.stop()
+        self.disconnect_port()
+        if self.writer:
+            self.writer.stop()
+            self.main_logger.info(f"Writer: {self.writer.stats()}")
+        self.write_loss_statistics()
+        self.data_sink.write(session_footer(self.session_started, self.sample_count, reason,
+                                            packets=self.packet_count))
+        self.sinks.sync()
+        self.sinks.close()
+        if self.network_sink:
+            self.main_logger.info(f"Forwarding: {self.network_sink.stats()}")
+        if self.sqlite_sink:
+            self.sqlite_sink.close()
+            self.main_logger.info(f"Stored {self.sqlite_sink.inserted} packets in {self.sqlite_sink.path}")
+        if self.column_writer:
+            self.column_writer.close()
+            self.main_logger.info(f"Encoded {self.column_writer.packets} packets in {self.column_writer.path}")
+        if self.pyramid_builder:
+            self.pyramid_builder.close()
+            self.main_logger.info(f"Pyramid of {self.pyramid_builder.packets} packets: {self.pyramid_builder.path}")
+        if self.alerts:
+            self.main_logger.info(f"Alerts: {self.alerts.stats()}")
+        if self.router:
+            self.router.close()
+            self.main_logger.info(f"Routed lines: {self.router.summary()}")
+        if self.heartbeat:
+            self.heartbeat.stop()
+        if self.profiler:
+            self.profiler.stop()
+        self.main_logger.info(f"Shutdown took {(time.perf_counter() - started) * 1000:.0f} ms")
 
 def list_serial_ports():
     """List available serial ports"""
@@ -189,26 +480,74 @@ def get_baud_rate(default=115200):
 def main():
     parser = argparse.ArgumentParser(description="Single Serial Port Logger (Erik)")
     parser.add_argument('--baudrate', '-b', type=int, help='Baud rate to use (overrides prompt)')
+    parser.add_argument('--autobaud', action='store_true', help='Detect the baud rate from the port output (see BaudProbe.py)')
     parser.add_argument('--prefix', '-p', type=str, help='Folder prefix for logs (e.g. "erik")')
+    parser.add_argument('--split-streams', action='store_true', help='Also write telemetry, device log and error lines to separate files')
+    parser.add_argument('--port', type=str, help='Serial port to use (skips the selection prompt)')
+    parser.add_argument('--daemon', action='store_true', help='Unattended capture: hourly segments, heartbeat file, no prompts')
+    parser.add_argument('--segment-minutes', type=int, default=60, help='Daemon segment length in minutes')
+    parser.add_argument('--segment-mb', type=float, help='Daemon segment size limit in MB')
+    parser.add_argument('--forward', type=str, help='Stream lines to a collector at host:port (see NetworkSink.py)')
+    parser.add_argument('--sqlite', action='store_true', help='Store parsed packets in telemetry.db in the log folder')
+    parser.add_argument('--columns', action='store_true', help='Also store parsed packets column-encoded in a .pxc file (see ColumnCodec.py)')
+    parser.add_argument('--pyramid', action='store_true', help='Maintain a min/max pyramid of packet fields for fast plotting (see Pyramid.py)')
+    parser.add_argument('--alerts', nargs='?', const='', metavar='RULES', help='Check lines and packets against alert rules (JSON file, default: built-in rules; see Alerts.py)')
+    parser.add_argument('--alert-command', type=str, help='Run this command for every alert, alert JSON on stdin')
+    parser.add_argument('--publish', type=str, help='Publish lines and packets on this Unix socket (see PubSub.py)')
+    parser.add_argument('--retention-days', type=float, help='Compress and archive sessions older than this many days in the background')
     args = parser.parse_args()
 
+    # Folder prefix: CLI overrides default
+    folder_prefix = args.prefix if args.prefix is not None else 'erik'
+
+    alert_rules = None
+    if args.alerts is not None:
+        alert_rules = load_rules(args.alerts) if args.alerts else default_rules()
+
+    forward_to = None
+    if args.forward:
+        host, forward_port = args.forward.rsplit(':', 1)
+        forward_to = (host, int(forward_port))
+
+    if args.daemon:
+        if not args.port:
+            parser.error('--daemon requires --port')
+        # Service managers stop daemons with SIGTERM: shut down like Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        baudrate = args.baudrate
+        if not baudrate and args.autobaud:
+            baudrate = probe_port(args.port, poke=True)['baudrate']
+        baudrate = baudrate or 115200
+        logger = SingleSerialLogger(
+            args.port, baudrate, timeout=1, folder_prefix=folder_prefix,
+            retention_days=args.retention_days, split_streams=args.split_streams, daemon=True,
+            forward_to=forward_to, database=args.sqlite, publish_path=args.publish,
+            columns=args.columns, pyramid=args.pyramid,
+            alert_rules=alert_rules, alert_command=args.alert_command,
+            segment_seconds=args.segment_minutes * 60,
+            segment_bytes=int(args.segment_mb * 1024 * 1024) if args.segment_mb else None
+        )
+        logger.start_logging()
+        return
+
     print("Single Serial Port Logger")
     print("=" * 40)
 
     # Get port selection
-    port = get_port_selection()
+    port = args.port or get_port_selection()
     if not port:
         return
 
-    # Determine baudrate: command-line overrides prompt
-    if args.baudrate:
-        baudrate = args.baudrate
-    else:
+    # Determine baudrate: command-line overrides detection, detection overrides prompt
+    baudrate = args.baudrate
+    if not baudrate and args.autobaud:
+        print(f"Probing {port}...")
+        result = probe_port(port, poke=True)
+        print(f"{port}: {describe_probe(result)}")
+        baudrate = result['baudrate']
+    if not baudrate:
         baudrate = get_baud_rate(115200)
 
-    # Folder prefix: CLI overrides default
-    folder_prefix = args.prefix if args.prefix is not None else 'erik'
-
     print(f"\nConfiguration:")
     print(f"Port: {port} at {baudrate} baud")
     print(f"Log folder prefix: {folder_prefix}")
@@ -219,7 +558,11 @@ def main():
         return
 
     # Create and start the logger
-    logger = SingleSerialLogger(port, baudrate, timeout=1, folder_prefix=folder_prefix)
+    logger = SingleSerialLogger(port, baudrate, timeout=1, folder_prefix=folder_prefix,
+                                retention_days=args.retention_days, split_streams=args.split_streams,
+                                forward_to=forward_to, database=args.sqlite, publish_path=args.publish,
+                                columns=args.columns, pyramid=args.pyramid,
+                                alert_rules=alert_rules, alert_command=args.alert_command)
     logger.start_logging()
 
 if __name__ == "__main__":
@@ -0,0 +1,436 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+
+from Sinks import Sink
+from TelemetryParser import format_timestamp
+
+# Frame: magic, sequence number, compressed payload length, then the payload.
+# The payload is zlib-compressed JSON {"source": ..., "lines": [[created, line], ...]}
+MAGIC = b'PXL1'
+HEADER = struct.Struct('!4sQI')
+ACK = struct.Struct('!Q')
+MAX_PAYLOAD = 64 * 1024 * 1024
+
+
+def encode_frame(sequence, source, items):
+    payload = zlib.compress(json.dumps({'source': source, 'lines': items}).encode('utf-8'), 6)
+    return HEADER.pack(MAGIC, sequence, len(payload)) + payload
+
+
+def read_exact(stream, size):
+    """Read exactly size bytes from a file-like object, or None at EOF"""
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def read_frame(stream):
+    """
+    Read one frame
+
+    Returns:
+        tuple or None: (sequence, source, items, raw frame bytes), None at EOF
+    """
+    header = read_exact(stream, HEADER.size)
+    if header is None:
+        return None
+    magic, sequence, length = HEADER.unpack(header)
+    if magic != MAGIC or length > MAX_PAYLOAD:
+        raise ValueError("Corrupt frame header")
+    payload = read_exact(stream, length)
+    if payload is None:
+        return None
+    try:
+        message = json.loads(zlib.decompress(payload).decode('utf-8'))
+        return sequence, message['source'], message['lines'], header + payload
+    except (zlib.error, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Corrupt frame payload: {e}")
+
+
+def safe_name(source):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', source)
+
+
+class SequenceGap(ValueError):
+    """The collector refused a frame because earlier frames are missing"""
+
+
+class CorruptSpool(ValueError):
+    """A spool file holds a damaged or torn frame"""
+
+
+class NetworkSink(Sink):
+    def __init__(self, host, port, source, spool_dir, batch_size=500, flush_interval=1.0,
+                 max_frames=32, reconnect_max=30):
+        """
+        Forward captured lines to a remote collector over TCP
+
+        Lines are collected into batches, compressed into numbered frames
+        and sent over one persistent connection. The collector acknowledges
+        each frame once it is stored; a frame leaves memory only after its
+        acknowledgement. When more than max_frames are waiting (slow or
+        unreachable collector) new frames are appended to a spool file
+        instead, and every newer frame follows them there until the spool
+        has been sent, so the collector always receives frames in sequence
+        order: first those in memory, then the spool.
+
+        Args:
+            host (str): Collector host
+            port (int): Collector port
+            source (str): Unique name of this capture (e.g. host + session)
+            spool_dir (str): Folder for the outage spool files
+            batch_size (int): Lines per frame
+            flush_interval (float): Maximum seconds a line waits in a batch
+            max_frames (int): Frames kept in memory before spooling
+            reconnect_max (float): Longest delay between reconnect attempts
+        """
+        self.address = (host, port)
+        self.source = source
+        self.spool_dir = spool_dir
+        self.spool_path = os.path.join(spool_dir, f'{safe_name(source)}.spool')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_frames = max_frames
+        self.reconnect_max = reconnect_max
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self.batch = []
+        self.frames = deque()
+        self.spooling = os.path.exists(self.spool_path)
+        self.sequence = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.sock = None
+        self.stream = None
+        self.next_attempt = 0.0
+        self.backoff = 1.0
+        self.running = True
+        self.sent_frames = 0
+        self.spooled_frames = 0
+        self.main_logger = logging.getLogger('main')
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write_batch(self, items):
+        """Queue lines for forwarding"""
+        with self.lock:
+            self.batch.extend([created, line] for created, line in items)
+            if len(self.batch) >= self.batch_size:
+                self.seal()
+                self.wake.set()
+
+    def seal(self):
+        """Turn the current batch into a frame (lock held)"""
+        if not self.batch:
+            return
+        self.sequence += 1
+        frame = encode_frame(self.sequence, self.source, self.batch)
+        self.batch = []
+        if self.spooling or len(self.frames) >= self.max_frames:
+            # The spool is sent after the frames in memory: once a frame is
+            # spooled, every newer one must follow it there
+            self.spill(frame)
+            self.spooling = True
+        else:
+            self.frames.append((self.sequence, frame))
+
+    def spill(self, frame):
+        """Append a frame to the spool file (lock held)"""
+        with open(self.spool_path, 'ab') as f:
+            f.write(frame)
+        self.spooled_frames += 1
+
+    def connect(self):
+        if time.monotonic() < self.next_attempt:
+            return False
+        try:
+            self.sock = socket.create_connection(self.address, timeout=10)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.stream = self.sock.makefile('rb')
+            self.backoff = 1.0
+            self.main_logger.info(f"Forwarding to {self.address[0]}:{self.address[1]}")
+            return True
+        except OSError:
+            self.sock = None
+            self.next_attempt = time.monotonic() + self.backoff
+            self.backoff = min(self.backoff * 2, self.reconnect_max)
+            return False
+
+    def disconnect(self, reason):
+        self.main_logger.warning(f"Forwarding connection lost: {reason}")
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.sock = None
+        self.stream = None
+        self.next_attempt = time.monotonic() + self.backoff
+
+    def send_frame(self, sequence, frame):
+        """Send one frame and wait for its acknowledgement"""
+        self.sock.sendall(frame)
+        ack = read_exact(self.stream, ACK.size)
+        if ack is None:
+            raise OSError("Missing acknowledgement")
+        stored = ACK.unpack(ack)[0]
+        if stored != sequence:
+            # The collector answers with the last frame it stored in order
+            raise SequenceGap(f"Collector has frames up to {stored}, refused frame {sequence}")
+        self.sent_frames += 1
+
+    def read_offset(self, path):
+        offset_path = path + '.offset'
+        if not os.path.exists(offset_path):
+            return 0
+        with open(offset_path) as f:
+            return int(f.read().strip() or 0)
+
+    def remove_spool(self, path):
+        os.remove(path)
+        if os.path.exists(path + '.offset'):
+            os.remove(path + '.offset')
+
+    def send_spool(self, path):
+        """
+        Send the unsent frames of one spool file and remove it
+
+        Raises:
+            CorruptSpool: A frame cannot be decoded, or a spool of another
+                session ends in a torn frame (e.g. after a crash)
+        """
+        own = path == self.spool_path
+        with open(path, 'rb') as f:
+            f.seek(self.read_offset(path))
+            while True:
+                position = f.tell()
+                try:
+                    frame = read_frame(f)
+                except ValueError as e:
+                    raise CorruptSpool(f"{e} at offset {position}")
+                if frame is None:
+                    if not own and os.path.getsize(path) > position:
+                        # Nobody appends to another session's spool
+                        raise CorruptSpool(f"Torn frame at offset {position}")
+                    # Re-read from the frame start if a spill was half visible
+                    f.seek(position)
+                    with self.lock:
+                        # Remove the spool unless frames were spilled meanwhile
+                        if os.path.getsize(path) <= position:
+                            self.remove_spool(path)
+                            if own:
+                                # New frames can stay in memory again
+                                self.spooling = False
+                            return
+                    continue
+                self.send_frame(frame[0], frame[3])
+                # Remember progress in case the connection drops again
+                with open(path + '.offset', 'w') as o:
+                    o.write(str(f.tell()))
+
+    def set_aside(self, path, suffix, reason):
+        """Keep a spool that cannot be sent, but stop retrying it"""
+        os.replace(path, path + suffix)
+        if os.path.exists(path + '.offset'):
+            os.remove(path + '.offset')
+        self.main_logger.error(f"Spool {path} set aside as {path + suffix}: {reason}")
+
+    def backfill(self):
+        """Send the spool files left by earlier sessions, oldest first"""
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, '*.spool')), key=os.path.getmtime):
+            if path == self.spool_path:
+                continue
+            try:
+                self.send_spool(path)
+            except SequenceGap as e:
+                # Frames of that session were lost before they reached the
+                # spool (e.g. a crash)
+                self.set_aside(path, '.gap', e)
+            except CorruptSpool as e:
+                # The complete frames before the damage have been sent
+                self.set_aside(path, '.corrupt', e)
+
+    def run(self):
+        """Sender thread"""
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            with self.lock:
+                self.seal()
+                stopping = not self.running
+            self.flush_frames()
+            if stopping:
+                return
+
+    def flush_frames(self):
+        if self.sock is None and not self.connect():
+            # Offline: seal() keeps at most max_frames in memory and spools the rest
+            return
+        try:
+            self.backfill()
+            while True:
+                with self.lock:
+                    if not self.frames:
+                        break
+                    sequence, frame = self.frames[0]
+                self.send_frame(sequence, frame)
+                with self.lock:
+                    # Only removed once acknowledged: seal() never touches frames[0]
+                    self.frames.popleft()
+            if self.spooling:
+                try:
+                    self.send_spool(self.spool_path)
+                except CorruptSpool as e:
+                    with self.lock:
+                        self.set_aside(self.spool_path, '.corrupt', e)
+                        self.spooling = False
+        except (OSError, ValueError) as e:
+            self.disconnect(e)
+
+    def spool_frames(self):
+        """
+        Move the frames still in memory to the spool, ahead of any frames
+        already spooled since those are newer (lock held)
+        """
+        spooled = b''
+        if os.path.exists(self.spool_path):
+            with open(self.spool_path, 'rb') as f:
+                f.seek(self.read_offset(self.spool_path))
+                spooled = f.read()
+        temp_path = self.spool_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            for _, frame in self.frames:
+                f.write(frame)
+            f.write(spooled)
+        os.replace(temp_path, self.spool_path)
+        if os.path.exists(self.spool_path + '.offset'):
+            os.remove(self.spool_path + '.offset')
+        self.spooled_frames += len(self.frames)
+        self.frames.clear()
+        self.spooling = True
+
+    def stats(self):
+        return {'sent_frames': self.sent_frames, 'spooled_frames': self.spooled_frames,
+                'connected': self.sock is not None}
+
+    def close(self):
+        """Send or spool everything and stop the sender thread"""
+        self.running = False
+        self.wake.set()
+        self.thread.join()
+        with self.lock:
+            if self.frames:
+                self.spool_frames()
+        if self.sock:
+            self.sock.close()
+
+
+class CollectorHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        peer = f"{self.client_address[0]}:{self.client_address[1]}"
+        server.main_logger.info(f"Sender connected: {peer}")
+        try:
+            while True:
+                frame = read_frame(self.rfile)
+                if frame is None:
+                    break
+                sequence, source, items, _ = frame
+                self.wfile.write(ACK.pack(server.store(source, sequence, items)))
+                self.wfile.flush()
+        except (OSError, ValueError) as e:
+            server.main_logger.warning(f"Sender {peer}: {e}")
+        server.main_logger.info(f"Sender disconnected: {peer}")
+
+
+class Collector(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, out_dir):
+        """
+        Receive forwarded frames and write one capture file per source
+
+        The last stored sequence number of each source is kept next to its
+        file. Frames are only stored in sequence: a frame resent after an
+        outage is acknowledged but not written twice, and a frame that
+        would leave a gap is refused by acknowledging the last stored one.
+
+        Args:
+            address (tuple): (host, port) to listen on
+            out_dir (str): Folder for the collected captures
+        """
+        super().__init__(address, CollectorHandler)
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.last_sequence = {}
+        self.main_logger = logging.getLogger('main')
+
+    def store(self, source, sequence, items):
+        """
+        Store a frame if it is the next one of its source
+
+        Returns:
+            int: Sequence to acknowledge, 'sequence' if the frame is (or
+            already was) stored, the last stored one if it was refused
+        """
+        name = safe_name(source)
+        with self.lock:
+            seq_path = os.path.join(self.out_dir, f'{name}.seq')
+            last = self.last_sequence.get(name)
+            if last is None:
+                last = 0
+                if os.path.exists(seq_path):
+                    with open(seq_path) as f:
+                        last = int(f.read().strip() or 0)
+            if sequence <= last:
+                return sequence
+            if sequence != last + 1:
+                self.main_logger.warning(f"{source}: refused frame {sequence}, expected {last + 1}")
+                return last
+            with open(os.path.join(self.out_dir, f'{name}.txt'), 'a', encoding='utf-8') as f:
+                for created, line in items:
+                    f.write(f"{format_timestamp(datetime.fromtimestamp(created))},{line}\n")
+            with open(seq_path, 'w') as f:
+                f.write(str(sequence))
+            self.last_sequence[name] = sequence
+            return sequence
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector for lines forwarded by the loggers")
+    parser.add_argument('--listen', type=str, default='0.0.0.0:5140', help='Address to listen on (host:port)')
+    parser.add_argument('--out', type=str, default=os.path.join(os.path.dirname(__file__), 'collected'),
+                        help='Folder for collected captures')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    host, port = args.listen.rsplit(':', 1)
+    collector = Collector((host, int(port)), args.out)
+    print(f"Collecting on {host}:{port} into {args.out}")
+    print("Press Ctrl+C to stop...")
+    try:
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping collector...")
+    finally:
+        collector.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+
+# Fields describing one reception rather than the packet payload
+RECEPTION_FIELDS = ('timestamp', 'port', 'size', 'rssi', 'crc', 'lqi')
+
+
+def payload_key(packet):
+    """
+    Key of the payload fields of a packet
+
+    The field tuple itself rather than its hash, so two different payloads
+    can never collide and be merged.
+    """
+    items = []
+    for key in sorted(packet):
+        if key in RECEPTION_FIELDS:
+            continue
+        value = packet[key]
+        if isinstance(value, list):
+            value = tuple(value)
+        items.append((key, value))
+    return tuple(items)
+
+
+def reception_score(packet):
+    """Rank receptions: valid crc first, then strongest rssi, then best lqi"""
+    return (packet.get('crc', 0), packet.get('rssi', -999), packet.get('lqi', 0))
+
+
+class PacketDeduplicator:
+    def __init__(self, on_packet, window=2.0, max_pending=1024):
+        """
+        Combine copies of the same packet received on several ports
+
+        Packets with identical payloads seen within 'window' seconds of the
+        first copy are merged into one packet. The copy with the best
+        reception score is kept and every reception is listed under
+        'receptions'. Memory is bounded by the window and max_pending.
+
+        Args:
+            on_packet (callable): Called with each combined packet
+            window (float): Seconds to wait for copies from other ports
+            max_pending (int): Maximum packets held while waiting
+        """
+        self.on_packet = on_packet
+        self.window = window
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.latest = None
+        self.lock = threading.Lock()
+        self.received = 0
+        self.emitted = 0
+
+    def add(self, packet):
+        """Add a packet received on any port"""
+        key = payload_key(packet)
+        reception = {name: packet.get(name) for name in RECEPTION_FIELDS}
+        ready = []
+        with self.lock:
+            self.received += 1
+            timestamp = packet.get('timestamp')
+            if timestamp is not None and (self.latest is None or timestamp > self.latest):
+                self.latest = timestamp
+
+            group = self.pending.get(key)
+            if group is not None and any(r['port'] == packet.get('port') for r in group['receptions']):
+                # Same payload twice on one port is a new transmission
+                ready.append(self.pending.pop(key))
+                group = None
+
+            if group is None:
+                self.pending[key] = {'best': packet, 'receptions': [reception]}
+            else:
+                group['receptions'].append(reception)
+                if reception_score(packet) > reception_score(group['best']):
+                    group['best'] = packet
+
+            ready.extend(self._take_expired())
+            while len(self.pending) > self.max_pending:
+                ready.append(self.pending.popitem(last=False)[1])
+            self._emit(ready)
+
+    def expire(self, now=None):
+        """Emit packets whose window has closed (call periodically)"""
+        with self.lock:
+            if now is not None:
+                self.latest = now
+            self._emit(self._take_expired())
+
+    def flush(self):
+        """Emit every pending packet"""
+        with self.lock:
+            ready = list(self.pending.values())
+            self.pending.clear()
+            self._emit(ready)
+
+    def _take_expired(self):
+        """Pop groups older than the window (pending is in arrival order)"""
+        ready = []
+        if self.latest is None:
+            return ready
+        while self.pending:
+            group = next(iter(self.pending.values()))
+            first_seen = group['receptions'][0]['timestamp']
+            if first_seen is not None and (self.latest - first_seen).total_seconds() < self.window:
+                break
+            ready.append(self.pending.popitem(last=False)[1])
+        return ready
+
+    def _emit(self, groups):
+        # Called with the lock held so packets leave in order
+        for group in groups:
+            combined = dict(group['best'])
+            combined['receptions'] = group['receptions']
+            self.emitted += 1
+            self.on_packet(combined)
@@ -0,0 +1,193 @@
+import argparse
+import json
+import math
+import sys
+import tracemalloc
+from array import array
+from datetime import datetime
+
+from TelemetryParser import read_packets
+
+# Fields known from the current firmware, in storage order
+DEFAULT_FIELDS = (
+    'size', 'rssi', 'crc', 'lqi', 'temp',
+    'accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ', 'magX', 'magY', 'magZ',
+    'state', 'dataindex',
+)
+
+NAN = float('nan')
+
+
+class SchemaRegistry:
+    def __init__(self, fields=DEFAULT_FIELDS):
+        """
+        Ordered set of numeric packet fields shared by all records
+
+        New keys, e.g. from a firmware update, are appended on first sight,
+        so existing records keep their layout and simply report NaN for
+        fields they were created without. Field names are interned.
+
+        Args:
+            fields (tuple): Initial field order
+        """
+        self.fields = []
+        self.index = {}
+        for name in fields:
+            self.add(name)
+
+    def add(self, name):
+        """Return the slot of a field, registering it if new"""
+        slot = self.index.get(name)
+        if slot is None:
+            name = sys.intern(name)
+            slot = len(self.fields)
+            self.fields.append(name)
+            self.index[name] = slot
+        return slot
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'fields': self.fields}, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['fields'])
+
+
+class PacketRecord:
+    __slots__ = ('time', 'port', 'schema', 'values', 'extra', 'ints')
+
+    def __init__(self, time, port, schema, values, extra=None, ints=0):
+        """
+        Fixed-layout packet: numeric fields in one array of doubles
+
+        Args:
+            time (float): Host timestamp in epoch seconds
+            port (str): Port the packet was received on
+            schema (SchemaRegistry): Registry giving the slot of each field
+            values (array): Field values, NaN where absent
+            extra (dict): Non-numeric fields (storedData, text), or None
+            ints (int): Bit mask of the slots that held an int, so to_dict()
+                gives back 21 for 21 and 21.0 for 21.0
+        """
+        self.time = time
+        self.port = port
+        self.schema = schema
+        self.values = values
+        self.extra = extra
+        self.ints = ints
+
+    @classmethod
+    def from_packet(cls, packet, schema):
+        """Build a record from an assembled packet dict"""
+        values = array('d', [NAN]) * len(schema.fields)
+        extra = None
+        ints = 0
+        for key, value in packet.items():
+            if key in ('timestamp', 'port'):
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                slot = schema.add(key)
+                if slot >= len(values):
+                    values.extend([NAN] * (slot + 1 - len(values)))
+                values[slot] = value
+                if isinstance(value, int):
+                    ints |= 1 << slot
+            else:
+                if extra is None:
+                    extra = {}
+                # Arrays of numbers are stored compactly as well
+                if isinstance(value, list):
+                    value = array('d', value)
+                extra[sys.intern(key)] = value
+        timestamp = packet.get('timestamp')
+        return cls(timestamp.timestamp() if timestamp else NAN, packet.get('port'), schema, values, extra, ints)
+
+    @property
+    def timestamp(self):
+        return None if math.isnan(self.time) else datetime.fromtimestamp(self.time)
+
+    def get(self, name, default=None):
+        slot = self.schema.index.get(name)
+        if slot is not None:
+            if slot < len(self.values) and not math.isnan(self.values[slot]):
+                value = self.values[slot]
+                return int(value) if self.ints >> slot & 1 else value
+            return default
+        if name == 'timestamp':
+            return self.timestamp
+        if name == 'port':
+            return self.port
+        if self.extra and name in self.extra:
+            return self.extra[name]
+        return default
+
+    def __getitem__(self, name):
+        value = self.get(name, KeyError)
+        if value is KeyError:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self.get(name, KeyError) is not KeyError
+
+    def to_dict(self):
+        """Plain packet dict, as produced by PacketAssembler"""
+        packet = {'timestamp': self.timestamp, 'port': self.port}
+        for slot, (name, value) in enumerate(zip(self.schema.fields, self.values)):
+            if not math.isnan(value):
+                packet[name] = int(value) if self.ints >> slot & 1 else value
+        if self.extra:
+            for name, value in self.extra.items():
+                packet[name] = list(value) if isinstance(value, array) else value
+        return packet
+
+
+def read_records(path, schema=None, port=None):
+    """Yield every packet of a log file as a PacketRecord"""
+    schema = schema or SchemaRegistry()
+    for packet in read_packets(path, port):
+        yield PacketRecord.from_packet(packet, schema)
+
+
+def measure(build):
+    """Bytes still allocated by the object build() returns"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory per packet: dicts vs PacketRecord")
+    parser.add_argument('log_file', type=str, help='Session log file')
+    parser.add_argument('--copies', type=int, default=50, help='Times to load the session')
+    args = parser.parse_args()
+
+    def load_dicts():
+        return [packet for _ in range(args.copies) for packet in read_packets(args.log_file)]
+
+    def load_records():
+        schema = SchemaRegistry()
+        return [record for _ in range(args.copies) for record in read_records(args.log_file, schema)]
+
+    dicts, dict_bytes = measure(load_dicts)
+    records, record_bytes = measure(load_records)
+    if not dicts:
+        print("No packets in session")
+        return
+
+    # Explicit check rather than assert, which -O removes
+    mismatches = sum(record.to_dict() != packet for record, packet in zip(records, dicts))
+    print(f"Packets held:         {len(dicts)}")
+    print(f"Round trip:           {'ok' if not mismatches else f'{mismatches} packet(s) differ'}")
+    print(f"dict per packet:      {dict_bytes / len(dicts):8.0f} bytes")
+    print(f"PacketRecord:         {record_bytes / len(records):8.0f} bytes")
+    print(f"Saving:               {1 - record_bytes / dict_bytes:8.1%}")
+
+if __name__ == "__main__":
+    main()
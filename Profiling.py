@@ -0,0 +1,187 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+
+class StackSampler:
+    def __init__(self, interval=0.005):
+        """
+        Sampling profiler covering every thread of the process
+
+        A background thread periodically records the stack of each other
+        thread, so the serial reader and writer threads are profiled without
+        instrumenting them. Nothing runs while the sampler is stopped.
+
+        Args:
+            interval (float): Seconds between samples
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.stacks.clear()
+        self.samples = 0
+        self.started = time.time()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        own = threading.get_ident()
+        names = {}
+        while self.running:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def write_report(self, path, top=40):
+        """
+        Write the busiest functions and the folded stacks
+
+        The .folded file next to the report can be fed to flamegraph tools.
+        """
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack[1:]):
+                total[function] += count
+        hits = sum(self.stacks.values()) or 1
+        elapsed = time.time() - self.started
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Sampled {self.samples} times over {elapsed:.1f} s "
+                    f"({self.interval * 1000:.0f} ms interval)\n\n")
+            f.write("Self time (function currently running):\n")
+            for function, count in own.most_common(top):
+                f.write(f"  {count / hits:6.1%}  {function}\n")
+            f.write("\nTotal time (function anywhere on the stack):\n")
+            for function, count in total.most_common(top):
+                f.write(f"  {count / hits:6.1%}  {function}\n")
+        with open(os.path.splitext(path)[0] + '.folded', 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(stack)} {count}\n")
+
+
+class SignalProfiler:
+    def __init__(self, log_dir, session):
+        """
+        Profile a running capture on demand
+
+        SIGUSR1 starts the stack sampler, a second SIGUSR1 stops it and
+        writes the report. SIGUSR2 does the same for tracemalloc: the report
+        lists the largest allocation sites and the growth since tracing
+        started. Reports are written next to the session log; nothing is
+        traced until a signal arrives.
+
+            kill -USR1 <pid>   # start / stop CPU profile
+            kill -USR2 <pid>   # start / stop memory trace
+
+        Args:
+            log_dir (str): Folder for the reports
+            session (str): Session log name the reports are named after
+        """
+        self.log_dir = log_dir
+        self.session = session
+        self.sampler = None
+        self.memory_start = None
+        self.lock = threading.Lock()
+        self.main_logger = logging.getLogger('main')
+
+    def install(self):
+        """Register the signal handlers (main thread, POSIX only)"""
+        if not hasattr(signal, 'SIGUSR1'):
+            return False
+        signal.signal(signal.SIGUSR1, self.handle_signal)
+        signal.signal(signal.SIGUSR2, self.handle_signal)
+        self.main_logger.info(f"Profiling: kill -USR1 {os.getpid()} (CPU), kill -USR2 {os.getpid()} (memory)")
+        return True
+
+    def handle_signal(self, signum, frame):
+        # Reports are written off the main thread so the handler returns at once
+        target = self.toggle_cpu if signum == signal.SIGUSR1 else self.toggle_memory
+        threading.Thread(target=target, daemon=True).start()
+
+    def report_path(self, kind):
+        stamp = datetime.now().strftime("%H%M%S")
+        return os.path.join(self.log_dir, f'{self.session}_{kind}_{stamp}.txt')
+
+    def toggle_cpu(self):
+        with self.lock:
+            if self.sampler is None:
+                self.sampler = StackSampler()
+                self.sampler.start()
+                self.main_logger.info("CPU profiling started")
+                return
+            sampler, self.sampler = self.sampler, None
+        sampler.stop()
+        path = self.report_path('profile')
+        sampler.write_report(path)
+        self.main_logger.info(f"CPU profile written: {path}")
+
+    def toggle_memory(self):
+        with self.lock:
+            if self.memory_start is None:
+                tracemalloc.start(10)
+                self.memory_start = tracemalloc.take_snapshot()
+                self.main_logger.info("Memory tracing started")
+                return
+            start, self.memory_start = self.memory_start, None
+            snapshot = tracemalloc.take_snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        path = self.report_path('memory')
+        self.write_memory_report(path, start, snapshot, traced, peak)
+        self.main_logger.info(f"Memory report written: {path}")
+
+    def stop(self):
+        """Finish any profile still running, writing its report"""
+        if self.sampler is not None:
+            self.toggle_cpu()
+        if self.memory_start is not None:
+            self.toggle_memory()
+
+    @staticmethod
+    def write_memory_report(path, start, snapshot, traced, peak, top=30):
+        filters = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        start = start.filter_traces(filters)
+        snapshot = snapshot.filter_traces(filters)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Traced: {traced / 1024:.0f} kB now, {peak / 1024:.0f} kB peak\n\n")
+            f.write("Growth since tracing started:\n")
+            for stat in snapshot.compare_to(start, 'lineno')[:top]:
+                f.write(f"  {stat}\n")
+            f.write("\nLargest allocation sites:\n")
+            for stat in snapshot.statistics('lineno')[:top]:
+                f.write(f"  {stat}\n")
+            f.write("\nLargest allocation stacks:\n")
+            for stat in snapshot.statistics('traceback')[:5]:
+                f.write(f"  {stat.size / 1024:.1f} kB in {stat.count} blocks\n")
+                for line in stat.traceback.format():
+                    f.write(f"    {line}\n")
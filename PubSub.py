@@ -0,0 +1,281 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from Sinks import Sink
+from TelemetryParser import format_timestamp
+
+# Topics published by the loggers
+LINES = 'lines'
+PACKETS = 'packets'
+EVENTS = 'events'
+
+# What happens when a subscriber's queue is full
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+DISCONNECT = 'disconnect'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+
+def encode_message(topic, seq, created, data):
+    """One newline-terminated JSON message"""
+    def default(value):
+        if isinstance(value, datetime):
+            return format_timestamp(value)
+        raise TypeError(f"Cannot serialize {type(value).__name__}")
+    message = {'topic': topic, 'seq': seq, 'time': created, 'data': data}
+    return (json.dumps(message, default=default, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def topic_matches(topics, topic):
+    """'lines' matches 'lines' and 'lines/...'; an empty list matches everything"""
+    if not topics:
+        return True
+    return any(topic == wanted or topic.startswith(wanted + '/') for wanted in topics)
+
+
+class Subscriber:
+    def __init__(self, conn, topics, policy=DROP_OLDEST, capacity=10000):
+        """
+        One connected consumer and its bounded outgoing queue
+
+        Args:
+            conn (socket): Accepted connection
+            topics (list): Topics to receive (empty for all)
+            policy (str): DROP_OLDEST, DROP_NEWEST or DISCONNECT when full
+            capacity (int): Messages queued before the policy applies
+        """
+        self.conn = conn
+        self.topics = topics
+        self.policy = policy
+        self.capacity = capacity
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.unreported = 0
+
+    def offer(self, topic, payload):
+        """Queue a message without ever blocking the publisher"""
+        if self.closed or not topic_matches(self.topics, topic):
+            return
+        with self.condition:
+            if len(self.queue) >= self.capacity:
+                if self.policy == DISCONNECT:
+                    self.closed = True
+                    self.condition.notify()
+                    return
+                self.dropped += 1
+                self.unreported += 1
+                if self.policy == DROP_NEWEST:
+                    return
+                self.queue.popleft()
+            self.queue.append(payload)
+            self.condition.notify()
+
+    def take(self):
+        """Wait for queued messages; None once the subscriber is closed"""
+        with self.condition:
+            while not self.queue and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return None
+            items = list(self.queue)
+            self.queue.clear()
+            if self.unreported:
+                # Tell the consumer what it missed before the next messages
+                notice = encode_message('_dropped', None, time.time(), {'count': self.unreported})
+                items.insert(0, notice)
+                self.unreported = 0
+            return items
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class Publisher(Sink):
+    def __init__(self, path, backlog=1000, max_subscribers=16):
+        """
+        Share one capture with local consumers over a Unix domain socket
+
+        A consumer connects and sends one JSON line, for example
+        {"topics": ["packets"], "backlog": 100, "policy": "drop_oldest",
+        "queue": 5000}, then receives newline-delimited JSON messages
+        {"topic", "seq", "time", "data"}. The last messages of every topic
+        are kept in a ring buffer so late joiners can start with recent
+        history. Each subscriber has its own queue and sender thread, so a
+        slow consumer only loses its own messages and never stalls capture;
+        lost messages are announced with a '_dropped' message.
+
+        As a Sink, the captured lines are published on the 'lines' topic.
+
+        Args:
+            path (str): Socket path
+            backlog (int): Messages kept for late joiners
+            max_subscribers (int): Connections accepted at the same time
+        """
+        self.path = path
+        self.backlog = deque(maxlen=backlog)
+        self.max_subscribers = max_subscribers
+        self.subscribers = []
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.running = True
+        self.main_logger = logging.getLogger('main')
+
+        if os.path.exists(path):
+            # Left over from a capture that did not shut down cleanly
+            os.remove(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(max_subscribers)
+        self.thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.thread.start()
+        self.main_logger.info(f"Publishing on {path}")
+
+    def publish(self, topic, data, created=None):
+        """Send a message to every matching subscriber"""
+        if created is None:
+            created = time.time()
+        with self.lock:
+            self.seq += 1
+            payload = encode_message(topic, self.seq, created, data)
+            self.backlog.append((topic, payload))
+            for subscriber in self.subscribers:
+                subscriber.offer(topic, payload)
+
+    def write_batch(self, items):
+        for created, line in items:
+            self.publish(LINES, line, created)
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn):
+        """Read the subscription, send the backlog, then stream live messages"""
+        try:
+            conn.settimeout(5)
+            request = json.loads(conn.makefile('r', encoding='utf-8').readline() or '{}')
+            conn.settimeout(None)
+            policy = request.get('policy', DROP_OLDEST)
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown policy {policy}")
+            subscriber = Subscriber(conn, list(request.get('topics') or ()), policy,
+                                    int(request.get('queue', 10000)))
+        except (OSError, ValueError) as e:
+            self.main_logger.warning(f"Rejected subscriber: {e}")
+            conn.close()
+            return
+
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                conn.close()
+                return
+            # Backlog and registration under one lock: no gap, no duplicate
+            wanted = [item for item in self.backlog if topic_matches(subscriber.topics, item[0])]
+            count = int(request.get('backlog', 0))
+            for topic, payload in (wanted[-count:] if count > 0 else []):
+                subscriber.offer(topic, payload)
+            self.subscribers.append(subscriber)
+        self.main_logger.info(f"Subscriber joined: topics={subscriber.topics or 'all'}, policy={policy}")
+
+        try:
+            while True:
+                items = subscriber.take()
+                if items is None:
+                    break
+                conn.sendall(b''.join(items))
+                subscriber.sent += len(items)
+        except OSError:
+            pass
+        finally:
+            subscriber.close()
+            with self.lock:
+                self.subscribers.remove(subscriber)
+            conn.close()
+            self.main_logger.info(f"Subscriber left: {subscriber.sent} sent, {subscriber.dropped} dropped")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'published': self.seq,
+                'subscribers': [{'topics': s.topics, 'queued': len(s.queue), 'sent': s.sent,
+                                 'dropped': s.dropped} for s in self.subscribers],
+            }
+
+    def close(self):
+        """Stop accepting, disconnect subscribers and remove the socket"""
+        self.running = False
+        try:
+            self.server.close()
+        except OSError:
+            pass
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+            try:
+                subscriber.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def subscribe(path, topics=(LINES,), backlog=0, policy=DROP_OLDEST, queue=10000):
+    """
+    Connect to a running logger and yield its messages as dicts
+
+    Args:
+        path (str): Socket path given to the logger's --publish
+        topics (tuple): Topics to receive (empty for all)
+        backlog (int): Recent messages to receive first
+        policy (str): What the logger does when this consumer falls behind
+        queue (int): Messages the logger queues for this consumer
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    request = {'topics': list(topics), 'backlog': backlog, 'policy': policy, 'queue': queue}
+    sock.sendall((json.dumps(request) + '\n').encode('utf-8'))
+    with sock, sock.makefile('r', encoding='utf-8') as stream:
+        for line in stream:
+            yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the live stream of a logger started with --publish")
+    parser.add_argument('socket', type=str, help='Socket path given to --publish')
+    parser.add_argument('--topic', '-t', action='append', help='Topic to receive (repeatable, default: lines)')
+    parser.add_argument('--backlog', type=int, default=0, help='Recent messages to print first')
+    parser.add_argument('--policy', choices=POLICIES, default=DROP_OLDEST, help='Policy when this consumer falls behind')
+    args = parser.parse_args()
+
+    try:
+        for message in subscribe(args.socket, args.topic or (LINES,), args.backlog, args.policy):
+            if message['topic'] == '_dropped':
+                print(f"# {message['data']['count']} message(s) dropped")
+            elif message['topic'] == LINES:
+                print(message['data'])
+            else:
+                print(f"[{message['topic']}] {json.dumps(message['data'])}")
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Connection failed: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+import argparse
+import math
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+import numpy as np
+
+from TelemetryAnalysis import load_session
+
+# Width of the finest buckets in seconds; level k is BASE_SECONDS * 2**k wide
+BASE_SECONDS = 1.0
+# 1 s up to 2**23 s (about 97 days): enough for any session
+MAX_LEVELS = 24
+STATS = ('index', 'min', 'max', 'sum', 'count')
+
+
+def reduce_level(level):
+    """Next coarser level: pairs of neighbouring buckets merged into one"""
+    index = level['index'] >> 1
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    return {
+        'index': index[starts],
+        'min': np.minimum.reduceat(level['min'], starts),
+        'max': np.maximum.reduceat(level['max'], starts),
+        'sum': np.add.reduceat(level['sum'], starts),
+        'count': np.add.reduceat(level['count'], starts),
+    }
+
+
+def bucket_level(times, values, base):
+    """Finest level of one field from samples, NaN values skipped"""
+    valid = ~np.isnan(values) & ~np.isnan(times)
+    times, values = times[valid], values[valid]
+    index = np.floor(times / base).astype(np.int64)
+    order = np.argsort(index, kind='stable')
+    index, values = index[order], values[order]
+    keys, starts, counts = np.unique(index, return_index=True, return_counts=True)
+    if len(keys) == 0:
+        return {'index': keys, 'min': values, 'max': values, 'sum': values, 'count': counts}
+    return {
+        'index': keys,
+        'min': np.minimum.reduceat(values, starts),
+        'max': np.maximum.reduceat(values, starts),
+        'sum': np.add.reduceat(values, starts),
+        'count': counts.astype(np.int64),
+    }
+
+
+class Pyramid:
+    def __init__(self, base=BASE_SECONDS, fields=None, source=None):
+        """
+        Min/max/mean/count of every numeric field at doubling time resolutions
+
+        Level 0 holds one bucket per 'base' seconds that has samples, level
+        k one per base * 2**k seconds, so all levels together are at most
+        twice the size of level 0. query() picks the level whose buckets are
+        about one pixel wide, so drawing any window of a session reads at
+        most 'pixels' buckets, however many samples it covers. Buckets are
+        aligned to the epoch, so bucket i of level k spans
+        [i * width, (i + 1) * width).
+
+        Args:
+            base (float): Width of level 0 buckets in seconds
+            fields (dict): Field -> list of levels, each a dict of 'index',
+                'min', 'max', 'sum' and 'count' arrays
+            source (NpzFile): Saved pyramid to read levels from on demand
+        """
+        self.base = base
+        self.fields = fields if fields is not None else {}
+        self.source = source
+
+    @classmethod
+    def from_arrays(cls, times, columns, base=BASE_SECONDS, levels=MAX_LEVELS):
+        """
+        Build all levels from sample arrays
+
+        Args:
+            times (array): Sample times in epoch seconds
+            columns (dict): Field -> values lined up with times (NaN = missing)
+        """
+        times = np.asarray(times, dtype=np.float64)
+        fields = {}
+        for field, values in columns.items():
+            level = bucket_level(times, np.asarray(values, dtype=np.float64), base)
+            if len(level['index']):
+                fields[field] = cls.build_levels(level, levels)
+        return cls(base, fields)
+
+    @classmethod
+    def from_session(cls, path, fields=None, base=BASE_SECONDS):
+        session = load_session(path, fields)
+        times = session.pop('time')
+        return cls.from_arrays(times, session, base)
+
+    @staticmethod
+    def build_levels(level, levels=MAX_LEVELS):
+        """Level 0 plus every coarser level, stopping at a single bucket"""
+        pyramid = [level]
+        while len(pyramid) < levels and len(level['index']) > 1:
+            level = reduce_level(level)
+            pyramid.append(level)
+        return pyramid
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved pyramid; levels are read only when first queried"""
+        source = np.load(path)
+        base = float(source['base'])
+        fields = {str(field): [None] * int(count)
+                  for field, count in zip(source['fields'], source['levels'])}
+        return cls(base, fields, source)
+
+    def save(self, path):
+        """
+        Write the pyramid as an uncompressed .npz so single levels can be
+        read without loading the rest. The file is replaced atomically, so
+        a viewer never sees a half-written pyramid.
+        """
+        arrays = {
+            'base': np.float64(self.base),
+            'fields': np.array(sorted(self.fields), dtype=str),
+            'levels': np.array([len(self.fields[field]) for field in sorted(self.fields)], dtype=np.int64),
+        }
+        for field in self.fields:
+            for k in range(len(self.fields[field])):
+                level = self.level(field, k)
+                for stat in STATS:
+                    arrays[f'{field}/{k}/{stat}'] = level[stat]
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+
+    def level(self, field, k):
+        levels = self.fields[field]
+        if levels[k] is None:
+            levels[k] = {stat: self.source[f'{field}/{k}/{stat}'] for stat in STATS}
+        return levels[k]
+
+    def span(self, field):
+        """(first, last) time covered by a field, in epoch seconds"""
+        index = self.level(field, 0)['index']
+        return float(index[0] * self.base), float((index[-1] + 1) * self.base)
+
+    def choose_level(self, field, start, end, pixels):
+        """Finest level with no more than about one bucket per pixel"""
+        seconds_per_pixel = max(end - start, self.base) / max(pixels, 1)
+        k = math.ceil(math.log2(max(seconds_per_pixel / self.base, 1.0)))
+        return min(k, len(self.fields[field]) - 1)
+
+    def query(self, field, start, end, pixels):
+        """
+        Buckets of one field covering [start, end] at about one per pixel
+
+        Only the chosen level is read and only the buckets inside the window
+        are sliced out, so the cost depends on 'pixels', not on the number
+        of samples in the window.
+
+        Args:
+            field (str): Field name, e.g. 'rssi'
+            start (float): Window start in epoch seconds
+            end (float): Window end in epoch seconds
+            pixels (int): Width of the plot in pixels
+
+        Returns:
+            dict: 'time' (bucket starts), 'min', 'max', 'mean' and 'count'
+            arrays, plus the 'level' used and its 'bucket_seconds'
+        """
+        k = self.choose_level(field, start, end, pixels)
+        width = self.base * 2 ** k
+        level = self.level(field, k)
+        index = level['index']
+        lo = np.searchsorted(index, math.floor(start / width), 'left')
+        hi = np.searchsorted(index, math.floor(end / width), 'right')
+        count = level['count'][lo:hi]
+        return {
+            'time': index[lo:hi] * width,
+            'min': level['min'][lo:hi],
+            'max': level['max'][lo:hi],
+            'mean': level['sum'][lo:hi] / count,
+            'count': count,
+            'level': k,
+            'bucket_seconds': width,
+        }
+
+
+class PyramidBuilder:
+    def __init__(self, path=None, base=BASE_SECONDS, save_interval=60.0):
+        """
+        Maintain a pyramid while packets arrive
+
+        Only level 0 is updated per packet (one bucket per field, usually
+        the last one, so O(1)); the coarser levels are derived from it when
+        the pyramid is saved, which takes milliseconds for a day of data.
+        With a path, the pyramid is saved every save_interval seconds so a
+        viewer can follow a running pass, and on close().
+
+        Args:
+            path (str): Output file, usually '<session>.pyr.npz' (None to
+                only build in memory)
+            base (float): Width of level 0 buckets in seconds
+            save_interval (float): Seconds between saves while capturing
+        """
+        self.path = path
+        self.base = base
+        self.save_interval = save_interval
+        self.columns = {}
+        self.packets = 0
+        self.last_save = time.monotonic()
+
+    def add(self, when, field, value):
+        """Add one sample at epoch time 'when'"""
+        column = self.columns.get(field)
+        if column is None:
+            column = self.columns[field] = ([], [], [], [], [])
+        index, mins, maxs, sums, counts = column
+        bucket = math.floor(when / self.base)
+        if not index or bucket > index[-1]:
+            position = len(index)
+        elif bucket == index[-1]:
+            position = len(index) - 1
+        else:
+            # Late sample (e.g. reordered by deduplication)
+            position = bisect_left(index, bucket)
+        if position == len(index) or index[position] != bucket:
+            index.insert(position, bucket)
+            mins.insert(position, value)
+            maxs.insert(position, value)
+            sums.insert(position, value)
+            counts.insert(position, 1)
+            return
+        if value < mins[position]:
+            mins[position] = value
+        if value > maxs[position]:
+            maxs[position] = value
+        sums[position] += value
+        counts[position] += 1
+
+    def add_packet(self, packet):
+        """Add every numeric field of an assembled packet"""
+        if packet.get('timestamp') is None:
+            return
+        when = packet['timestamp'].timestamp()
+        for key, value in packet.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+                self.add(when, key, value)
+        self.packets += 1
+        if self.path and time.monotonic() - self.last_save >= self.save_interval:
+            self.save()
+
+    def pyramid(self):
+        fields = {}
+        for field, (index, mins, maxs, sums, counts) in self.columns.items():
+            level = {
+                'index': np.array(index, dtype=np.int64),
+                'min': np.array(mins, dtype=np.float64),
+                'max': np.array(maxs, dtype=np.float64),
+                'sum': np.array(sums, dtype=np.float64),
+                'count': np.array(counts, dtype=np.int64),
+            }
+            fields[field] = Pyramid.build_levels(level)
+        return Pyramid(self.base, fields)
+
+    def save(self):
+        self.last_save = time.monotonic()
+        if self.columns:
+            self.pyramid().save(self.path)
+
+    def close(self):
+        if self.path:
+            self.save()
+
+
+def pyramid_path(session_path):
+    """Pyramid file stored next to a session: '<session>.pyr.npz'"""
+    return os.path.splitext(session_path)[0] + '.pyr.npz'
+
+
+def benchmark(path, field='rssi', pixels=1000, repeat=20):
+    """Compare a pyramid query with loading and bucketing the whole session"""
+    started = time.perf_counter()
+    session = load_session(path, [field])
+    times, values = session['time'], session[field]
+    raw = bucket_level(times, values, max(times[-1] - times[0], 1.0) / pixels)
+    load_seconds = time.perf_counter() - started
+
+    pyramid = Pyramid.from_arrays(times, {field: values})
+    start, end = pyramid.span(field)
+    started = time.perf_counter()
+    for i in range(repeat):
+        # Zoom in step by step, as a viewer would
+        window = (end - start) / 2 ** (i % 8)
+        result = pyramid.query(field, start, start + window, pixels)
+    query_seconds = (time.perf_counter() - started) / repeat
+    return {
+        'samples': len(times),
+        'load_and_bucket_ms': round(load_seconds * 1000, 1),
+        'raw_buckets': len(raw['index']),
+        'query_ms': round(query_seconds * 1000, 3),
+        'query_buckets': len(result['time']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query min/max pyramids of session telemetry")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Write <session>.pyr.npz next to each session file')
+    build.add_argument('log_files', nargs='+', help='Session log files')
+    build.add_argument('--base', type=float, default=BASE_SECONDS, help='Finest bucket width in seconds')
+
+    query = subparsers.add_parser('query', help='Print the buckets of a field for a time window')
+    query.add_argument('pyramid', type=str, help='.pyr.npz file')
+    query.add_argument('--field', type=str, default='rssi', help='Field to query')
+    query.add_argument('--start', type=str, help='Window start, "YYYY-mm-dd HH:MM:SS" (default: first sample)')
+    query.add_argument('--end', type=str, help='Window end (default: last sample)')
+    query.add_argument('--pixels', type=int, default=80, help='Plot width in pixels')
+
+    bench = subparsers.add_parser('bench', help='Compare a query with loading the session')
+    bench.add_argument('log_file', type=str, help='Session log file')
+    bench.add_argument('--field', type=str, default='rssi', help='Field to query')
+    bench.add_argument('--pixels', type=int, default=1000, help='Plot width in pixels')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        for path in args.log_files:
+            started = time.perf_counter()
+            pyramid = Pyramid.from_session(path, base=args.base)
+            out = pyramid_path(path)
+            pyramid.save(out)
+            print(f"{out}: {len(pyramid.fields)} fields in {time.perf_counter() - started:.2f} s")
+    elif args.command == 'query':
+        pyramid = Pyramid.load(args.pyramid)
+        if args.field not in pyramid.fields:
+            print(f"No field {args.field}; fields: {', '.join(sorted(pyramid.fields))}")
+            return
+        first, last = pyramid.span(args.field)
+        start = datetime.fromisoformat(args.start).timestamp() if args.start else first
+        end = datetime.fromisoformat(args.end).timestamp() if args.end else last
+        result = pyramid.query(args.field, start, end, args.pixels)
+        print(f"{args.field}: level {result['level']}, {result['bucket_seconds']:g} s buckets (count, mean, min, max)")
+        for i in range(len(result['time'])):
+            stamp = datetime.fromtimestamp(result['time'][i]).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"  {stamp}: {result['count'][i]:6d} {result['mean'][i]:9.3f} "
+                  f"{result['min'][i]:9.3f} {result['max'][i]:9.3f}")
+    else:
+        for name, value in benchmark(args.log_file, args.field, args.pixels).items():
+            print(f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
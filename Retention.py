@@ -0,0 +1,286 @@
+import argparse
+import csv
+import glob
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+from Sinks import is_locked
+from TelemetryParser import read_packets
+
+# Session files written by the loggers and the antenna controller
+SESSION_PATTERNS = ('serial_data_*.txt', 'port*_data_*.txt', 'antenna_data_*.txt')
+CAPTURE_FOLDERS = ('logs_*', 'dual_logs')
+
+
+def session_time(path):
+    """Return the start time encoded in a session file name, or its mtime"""
+    name = os.path.basename(path).split('.')[0]
+    try:
+        return datetime.strptime(name[-15:], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return datetime.fromtimestamp(os.path.getmtime(path))
+
+
+class Throttle:
+    def __init__(self, io_budget=None, cpu_budget=None):
+        """
+        Keep background work within an IO and CPU budget
+
+        Args:
+            io_budget (int): Maximum bytes per second, None for unlimited
+            cpu_budget (float): Fraction of one core to use (0-1], None for
+                unlimited. Measured as the CPU time of the working thread, so
+                capture threads in the same process are not counted.
+        """
+        self.io_budget = io_budget
+        self.cpu_budget = cpu_budget
+        self.started = time.monotonic()
+        self.bytes_done = 0
+
+    def step(self, nbytes, cpu_used):
+        """Account for a chunk of work and sleep if over budget"""
+        delay = 0.0
+        self.bytes_done += nbytes
+        if self.io_budget:
+            elapsed = time.monotonic() - self.started
+            delay = max(delay, self.bytes_done / self.io_budget - elapsed)
+        if self.cpu_budget and self.cpu_budget < 1:
+            # Duty cycle: idle long enough that work / (work + idle) == budget
+            delay = max(delay, cpu_used * (1 / self.cpu_budget - 1))
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RetentionService:
+    def __init__(self, root=None, compress_after_days=7, archive_after_days=30,
+                 archive_dir=None, summary_interval=60, io_budget=4 * 1024 * 1024,
+                 cpu_budget=0.25, active_files=None, active_grace=600):
+        """
+        Tiered retention for capture folders
+
+        Sessions older than compress_after_days get a downsampled telemetry
+        summary and are gzip-compressed in place. Compressed sessions older
+        than archive_after_days are moved to the archive tier; the summary
+        stays next to the other captures.
+
+        Args:
+            root (str): Folder containing the logs_* and dual_logs folders
+            compress_after_days (float): Age before a session is compressed
+            archive_after_days (float): Age before a compressed session is archived
+            archive_dir (str): Archive tier location (default <root>/archive)
+            summary_interval (int): Summary bucket size in seconds
+            io_budget (int): Maximum bytes per second read and written
+            cpu_budget (float): Fraction of one core to use
+            active_files (set): Files being written by a running capture; other
+                files in their folders modified since the service was created
+                belong to the same session and are skipped as well
+            active_grace (int): Files modified this recently (seconds) are skipped
+        """
+        self.root = root or os.path.dirname(os.path.abspath(__file__))
+        self.compress_after = timedelta(days=compress_after_days)
+        self.archive_after = timedelta(days=archive_after_days)
+        self.archive_dir = archive_dir or os.path.join(self.root, 'archive')
+        self.summary_interval = summary_interval
+        self.io_budget = io_budget
+        self.cpu_budget = cpu_budget
+        self.active_files = {os.path.abspath(p) for p in (active_files or ())}
+        self.active_grace = active_grace
+        self.created = time.time()
+        self.running = False
+        self.main_logger = logging.getLogger('main')
+
+    def find_sessions(self, suffix=''):
+        """List session files in all capture folders"""
+        sessions = []
+        for folder in CAPTURE_FOLDERS:
+            for pattern in SESSION_PATTERNS:
+                sessions.extend(glob.glob(os.path.join(self.root, folder, pattern + suffix)))
+        return sorted(sessions)
+
+    def is_active(self, path):
+        """Check whether a file may still be written by a capture"""
+        path = os.path.abspath(path)
+        if path in self.active_files:
+            return True
+        mtime = os.path.getmtime(path)
+        if time.time() - mtime < self.active_grace:
+            return True
+        # Written during the current session (split streams, earlier segments)
+        active_dirs = {os.path.dirname(active) for active in self.active_files}
+        if os.path.dirname(path) in active_dirs and mtime >= self.created:
+            return True
+        # Still open in another logger process
+        return is_locked(path)
+
+    def write_summary(self, path, throttle):
+        """
+        Write a downsampled CSV summary of the telemetry in a session
+
+        Nothing is written if the service is stopped meanwhile.
+        """
+        buckets = {}
+        fields = []
+        cpu_start = time.thread_time()
+        for packet in read_packets(path):
+            if not self.running:
+                return None
+            if packet['timestamp'] is None:
+                continue
+            epoch = packet['timestamp'].timestamp()
+            bucket = buckets.setdefault(int(epoch // self.summary_interval), {'packets': 0})
+            bucket['packets'] += 1
+            for key, value in packet.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    if key not in fields:
+                        fields.append(key)
+                    total, count = bucket.get(key, (0.0, 0))
+                    bucket[key] = (total + value, count + 1)
+            if bucket['packets'] % 100 == 0:
+                throttle.step(0, time.thread_time() - cpu_start)
+                cpu_start = time.thread_time()
+
+        if not buckets:
+            return None
+
+        summary_file = path[:-len('.txt')] + '_summary.csv'
+        with open(summary_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['bucket_start', 'packets'] + [f'{key}_mean' for key in fields])
+            for index in sorted(buckets):
+                bucket = buckets[index]
+                start = datetime.fromtimestamp(index * self.summary_interval)
+                row = [start.strftime("%Y-%m-%d %H:%M:%S"), bucket['packets']]
+                for key in fields:
+                    total, count = bucket.get(key, (0.0, 0))
+                    row.append(f'{total / count:.4f}' if count else '')
+                writer.writerow(row)
+        return summary_file
+
+    def compress_file(self, path, throttle, chunk_size=64 * 1024):
+        """Gzip a file within budget and remove the original"""
+        target = path + '.gz'
+        partial = target + '.part'
+        with open(path, 'rb') as src, gzip.open(partial, 'wb', compresslevel=6) as dst:
+            while self.running:
+                cpu_start = time.thread_time()
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                throttle.step(len(chunk), time.thread_time() - cpu_start)
+
+        if not self.running:
+            # Interrupted: leave the original untouched
+            os.remove(partial)
+            return None
+
+        shutil.copystat(path, partial)
+        os.replace(partial, target)
+        os.remove(path)
+        return target
+
+    def archive_file(self, path):
+        """Move a compressed session to the archive tier"""
+        folder = os.path.basename(os.path.dirname(path))
+        target_dir = os.path.join(self.archive_dir, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(path))
+        shutil.move(path, target)
+        return target
+
+    def run_once(self):
+        """
+        Apply the retention policy to every session once
+
+        Only runs after start(), so a stop() that came first is honoured.
+        """
+        throttle = Throttle(self.io_budget, self.cpu_budget)
+        now = datetime.now()
+        compressed = archived = 0
+
+        for path in self.find_sessions():
+            if not self.running:
+                break
+            if os.path.getsize(path) == 0 or self.is_active(path):
+                continue
+            if now - session_time(path) < self.compress_after:
+                continue
+            try:
+                summary = self.write_summary(path, throttle)
+                if self.compress_file(path, throttle):
+                    compressed += 1
+                    self.main_logger.info(f"Compressed {path}" + (f" (summary: {summary})" if summary else ""))
+            except OSError as e:
+                self.main_logger.error(f"Retention failed for {path}: {e}")
+
+        for path in self.find_sessions('.gz'):
+            if not self.running:
+                break
+            if now - session_time(path) < self.archive_after:
+                continue
+            try:
+                target = self.archive_file(path)
+                archived += 1
+                self.main_logger.info(f"Archived {path} -> {target}")
+            except OSError as e:
+                self.main_logger.error(f"Archiving failed for {path}: {e}")
+
+        return compressed, archived
+
+    def start(self):
+        """Allow passes to run until stop()"""
+        self.running = True
+
+    def start_background(self):
+        """Run one retention pass in a low-priority background thread"""
+        self.start()
+        thread = threading.Thread(target=self.run_once, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop the current pass at the next chunk boundary"""
+        self.running = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress, summarize and archive old capture sessions")
+    parser.add_argument('--root', type=str, help='Folder containing logs_* and dual_logs (default: script folder)')
+    parser.add_argument('--compress-after', type=float, default=7, help='Days before a session is compressed')
+    parser.add_argument('--archive-after', type=float, default=30, help='Days before a session is archived')
+    parser.add_argument('--archive-dir', type=str, help='Archive tier folder (default: <root>/archive)')
+    parser.add_argument('--summary-interval', type=int, default=60, help='Summary bucket size in seconds')
+    parser.add_argument('--io-budget', type=float, default=4, help='IO budget in MiB/s (0 for unlimited)')
+    parser.add_argument('--cpu-budget', type=float, default=0.25, help='Fraction of one core to use')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+    # Run politely when started as a separate command
+    if hasattr(os, 'nice'):
+        os.nice(10)
+
+    service = RetentionService(
+        root=args.root,
+        compress_after_days=args.compress_after,
+        archive_after_days=args.archive_after,
+        archive_dir=args.archive_dir,
+        summary_interval=args.summary_interval,
+        io_budget=int(args.io_budget * 1024 * 1024) or None,
+        cpu_budget=args.cpu_budget,
+    )
+    try:
+        service.start()
+        compressed, archived = service.run_once()
+        print(f"Compressed {compressed} session(s), archived {archived} session(s)")
+    except KeyboardInterrupt:
+        service.stop()
+        print("\nRetention pass interrupted")
+
+if __name__ == "__main__":
+    main()
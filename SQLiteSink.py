@@ -0,0 +1,159 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from Sinks import Sink
+from TelemetryParser import PacketAssembler, read_packets
+
+# Packet fields stored in their own columns; anything else goes to 'extra'
+COLUMNS = (
+    'rssi', 'crc', 'lqi', 'size', 'temp',
+    'accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ', 'magX', 'magY', 'magZ',
+    'state', 'dataindex',
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS packets (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    session TEXT,
+    port TEXT,
+    {', '.join(f'{name} REAL' for name in COLUMNS)},
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS packets_time ON packets (time);
+CREATE INDEX IF NOT EXISTS packets_port_time ON packets (port, time);
+"""
+
+INSERT = (
+    f"INSERT INTO packets (time, session, port, {', '.join(COLUMNS)}, extra) "
+    f"VALUES ({', '.join('?' * (len(COLUMNS) + 4))})"
+)
+
+
+def packet_row(packet, session):
+    """Convert a packet dict to a row for INSERT"""
+    timestamp = packet.get('timestamp')
+    extra = {key: value for key, value in packet.items()
+             if key not in COLUMNS and key not in ('timestamp', 'port', 'receptions')}
+    return (
+        timestamp.timestamp() if timestamp else time.time(),
+        session,
+        packet.get('port'),
+        *(packet.get(name) for name in COLUMNS),
+        json.dumps(extra) if extra else None,
+    )
+
+
+def open_database(path):
+    """Open a telemetry database in WAL mode and create the schema"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SQLiteSink(Sink):
+    def __init__(self, path, session=None, batch_size=200, flush_interval=1.0, port=None):
+        """
+        Store assembled packets in SQLite while the pass is running
+
+        Packets are queued by the capture thread and inserted by a
+        background thread in one transaction per batch, reusing a single
+        prepared INSERT. WAL mode lets other processes query the database
+        while it is being written.
+
+        Packets arrive either assembled, through write_packet, or as raw
+        lines through the Sink interface, which assembles them here.
+
+        Args:
+            path (str): Database file
+            session (str): Session name stored with each packet
+            batch_size (int): Packets per transaction
+            flush_interval (float): Maximum seconds a packet waits for its batch
+            port (str): Port stored with packets assembled from raw lines
+        """
+        self.path = path
+        self.session = session
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.running = True
+        self.inserted = 0
+        self.assembler = PacketAssembler(port)
+        self.main_logger = logging.getLogger('main')
+        self.conn = open_database(path)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write_packet(self, packet):
+        """Queue a packet for insertion (never blocks on the database)"""
+        row = packet_row(packet, self.session)
+        with self.condition:
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def write_batch(self, items):
+        """Assemble raw lines into packets and queue them"""
+        for created, line in items:
+            packet = self.assembler.feed(datetime.fromtimestamp(created), line)
+            if packet:
+                self.write_packet(packet)
+
+    def run(self):
+        """Insert queued packets in batched transactions"""
+        while True:
+            with self.condition:
+                if self.running and len(self.pending) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                rows = list(self.pending)
+                self.pending.clear()
+                stopping = not self.running
+            if rows:
+                try:
+                    with self.conn:
+                        self.conn.executemany(INSERT, rows)
+                    self.inserted += len(rows)
+                except sqlite3.Error as e:
+                    self.main_logger.error(f"SQLite insert failed: {e}")
+            if stopping:
+                return
+
+    def close(self):
+        """Insert remaining packets and close the database"""
+        packet = self.assembler.flush()
+        if packet:
+            self.write_packet(packet)
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load logged sessions into a telemetry SQLite database")
+    parser.add_argument('database', type=str, help='SQLite database file')
+    parser.add_argument('log_files', nargs='+', help='Session log files to load')
+    args = parser.parse_args()
+
+    conn = open_database(args.database)
+    for path in args.log_files:
+        session = os.path.splitext(os.path.basename(path))[0]
+        rows = [packet_row(packet, session) for packet in read_packets(path)]
+        with conn:
+            conn.executemany(INSERT, rows)
+        print(f"{path}: {len(rows)} packets")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+
+def current_rss_kb():
+    """Resident set size of this process in kB (0 if unknown)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS, but the best available off Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return 0
+
+
+class Heartbeat:
+    def __init__(self, path, status, interval=30):
+        """
+        Periodically write a JSON status file for unattended captures
+
+        Args:
+            path (str): Status file path
+            status (callable): Returns a dict with the current status
+            interval (float): Seconds between updates
+        """
+        self.path = path
+        self.status = status
+        self.interval = interval
+        self.started = datetime.now()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def write(self, state='running'):
+        """Write the status file atomically"""
+        status = {
+            'pid': os.getpid(),
+            'state': state,
+            'started': self.started.isoformat(timespec='seconds'),
+            'updated': datetime.now().isoformat(timespec='seconds'),
+            'rss_kb': current_rss_kb(),
+        }
+        status.update(self.status())
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logging.getLogger('main').error(f"Heartbeat write failed: {e}")
+
+    def start(self):
+        self.write()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        self.write('stopped')
@@ -0,0 +1,130 @@
+import re
+import time
+from collections import deque
+from datetime import datetime
+
+# Devices end lines with '\n', '\r\n' or a bare '\r'
+LINE_END = re.compile(rb'\r\n|\r|\n')
+# Longest line kept waiting for its end; longer output is logged in pieces
+MAX_LINE = 4096
+
+
+def split_lines(data):
+    """
+    Split raw bytes at any line end
+
+    Returns:
+        tuple: (complete lines as bytes, unterminated remainder)
+    """
+    pieces = LINE_END.split(data)
+    remainder = pieces.pop()
+    return pieces, remainder
+
+
+def decode_line(raw):
+    return raw.decode('utf-8', errors='replace').strip()
+
+
+class PortReader:
+    def __init__(self, conn, idle_reads=1, max_line=MAX_LINE):
+        """
+        Line reader for a serial port that can be woken up and drained
+
+        readline() gives up at the port timeout, possibly in the middle of a
+        line; the partial line is kept and completed by the next read
+        instead of being logged in two pieces. Output that never gets a
+        newline (a prompt, an antenna reply) is still logged: after
+        'idle_reads' reads in a row return nothing, or once it reaches
+        max_line bytes. A bare '\r' also ends a line. wake() interrupts a
+        blocked read at once (cancel_read), and drain() returns everything
+        still buffered so nothing is lost when the capture stops.
+
+        Args:
+            conn (serial.Serial): Open port
+            idle_reads (int): Empty reads (port timeouts) after which a
+                partial line counts as complete
+            max_line (int): Longest partial line kept, in bytes
+        """
+        self.conn = conn
+        self.idle_reads = idle_reads
+        self.max_line = max_line
+        self.partial = b''
+        self.idle = 0
+        self.ready = deque()
+
+    def read_line(self):
+        """Next complete line (decoded and stripped), or None if none is ready"""
+        if self.ready:
+            return self.ready.popleft()
+        raw = self.conn.readline()
+        if not raw:
+            # A whole timeout without data ends the pending partial line
+            self.idle += 1
+            if self.partial and self.idle >= self.idle_reads:
+                raw, self.partial = self.partial, b''
+                return decode_line(raw)
+            return None
+        self.idle = 0
+        if not self.partial and raw.endswith(b'\n') and b'\r' not in raw[:-2]:
+            # Common case: one whole line
+            return decode_line(raw)
+        lines, self.partial = split_lines(self.partial + raw)
+        if len(self.partial) >= self.max_line:
+            lines.append(self.partial)
+            self.partial = b''
+        self.ready.extend(line for line in map(decode_line, lines) if line)
+        return self.ready.popleft() if self.ready else None
+
+    def wake(self):
+        """Make a read blocked in another thread return immediately"""
+        if hasattr(self.conn, 'cancel_read'):
+            try:
+                self.conn.cancel_read()
+            except Exception:
+                pass
+
+    def drain(self):
+        """Every line still buffered, including an unterminated last one"""
+        data = self.partial
+        self.partial = b''
+        try:
+            if self.conn.is_open and self.conn.in_waiting:
+                data += self.conn.read(self.conn.in_waiting)
+        except Exception:
+            pass
+        lines = list(self.ready)
+        self.ready.clear()
+        lines.extend(decode_line(raw) for raw in LINE_END.split(data))
+        return [line for line in lines if line]
+
+
+def stop_reader(reader, thread, timeout=2.0):
+    """
+    Wake a reader thread and wait for it to finish draining
+
+    Returns:
+        bool: True if the thread finished within the timeout
+    """
+    if reader:
+        reader.wake()
+    if thread:
+        thread.join(timeout)
+        return not thread.is_alive()
+    return True
+
+
+def session_footer(started, lines, reason='stopped', **counts):
+    """
+    Last line of a capture file, so a complete session can be told apart
+    from one cut short by a crash or power loss
+
+    Args:
+        started (float): Session start in epoch seconds
+        lines (int): Lines captured
+        reason (str): Why the session ended
+        counts: Further totals to record, e.g. packets=123
+    """
+    ended = time.time()
+    details = ''.join(f", {name} {value}" for name, value in counts.items())
+    return (f"# Session end: {datetime.fromtimestamp(ended).strftime('%Y-%m-%d %H:%M:%S')}, "
+            f"{lines} lines{details}, {ended - started:.1f}s, {reason}")
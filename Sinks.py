@@ -0,0 +1,360 @@
+import gzip
+import logging
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows: retention falls back to the mtime grace
+    fcntl = None
+
+# Binary capture: magic, then records of (created, length) followed by the UTF-8 line
+BINARY_MAGIC = b'PXB1'
+BINARY_RECORD = struct.Struct('<dI')
+
+
+def session_folder(name):
+    """
+    Create a log folder next to the scripts and start a session in it
+
+    Returns:
+        tuple: (folder path, session timestamp 'YYYYmmdd_HHMMSS')
+    """
+    log_dir = os.path.join(os.path.dirname(__file__), name)
+    os.makedirs(log_dir, exist_ok=True)
+    return log_dir, datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def lock_shared(stream):
+    """
+    Mark a capture file as being written with a shared advisory lock
+
+    Any number of writers can hold it; is_locked() in another process (or
+    another open of the file) sees it until the file is closed.
+    """
+    if fcntl is None:
+        return
+    try:
+        fcntl.flock(stream.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except OSError:
+        pass
+
+
+def is_locked(path):
+    """True if a writer holds a lock on the file"""
+    if fcntl is None:
+        return False
+    try:
+        with open(path, 'rb') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+def setup_main_logger():
+    """Console logger used by every script for status and errors"""
+    main_logger = logging.getLogger('main')
+    main_logger.handlers.clear()
+    main_logger.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    main_logger.addHandler(console_handler)
+    return main_logger
+
+
+class Sink:
+    """
+    Destination for captured lines
+
+    Sinks receive batches of (created, line) tuples, where created is the
+    time the line was read in epoch seconds. Subclasses implement
+    write_batch; write() is a shortcut for a batch of one.
+    """
+
+    def write_batch(self, items):
+        raise NotImplementedError
+
+    def write(self, line, created=None):
+        self.write_batch(((created if created is not None else time.time(), line),))
+
+    def flush(self):
+        pass
+
+    def sync(self):
+        """Flush and make sure the data reached the disk (end of session)"""
+        self.flush()
+
+    def close(self):
+        self.flush()
+
+
+class TextSink(Sink):
+    def __init__(self, path, delay=False):
+        """
+        Plain text capture in the 'timestamp,line' format of the loggers
+
+        The timestamp prefix is only rebuilt when the second changes, and
+        each batch is written and flushed in one call.
+
+        Args:
+            path (str): Output file, appended to
+            delay (bool): Only create the file once the first line arrives
+        """
+        self.path = path
+        self.stream = None
+        self.autoflush = True
+        self.lock = threading.Lock()
+        self.cached_second = None
+        self.cached_stamp = ''
+        if not delay:
+            self.stream = self.open()
+
+    def open(self):
+        stream = open(self.path, 'a', encoding='utf-8')
+        lock_shared(stream)
+        return stream
+
+    def format(self, created, line):
+        second = int(created)
+        if second != self.cached_second:
+            self.cached_second = second
+            self.cached_stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        return f"{self.cached_stamp},{int((created - second) * 1000):03d},{line}\n"
+
+    def write_batch(self, items):
+        data = ''.join([self.format(created, line) for created, line in items])
+        with self.lock:
+            if self.stream is None:
+                self.stream = self.open()
+            self.stream.write(data)
+            if self.autoflush:
+                self.stream.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.stream:
+                self.stream.flush()
+
+    def sync(self):
+        with self.lock:
+            if self.stream:
+                self.stream.flush()
+                os.fsync(self.stream.fileno())
+
+    def close(self):
+        with self.lock:
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+
+
+class CompressedSink(TextSink):
+    def __init__(self, path, level=6, delay=False):
+        """
+        Gzip-compressed text capture, readable with zcat or read_lines
+
+        Batches are not flushed individually, since every gzip flush costs
+        compression ratio; data reaches the disk as the compressor fills its
+        buffer and on flush() / close().
+
+        Args:
+            path (str): Output file, usually ending in .txt.gz
+            level (int): Compression level 1-9
+            delay (bool): Only create the file once the first line arrives
+        """
+        self.level = level
+        super().__init__(path, delay)
+        self.autoflush = False
+
+    def open(self):
+        stream = gzip.open(self.path, 'at', encoding='utf-8', compresslevel=self.level)
+        lock_shared(stream)
+        return stream
+
+
+class BinarySink(Sink):
+    def __init__(self, path):
+        """
+        Length-prefixed binary capture keeping the exact read time
+
+        Each record is the read time as a double, the line length and the
+        UTF-8 line. It is cheaper to write and to parse than the text
+        format; read_binary() gives the lines back.
+
+        Args:
+            path (str): Output file, appended to
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.stream = open(path, 'ab')
+        lock_shared(self.stream)
+        if self.stream.tell() == 0:
+            self.stream.write(BINARY_MAGIC)
+
+    def write_batch(self, items):
+        parts = []
+        for created, line in items:
+            data = line.encode('utf-8')
+            parts.append(BINARY_RECORD.pack(created, len(data)))
+            parts.append(data)
+        with self.lock:
+            self.stream.write(b''.join(parts))
+            self.stream.flush()
+
+    def flush(self):
+        with self.lock:
+            self.stream.flush()
+
+    def sync(self):
+        with self.lock:
+            self.stream.flush()
+            os.fsync(self.stream.fileno())
+
+    def close(self):
+        with self.lock:
+            self.stream.close()
+
+
+def read_binary(path):
+    """Yield (created, line) from a BinarySink file"""
+    with open(path, 'rb') as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary capture")
+        while True:
+            header = f.read(BINARY_RECORD.size)
+            if len(header) < BINARY_RECORD.size:
+                return
+            created, length = BINARY_RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield created, data.decode('utf-8', errors='replace')
+
+
+class SegmentedSink(TextSink):
+    def __init__(self, log_dir, prefix, interval=3600, max_bytes=None, clock=time.time,
+                 on_rollover=None):
+        """
+        Text sink that starts a new file on interval boundaries or at a size limit
+
+        Segments are named '<prefix>_<YYYYmmdd_HHMMSS>.txt' after the time
+        they were opened. The switch happens between batches, under the
+        sink lock, so no line is lost or split between files.
+
+        Args:
+            log_dir (str): Folder for the segments
+            prefix (str): File name prefix, e.g. 'serial_data'
+            interval (int): Segment length in seconds, aligned to local time
+                (3600 switches on the hour); None to segment by size only
+            max_bytes (int): Start a new segment once a file reaches this size
+            clock (callable): Time source, replaceable for replay tests
+            on_rollover (callable): Called with the new segment path
+        """
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.on_rollover = on_rollover
+        self.segments = 1
+        now = clock()
+        super().__init__(self.segment_path(now))
+        self.next_boundary = self.compute_boundary(now)
+
+    def segment_path(self, now):
+        """Unused file name for a segment opened at 'now'"""
+        stamp = datetime.fromtimestamp(now).strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.log_dir, f'{self.prefix}_{stamp}.txt')
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.log_dir, f'{self.prefix}_{stamp}_{suffix}.txt')
+            suffix += 1
+        return os.path.abspath(path)
+
+    def compute_boundary(self, now):
+        """Next interval boundary in local time"""
+        if not self.interval:
+            return float('inf')
+        offset = time.localtime(now).tm_gmtoff
+        return ((now + offset) // self.interval + 1) * self.interval - offset
+
+    def should_rollover(self, now):
+        if now >= self.next_boundary:
+            return True
+        return bool(self.max_bytes and self.stream and self.stream.tell() >= self.max_bytes)
+
+    def rollover(self, now):
+        """Close the current segment and open the next one (lock held)"""
+        if self.stream:
+            self.stream.close()
+        self.path = self.segment_path(now)
+        self.stream = self.open()
+        self.next_boundary = self.compute_boundary(now)
+        self.segments += 1
+
+    def write_batch(self, items):
+        now = self.clock()
+        rolled = None
+        with self.lock:
+            if self.should_rollover(now):
+                self.rollover(now)
+                rolled = self.path
+        if rolled and self.on_rollover:
+            self.on_rollover(rolled)
+        super().write_batch(items)
+
+
+class FanOut(Sink):
+    def __init__(self, sinks=()):
+        """
+        Send every batch to several sinks
+
+        A failing sink is reported and skipped for that batch so it cannot
+        stop the others from receiving the line.
+
+        Args:
+            sinks (iterable): Sinks to write to, in order
+        """
+        self.sinks = list(sinks)
+        self.errors = 0
+        self.main_logger = logging.getLogger('main')
+
+    def add(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def write_batch(self, items):
+        if not isinstance(items, (list, tuple)):
+            items = list(items)
+        for sink in self.sinks:
+            try:
+                sink.write_batch(items)
+            except Exception as e:
+                self.errors += 1
+                self.main_logger.error(f"{type(sink).__name__} write failed: {e}")
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def sync(self):
+        for sink in self.sinks:
+            try:
+                sink.sync()
+            except Exception as e:
+                self.main_logger.error(f"{type(sink).__name__} sync failed: {e}")
+
+    def close(self):
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self.main_logger.error(f"{type(sink).__name__} close failed: {e}")
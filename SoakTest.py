@@ -0,0 +1,113 @@
+import argparse
+import itertools
+import logging
+import os
+import shutil
+import sys
+import time
+
+from Logger import SingleSerialLogger
+from SegmentedCapture import current_rss_kb
+from TelemetryParser import read_lines
+
+
+def load_replay_lines(path):
+    """Device lines of a capture and their mean spacing in seconds"""
+    lines = []
+    first = last = None
+    for timestamp, message in read_lines(path):
+        if not message.strip():
+            continue
+        lines.append(message.strip())
+        if timestamp is not None:
+            first = first or timestamp
+            last = timestamp
+    spacing = 0.1
+    if first and last and len(lines) > 1:
+        spacing = max((last - first).total_seconds() / (len(lines) - 1), 0.001)
+    return lines, spacing
+
+
+def replay(logger, lines, spacing, days, warmup_hours=1):
+    """
+    Replay lines through the daemon pipeline on a simulated clock
+
+    Returns:
+        list: One (simulated hour, rss_kb, lines_per_second) sample per hour
+    """
+    sim_time = [time.time()]
+
+    def clock():
+        return sim_time[0]
+
+    logger.data_sink.clock = clock
+    if logger.router:
+        for route in logger.router.routes:
+            route.sink.clock = clock
+
+    samples = []
+    hour_lines = int(3600 / spacing)
+    total_hours = int(days * 24)
+    source = itertools.cycle(lines)
+    for hour in range(total_hours):
+        started = time.perf_counter()
+        for line in itertools.islice(source, hour_lines):
+            sim_time[0] += spacing
+            logger.process_line(line)
+        elapsed = time.perf_counter() - started
+        samples.append((hour, current_rss_kb(), hour_lines / elapsed if elapsed else 0.0))
+        if hour + 1 >= warmup_hours and (hour + 1) % 6 == 0:
+            print(f"  hour {hour + 1:4d}: rss {samples[-1][1]} kB, "
+                  f"{samples[-1][2]:,.0f} lines/s, {logger.data_sink.segments} segments")
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak test of the daemon capture mode using a recorded session")
+    parser.add_argument('capture', type=str, help='Recorded serial_data_*.txt to replay')
+    parser.add_argument('--days', type=float, default=3, help='Simulated capture length in days')
+    parser.add_argument('--split-streams', action='store_true', help='Also exercise the routed streams')
+    parser.add_argument('--max-growth-kb', type=int, default=2048, help='Allowed RSS growth after warm-up')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated segments')
+    args = parser.parse_args()
+
+    lines, spacing = load_replay_lines(args.capture)
+    if not lines:
+        print("Capture contains no lines")
+        return 1
+
+    logger = SingleSerialLogger('replay', folder_prefix='soak', split_streams=args.split_streams, daemon=True)
+    logger.main_logger.setLevel(logging.ERROR)
+    log_dir = logger.log_dir
+
+    print(f"Replaying {len(lines)} lines every {spacing * 1000:.1f} ms for {args.days:g} simulated days")
+    try:
+        samples = replay(logger, lines, spacing, args.days)
+    finally:
+        logger.data_sink.close()
+        if logger.router:
+            logger.router.close()
+        segments = len([name for name in os.listdir(log_dir) if name.startswith('serial_data_')])
+        if not args.keep:
+            shutil.rmtree(log_dir, ignore_errors=True)
+
+    # Compare against the first hour after warm-up
+    baseline = samples[min(1, len(samples) - 1)][1]
+    peak = max(rss for _, rss, _ in samples)
+    rates = [rate for _, _, rate in samples]
+    expected_segments = len(samples)
+    print(f"Segments written: {segments} (expected about {expected_segments})")
+    print(f"RSS baseline {baseline} kB, peak {peak} kB, growth {peak - baseline} kB")
+    print(f"Throughput: min {min(rates):,.0f}, max {max(rates):,.0f} lines/s")
+
+    if peak - baseline > args.max_growth_kb:
+        print("FAIL: memory grew during the soak")
+        return 1
+    if abs(segments - expected_segments) > 1:
+        print("FAIL: unexpected number of hourly segments")
+        return 1
+    print("PASS")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from TelemetryParser import read_packets
+
+VECTOR_GROUPS = {
+    'acc': ('accX', 'accY', 'accZ'),
+    'gyro': ('gyroX', 'gyroY', 'gyroZ'),
+    'mag': ('magX', 'magY', 'magZ'),
+}
+LINK_FIELDS = ('rssi', 'lqi', 'crc')
+
+
+def load_session(path, fields=None):
+    """
+    Load the numeric packet fields of a session into NumPy arrays
+
+    The file is parsed once. Fields missing from a packet are stored as NaN
+    so every array lines up with the 'time' array.
+
+    Args:
+        path (str): Session log file
+        fields (list): Fields to load (default: every numeric field seen)
+
+    Returns:
+        dict: Field name -> float64 array, plus 'time' in epoch seconds
+    """
+    columns = {}
+    times = []
+    count = 0
+    for packet in read_packets(path):
+        if packet['timestamp'] is None:
+            continue
+        times.append(packet['timestamp'].timestamp())
+        for key, value in packet.items():
+            if fields is not None and key not in fields:
+                continue
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            column = columns.get(key)
+            if column is None:
+                # Pad fields that first appear mid-session
+                column = columns[key] = [np.nan] * count
+            column.append(value)
+        count += 1
+        for column in columns.values():
+            if len(column) < count:
+                column.append(np.nan)
+
+    session = {key: np.asarray(column, dtype=np.float64) for key, column in columns.items()}
+    session['time'] = np.asarray(times, dtype=np.float64)
+    return session
+
+
+def rolling(values, window):
+    """
+    Rolling mean, min and max over a fixed number of samples
+
+    Returns:
+        tuple: (mean, min, max) arrays of length len(values) - window + 1
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window < 1 or len(values) < window:
+        empty = np.empty(0)
+        return empty, empty, empty
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)
+    return np.nanmean(windows, axis=1), np.nanmin(windows, axis=1), np.nanmax(windows, axis=1)
+
+
+def bucket_stats(times, values, bucket_seconds, percentiles=(5, 50, 95)):
+    """
+    Per time-bucket statistics without a Python loop over samples
+
+    Args:
+        times (array): Sample times in seconds
+        values (array): Sample values
+        bucket_seconds (float): Bucket width
+        percentiles (tuple): Percentiles to compute per bucket
+
+    Returns:
+        dict: 'start', 'count', 'mean', 'min', 'max' and 'p<N>' arrays,
+        one entry per non-empty bucket
+    """
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values) & ~np.isnan(times)
+    times, values = times[valid], values[valid]
+    if len(values) == 0:
+        return {'start': np.empty(0), 'count': np.empty(0, dtype=np.int64)}
+
+    buckets = np.floor(times / bucket_seconds).astype(np.int64)
+
+    # Sort by bucket, then value, so each bucket is a sorted contiguous run
+    order = np.lexsort((values, buckets))
+    buckets, values = buckets[order], values[order]
+    keys, starts, counts = np.unique(buckets, return_index=True, return_counts=True)
+
+    stats = {
+        'start': keys * bucket_seconds,
+        'count': counts,
+        'mean': np.add.reduceat(values, starts) / counts,
+        'min': values[starts],
+        'max': values[starts + counts - 1],
+    }
+    for p in percentiles:
+        # Linear interpolation between closest ranks, as np.percentile does
+        position = starts + (counts - 1) * (p / 100.0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        stats[f'p{p:g}'] = values[low] + (values[high] - values[low]) * (position - low)
+    return stats
+
+
+def vector_stats(session, group):
+    """Mean, std, min and max of each axis and of the vector magnitude"""
+    axes = [session[key] for key in VECTOR_GROUPS[group] if key in session]
+    if len(axes) != 3:
+        return None
+    data = np.vstack(axes)
+    # NaN where any axis is missing, so partial samples don't look smaller
+    magnitude = np.sqrt((data * data).sum(axis=0))
+    data = np.vstack([data, magnitude])
+    return {
+        'mean': np.nanmean(data, axis=1),
+        'std': np.nanstd(data, axis=1),
+        'min': np.nanmin(data, axis=1),
+        'max': np.nanmax(data, axis=1),
+    }
+
+
+def link_distribution(session, field, percentiles=(5, 25, 50, 75, 95)):
+    """Percentiles and value histogram of a link-quality field"""
+    values = session.get(field)
+    if values is None:
+        return None
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    levels, counts = np.unique(values, return_counts=True)
+    return {
+        'percentiles': dict(zip(percentiles, np.percentile(values, percentiles))),
+        'values': levels,
+        'counts': counts,
+    }
+
+
+def temperature_trend(session):
+    """Linear temperature trend over the pass in degrees per hour"""
+    times, temps = session['time'], session.get('temp')
+    if temps is None:
+        return None
+    valid = ~np.isnan(temps)
+    if valid.sum() < 2:
+        return None
+    hours = (times[valid] - times[valid][0]) / 3600.0
+    slope, intercept = np.polyfit(hours, temps[valid], 1)
+    return {'slope_per_hour': slope, 'start': intercept, 'mean': temps[valid].mean()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize telemetry of a logged session")
+    parser.add_argument('log_file', type=str, help='Session log file (serial_data_* or portN_data_*)')
+    parser.add_argument('--bucket', type=float, default=60, help='Bucket size in seconds for link statistics')
+    args = parser.parse_args()
+
+    session = load_session(args.log_file)
+    packets = len(session['time'])
+    print(f"Packets: {packets}")
+    if packets == 0:
+        return
+    print(f"Duration: {session['time'][-1] - session['time'][0]:.1f} s")
+
+    for group in VECTOR_GROUPS:
+        stats = vector_stats(session, group)
+        if stats is None:
+            continue
+        print(f"\n{group} (X, Y, Z, |v|):")
+        for name in ('mean', 'std', 'min', 'max'):
+            print(f"  {name:>4}: " + "  ".join(f"{v:10.3f}" for v in stats[name]))
+
+    for field in LINK_FIELDS:
+        dist = link_distribution(session, field)
+        if dist is None:
+            continue
+        print(f"\n{field} percentiles: " + ", ".join(f"p{p}={v:.1f}" for p, v in dist['percentiles'].items()))
+
+    trend = temperature_trend(session)
+    if trend:
+        print(f"\nTemperature: mean {trend['mean']:.2f}, trend {trend['slope_per_hour']:+.2f} per hour")
+
+    if 'rssi' in session:
+        stats = bucket_stats(session['time'], session['rssi'], args.bucket)
+        print(f"\nrssi per {args.bucket:g} s bucket (count, mean, min, p50, max):")
+        for i in range(len(stats['start'])):
+            start = datetime.fromtimestamp(stats['start'][i]).strftime("%H:%M:%S")
+            print(f"  {start}: {stats['count'][i]:4d} {stats['mean'][i]:7.2f} "
+                  f"{stats['min'][i]:6.1f} {stats['p50'][i]:6.1f} {stats['max'][i]:6.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import gzip
+import json
+import re
+import sys
+from datetime import datetime
+
+# Format written by the loggers: '%(asctime)s,%(message)s'
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+TIMESTAMP_LENGTH = 23
+
+# ANSI escape sequences and the Zephyr shell prompt that surround device output
+ANSI_PATTERN = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+PROMPT = 'uart:~$ '
+# What the shell echoes before every value of a long line: coloured prompt,
+# cursor back over it, erase to end of line
+PROMPT_ECHO = '\x1b[1;32m' + PROMPT + '\x1b[m\x1b[8D\x1b[J'
+STORED_DATA_KEY = 'storedData:'
+
+HEADER_PATTERN = re.compile(
+    r'Received Message, (?P<size>\d+) B, rssi (?P<rssi>-?\d+), crc (?P<crc>-?\d+), lqi (?P<lqi>-?\d+):'
+)
+FIELD_PATTERN = re.compile(r'^(?P<key>[A-Za-z][A-Za-z0-9_]*): ?(?P<value>.*)$')
+ADCS_PATTERN = re.compile(
+    r'^ADCS (?P<sensor>\w+) - X: (?P<x>-?\d+), Y: (?P<y>-?\d+), Z: (?P<z>-?\d+)$'
+)
+
+# Fields that carry a list of values rather than a single number
+ARRAY_FIELDS = ('storedData',)
+
+
+def format_timestamp(timestamp):
+    """Format a datetime the way the loggers write it"""
+    return timestamp.strftime(TIMESTAMP_FORMAT)[:-3]
+
+
+def packet_to_json(packet):
+    """Serialize a packet (and any nested receptions) to a JSON line"""
+    def default(value):
+        if isinstance(value, datetime):
+            return format_timestamp(value)
+        raise TypeError(f"Cannot serialize {type(value).__name__}")
+    return json.dumps(packet, default=default, separators=(',', ':'))
+
+
+def strip_line(message):
+    """Remove ANSI escapes and shell prompts from a device line"""
+    return ANSI_PATTERN.sub('', message).replace(PROMPT, '').strip()
+
+
+def split_log_line(line):
+    """
+    Split a logged line into its host timestamp and raw message
+
+    Args:
+        line (str): Line as written by the data logger
+
+    Returns:
+        tuple: (datetime or None, message). The timestamp is None when the
+        line does not start with a logger timestamp.
+    """
+    line = line.rstrip('\r\n')
+    if len(line) > TIMESTAMP_LENGTH and line[TIMESTAMP_LENGTH] == ',':
+        try:
+            return parse_timestamp(line), line[TIMESTAMP_LENGTH + 1:]
+        except ValueError:
+            pass
+    return None, line
+
+
+def parse_timestamp(text):
+    """
+    Parse a 'YYYY-mm-dd HH:MM:SS,mmm' logger timestamp
+
+    Slicing the fixed layout is several times faster than strptime, which
+    dominated the cost of reading long sessions.
+    """
+    if text[4] != '-' or text[7] != '-' or text[13] != ':' or text[16] != ':' or text[19] != ',':
+        raise ValueError(f"Not a logger timestamp: {text[:TIMESTAMP_LENGTH]}")
+    return datetime(
+        int(text[0:4]), int(text[5:7]), int(text[8:10]),
+        int(text[11:13]), int(text[14:16]), int(text[17:19]),
+        int(text[20:23]) * 1000
+    )
+
+
+def parse_value(text):
+    """Convert a field value to int or float where possible"""
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def parse_array(text):
+    """Parse a whitespace separated list of numbers, skipping anything else"""
+    values = []
+    for item in text.split():
+        try:
+            values.append(float(item))
+        except ValueError:
+            continue
+    return values
+
+
+def stored_data_text(message):
+    """
+    Value part of a raw storedData line, with prompts and escapes removed
+
+    The prompt echo is a fixed string, so a plain replace removes nearly
+    all of it; the regex only runs if anything unusual is left.
+
+    Returns:
+        str or None: Whitespace separated values, or None if the line is
+        not a storedData field
+    """
+    text = message.replace(PROMPT_ECHO, '')
+    if '\x1b' in text or PROMPT in text:
+        text = strip_line(text)
+    key, separator, values = text.strip().partition(STORED_DATA_KEY)
+    if not separator or key:
+        return None
+    return values
+
+
+def parse_stored_data(message):
+    """storedData values of a raw line as floats, or None if it is not one"""
+    text = stored_data_text(message)
+    if text is None:
+        return None
+    try:
+        return [float(item) for item in text.split()]
+    except ValueError:
+        return parse_array(text)
+
+
+class PacketAssembler:
+    def __init__(self, port=None):
+        """
+        Assemble telemetry packets from a stream of device lines
+
+        A packet starts at a 'Received Message' header and collects every
+        following 'key: value' line. Any other line closes the packet.
+
+        Args:
+            port (str): Optional port name stored with each packet
+        """
+        self.port = port
+        self.current = None
+
+    def feed(self, timestamp, message):
+        """
+        Feed one device line
+
+        Args:
+            timestamp (datetime): Host timestamp of the line
+            message (str): Raw line, with or without prompt and ANSI codes
+
+        Returns:
+            dict or None: The packet completed by this line, if any
+        """
+        if self.current is not None and STORED_DATA_KEY in message:
+            # The longest line of a packet: skip the generic field parsing
+            values = parse_stored_data(message)
+            if values is not None:
+                self.current['storedData'] = values
+                return None
+
+        text = strip_line(message)
+        header = HEADER_PATTERN.search(text)
+        if header:
+            completed = self.flush()
+            self.current = {
+                'timestamp': timestamp,
+                'port': self.port,
+                'size': int(header.group('size')),
+                'rssi': int(header.group('rssi')),
+                'crc': int(header.group('crc')),
+                'lqi': int(header.group('lqi')),
+            }
+            return completed
+
+        if self.current is None:
+            return None
+
+        field = FIELD_PATTERN.match(text)
+        if field:
+            # Interned so every packet shares one copy of each key
+            key = sys.intern(field.group('key'))
+            if key in ARRAY_FIELDS:
+                self.current[key] = parse_array(field.group('value'))
+            else:
+                self.current[key] = parse_value(field.group('value'))
+            return None
+
+        adcs = ADCS_PATTERN.match(text)
+        if adcs:
+            sensor = adcs.group('sensor')
+            for axis in ('x', 'y', 'z'):
+                self.current[sys.intern(f'adcs{sensor}{axis.upper()}')] = int(adcs.group(axis))
+            return None
+
+        # Anything else ends the packet
+        return self.flush()
+
+    def flush(self):
+        """Return the packet being assembled, if any, and reset"""
+        completed = self.current
+        self.current = None
+        return completed
+
+
+def read_lines(path):
+    """Yield (timestamp, message) for every line of a log file (.gz allowed)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            yield split_log_line(line)
+
+
+def read_packets(path, port=None):
+    """Yield every telemetry packet found in a log file"""
+    assembler = PacketAssembler(port)
+    for timestamp, message in read_lines(path):
+        packet = assembler.feed(timestamp, message)
+        if packet:
+            yield packet
+    packet = assembler.flush()
+    if packet:
+        yield packet